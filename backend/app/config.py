@@ -1,6 +1,21 @@
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 
+def _optional_float(value):
+    """Parse a numeric setting, an empty value disables it."""
+    return float(value) if value else None
+
+def data_path(default: str, *relative: str) -> str:
+    """Location of a generated artifact: under DATA_DIR when it is set, else the default next to the code."""
+    data_dir = load_env_variables()['data_dir']
+    return os.path.join(data_dir, *relative) if data_dir else default
+
+@lru_cache(maxsize=None)
+def get_settings():
+    """Environment variables read once per process, for the per-request paths"""
+    return load_env_variables()
+
 def load_env_variables():
     """Load environment variables"""
     load_dotenv()
@@ -10,6 +25,49 @@ def load_env_variables():
         'api_version': "2024-02-01",
         'chat_deployment': os.getenv("AZURE_OPENAI_DEPLOYMENT"),
         'embedding_deployment': 'text-embedding-ada-002',
+        'context_token_budget': int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000")),
+        'history_token_budget': int(os.getenv("HISTORY_TOKEN_BUDGET", "800")),
+        'chat_requests_per_minute': float(os.getenv("CHAT_REQUESTS_PER_MINUTE", "300")),
+        'chat_tokens_per_minute': float(os.getenv("CHAT_TOKENS_PER_MINUTE", "50000")),
+        'embeddings_requests_per_minute': float(os.getenv("EMBEDDINGS_REQUESTS_PER_MINUTE", "300")),
+        'embeddings_tokens_per_minute': float(os.getenv("EMBEDDINGS_TOKENS_PER_MINUTE", "240000")),
+        'llm_max_concurrency': int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        'tokenizer_encoding': os.getenv("TOKENIZER_ENCODING", "o200k_base"),
+        'semantic_cache_enabled': os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true",
+        'semantic_cache_threshold': float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+        'semantic_cache_ttl_seconds': int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600")),
+        'semantic_cache_max_entries': int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000")),
+        'example_store_enabled': os.getenv("EXAMPLE_STORE_ENABLED", "true").lower() == "true",
+        'example_store_top_k': int(os.getenv("EXAMPLE_STORE_TOP_K", "3")),
+        'example_store_min_score': float(os.getenv("EXAMPLE_STORE_MIN_SCORE", "0.8")),
+        'examples_token_budget': int(os.getenv("EXAMPLES_TOKEN_BUDGET", "600")),
+        'candidate_temperature': float(os.getenv("CANDIDATE_TEMPERATURE", "0.7")),
+        'sql_repair_attempts': int(os.getenv("SQL_REPAIR_ATTEMPTS", "2")),
+        'cost_guard_enabled': os.getenv("COST_GUARD_ENABLED", "false").lower() == "true",
+        'cost_guard_mode': os.getenv("COST_GUARD_MODE", "confirm"),  # "confirm" or "reject"
+        'cost_guard_max_rows': _optional_float(os.getenv("COST_GUARD_MAX_ROWS", "10000000")),
+        'cost_guard_max_cost': _optional_float(os.getenv("COST_GUARD_MAX_COST", "")),
+        'cost_guard_max_bytes': _optional_float(os.getenv("COST_GUARD_MAX_BYTES", "10000000000")),
+        'chat_history_max_sessions': int(os.getenv("CHAT_HISTORY_MAX_SESSIONS", "1000")),
+        'chat_history_max_messages': int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "12")),
+        'chat_history_idle_ttl_seconds': int(os.getenv("CHAT_HISTORY_IDLE_TTL_SECONDS", "3600")),
+        'chat_history_db_path': os.getenv("CHAT_HISTORY_DB_PATH", ""),
+        # Worker processes serving the API; uvicorn --workers reads WEB_CONCURRENCY too
+        'api_workers': int(os.getenv("API_WORKERS") or os.getenv("WEB_CONCURRENCY") or "1"),
+        'rules_dir': os.getenv("RULES_DIR", ""),
+        'data_dir': os.getenv("DATA_DIR", ""),
+        'shared_state_db_path': os.getenv("SHARED_STATE_DB_PATH", ""),
+        'shared_state_cache_seconds': float(os.getenv("SHARED_STATE_CACHE_SECONDS", "1.0")),
+        'db_password': os.getenv("DB_PASSWORD", ""),
+        'metadata_parse_workers': int(os.getenv("METADATA_PARSE_WORKERS", "0")),
+        'metadata_csv_chunk_rows': int(os.getenv("METADATA_CSV_CHUNK_ROWS", "50000")),
+        'job_workers': int(os.getenv("JOB_WORKERS", "2")),
+        'llm_preload': os.getenv("LLM_PRELOAD", "true").lower() == "true",
+        'log_level': os.getenv("LOG_LEVEL", "INFO"),
+        'log_sample_rate': float(os.getenv("LOG_SAMPLE_RATE", "0.01")),
+        'trace_buffer_size': int(os.getenv("TRACE_BUFFER_SIZE", "200")),
+        'trace_sql_comments': os.getenv("TRACE_SQL_COMMENTS", "true").lower() == "true",
+        'profiling_enabled': os.getenv("PROFILING_ENABLED", "false").lower() == "true",
         # 'db_name': os.getenv("POSTGRES_DB"),
         # 'db_user': os.getenv("POSTGRES_USER"),
         # 'db_password': os.getenv("POSTGRES_PASSWORD"),
@@ -1,14 +1,44 @@
 # app/db_management/connection.py
-import psycopg2
+import re
+import json
+import logging
+import threading
+from collections import OrderedDict
 from typing import Tuple, List, Optional, Dict, Type
 from abc import ABC, abstractmethod
+from app.observability.metrics import time_stage
+from app.observability.tracing import with_trace_comment
 # from databricks import sql # Import Databricks SQL Connector if used
 sql = None # Placeholder
-import snowflake.connector
+# psycopg2 and snowflake.connector are imported in the methods that use them, so the API
+# process only pays for a driver once its /connect-* endpoint is used
+
+logger = logging.getLogger(__name__)
+
+# Number of EXPLAIN results kept per connection
+PLAN_CACHE_SIZE = 256
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace and drop the trailing semicolon so equivalent queries share a plan."""
+    return re.sub(r"\s+", " ", query.strip()).rstrip(";").strip()
+
+
+def relation_scans(plan: Dict) -> List[Dict]:
+    """Nodes of a PostgreSQL JSON plan that read a table or index, depth first."""
+    scans = [plan] if "Relation Name" in plan else []
+    for child in plan.get("Plans", []):
+        scans.extend(relation_scans(child))
+    return scans
+
 
 class DatabaseConnection(ABC):
     """Abstract base class for database connections."""
 
+    def __init__(self):
+        self._plan_cache: "OrderedDict[str, Optional[Dict]]" = OrderedDict()
+        self._plan_cache_lock = threading.Lock()
+
     @abstractmethod
     def test_connection(self) -> bool:
         """Test database connection."""
@@ -24,23 +54,74 @@ class DatabaseConnection(ABC):
         """Format query results for display."""
         pass
 
+    def explain_query(self, query: str) -> Optional[Dict]:
+        """
+        Estimate the cost of a query without running it.
+        Returns a dict with estimated_rows, estimated_cost and bytes_scanned (any may be None),
+        or None when the backend has no plan estimates.
+        """
+        return None
+
+    def estimate_query_cost(self, query: str) -> Optional[Dict]:
+        """explain_query with a per-connection cache keyed by the normalized SQL; failures are not cached."""
+        key = normalize_sql(query)
+        with self._plan_cache_lock:
+            if key in self._plan_cache:
+                self._plan_cache.move_to_end(key)
+                return self._plan_cache[key]
+        estimate = self.explain_query(key)
+        if estimate is not None and estimate.get("error"):
+            return estimate
+        with self._plan_cache_lock:
+            self._plan_cache[key] = estimate
+            while len(self._plan_cache) > PLAN_CACHE_SIZE:
+                self._plan_cache.popitem(last=False)
+        return estimate
+
+    def check_query_cost(self, query: str, max_rows: Optional[float] = None, max_cost: Optional[float] = None,
+                         max_bytes: Optional[float] = None) -> Tuple[Optional[Dict], List[str]]:
+        """
+        Compare the plan estimate of a query against thresholds.
+        Returns (estimate, reasons); reasons is empty when the query is within every threshold.
+        """
+        estimate = self.estimate_query_cost(query)
+        if estimate is None:
+            return None, []
+        if estimate.get("error"):
+            # The guard cannot vouch for a query it could not estimate
+            return estimate, [f"Query cost could not be estimated: {estimate['error']}"]
+
+        reasons = []
+        checks = [
+            ("estimated_rows", max_rows, "Estimated rows"),
+            ("estimated_cost", max_cost, "Estimated cost"),
+            ("bytes_scanned", max_bytes, "Estimated bytes scanned")
+        ]
+        for key, limit, label in checks:
+            value = estimate.get(key)
+            if limit is not None and value is not None and value > limit:
+                reasons.append(f"{label} {value:,.0f} exceeds limit {limit:,.0f}")
+        return estimate, reasons
+
 
 class PostgresConnection(DatabaseConnection):
     """Concrete class for PostgreSQL database connections."""
     def __init__(self, db_credentials: Dict):
+        super().__init__()
         self.db_credentials = db_credentials
 
     def test_connection(self) -> bool:
         """Test PostgreSQL database connection."""
         conn = None
         try:
+            import psycopg2 # Import here, only when PostgresConnection is used
             conn = psycopg2.connect(**self.db_credentials)
             cursor = conn.cursor()
             cursor.execute("SELECT 1;")
             cursor.fetchone()
             return True
         except Exception as e:
-            print(f"PostgreSQL connection failed: {e}")
+            logger.warning("PostgreSQL connection failed: %s", e)
             return False
         finally:
             if conn:
@@ -50,10 +131,14 @@ class PostgresConnection(DatabaseConnection):
         """Execute SQL query against PostgreSQL."""
         conn = None
         try:
-            conn = psycopg2.connect(**self.db_credentials)
+            import psycopg2 # Import here, only when PostgresConnection is used
+            with time_stage("db_connect"):
+                conn = psycopg2.connect(**self.db_credentials)
             cursor = conn.cursor()
-            cursor.execute(query)
-            results = cursor.fetchall()
+            with time_stage("db_execute"):
+                cursor.execute(with_trace_comment(query))
+            with time_stage("db_fetch"):
+                results = cursor.fetchall()
             column_names = [desc[0] for desc in cursor.description]
             return results, column_names, None
         except Exception as e:
@@ -62,6 +147,34 @@ class PostgresConnection(DatabaseConnection):
             if conn:
                 conn.close()
 
+    def explain_query(self, query: str) -> Optional[Dict]:
+        """
+        Estimate rows, cost and bytes from the PostgreSQL planner.
+        Rows and bytes are summed over the table and index scans, not taken from the
+        root node: an aggregate over a large table returns one row but reads all of it.
+        """
+        conn = None
+        try:
+            import psycopg2 # Import here, only when PostgresConnection is used
+            conn = psycopg2.connect(**self.db_credentials)
+            cursor = conn.cursor()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {with_trace_comment(query)}")
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            root = plan[0]["Plan"]
+            scans = relation_scans(root)
+            return {
+                "estimated_rows": sum(node.get("Plan Rows", 0) for node in scans),
+                "estimated_cost": root.get("Total Cost"),
+                "bytes_scanned": sum(node.get("Plan Rows", 0) * node.get("Plan Width", 0) for node in scans)
+            }
+        except Exception as e:
+            return {"estimated_rows": None, "estimated_cost": None, "bytes_scanned": None, "error": str(e)}
+        finally:
+            if conn:
+                conn.close()
+
     def format_results(self, results: List, columns: Optional[List[str]], error: Optional[str]) -> str:
         """Format query results for PostgreSQL (and standard SQL)."""
         if error:
@@ -88,6 +201,7 @@ class DatabricksConnection(DatabaseConnection):
     """Concrete class for Databricks database connections."""
 
     def __init__(self, db_credentials: Dict):
+        super().__init__()
         self.db_credentials = db_credentials
 
     def test_connection(self) -> bool:
@@ -105,7 +219,7 @@ class DatabricksConnection(DatabaseConnection):
             cursor.fetchone()
             return True
         except Exception as e:
-            print(f"Databricks connection failed: {e}")
+            logger.warning("Databricks connection failed: %s", e)
             return False
         finally:
             if conn:
@@ -116,14 +230,17 @@ class DatabricksConnection(DatabaseConnection):
         conn = None
         try:
             # from databricks import sql # Import here, only when DatabricksConnection is used
-            conn = sql.connect(
-                server_hostname=self.db_credentials['server_hostname'],
-                http_path=self.db_credentials['http_path'],
-                token=self.db_credentials['access_token']
-            )
+            with time_stage("db_connect"):
+                conn = sql.connect(
+                    server_hostname=self.db_credentials['server_hostname'],
+                    http_path=self.db_credentials['http_path'],
+                    token=self.db_credentials['access_token']
+                )
             cursor = conn.cursor()
-            cursor.execute(query)
-            results = cursor.fetchall()
+            with time_stage("db_execute"):
+                cursor.execute(with_trace_comment(query))
+            with time_stage("db_fetch"):
+                results = cursor.fetchall()
             column_names = [desc[0] for desc in cursor.description]
             return results, column_names, None
         except Exception as e:
@@ -161,19 +278,21 @@ class DatabricksConnection(DatabaseConnection):
 class SnowflakeConnection(DatabaseConnection):
     """Concrete class for Snowflake database connections."""
     def __init__(self, db_credentials: Dict):
+        super().__init__()
         self.db_credentials = db_credentials
 
     def test_connection(self) -> bool:
         """Test Snowflake database connection."""
         conn = None
         try:
+            import snowflake.connector # Import here, only when SnowflakeConnection is used
             conn = snowflake.connector.connect(**self.db_credentials)
             cursor = conn.cursor()
             cursor.execute("SELECT 1;")
             cursor.fetchone()
             return True
         except Exception as e:
-            print(f"Snowflake connection failed: {e}")
+            logger.warning("Snowflake connection failed: %s", e)
             return False
         finally:
             if conn:
@@ -183,10 +302,14 @@ class SnowflakeConnection(DatabaseConnection):
         """Execute SQL query against Snowflake."""
         conn = None
         try:
-            conn = snowflake.connector.connect(**self.db_credentials)
+            import snowflake.connector # Import here, only when SnowflakeConnection is used
+            with time_stage("db_connect"):
+                conn = snowflake.connector.connect(**self.db_credentials)
             cursor = conn.cursor()
-            cursor.execute(query)
-            results = cursor.fetchall()
+            with time_stage("db_execute"):
+                cursor.execute(with_trace_comment(query))
+            with time_stage("db_fetch"):
+                results = cursor.fetchall()
             column_names = [desc[0] for desc in cursor.description]
             return results, column_names, None
         except Exception as e:
@@ -195,6 +318,28 @@ class SnowflakeConnection(DatabaseConnection):
             if conn:
                 conn.close()
 
+    def explain_query(self, query: str) -> Optional[Dict]:
+        """Estimate partitions and bytes scanned from the Snowflake compiler (no warehouse time)."""
+        conn = None
+        try:
+            import snowflake.connector # Import here, only when SnowflakeConnection is used
+            conn = snowflake.connector.connect(**self.db_credentials)
+            cursor = conn.cursor()
+            cursor.execute(f"EXPLAIN USING JSON {with_trace_comment(query)}")
+            plan = json.loads(cursor.fetchone()[0])
+            stats = plan.get("GlobalStats", {})
+            return {
+                "estimated_rows": None,
+                "estimated_cost": stats.get("partitionsAssigned"),
+                "bytes_scanned": stats.get("bytesAssigned"),
+                "partitions_total": stats.get("partitionsTotal")
+            }
+        except Exception as e:
+            return {"estimated_rows": None, "estimated_cost": None, "bytes_scanned": None, "error": str(e)}
+        finally:
+            if conn:
+                conn.close()
+
     def format_results(self, results: List, columns: Optional[List[str]], error: Optional[str]) -> str:
         """Format query results for Snowflake (and standard SQL)."""
         if error:
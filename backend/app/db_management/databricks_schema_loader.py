@@ -1,14 +1,17 @@
 # not using this currently
 
+import logging
 from typing import Dict
 
+logger = logging.getLogger(__name__)
+
 def load_databricks_schema(db_credentials: Dict) -> Dict:
     """
     Placeholder for loading schema information from a Databricks database.
     Implementation for Databricks schema loading needs to be added.
     For now, returns an empty schema.
     """
-    print("Databricks schema loading is a placeholder. Returning empty schema.")
+    logger.warning("Databricks schema loading is a placeholder. Returning empty schema.")
     return {"tables": [], "relationships": []}
 
 # You would implement Databricks specific schema loading functions here
@@ -1,9 +1,12 @@
 # not using this currently
 
+import logging
 import psycopg2
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Callable, Optional
 
-def load_postgres_schema(db_credentials: Dict) -> Dict:
+logger = logging.getLogger(__name__)
+
+def load_postgres_schema(db_credentials: Dict, progress: Optional[Callable[[str, int, Optional[int]], None]] = None) -> Dict:
     """Loads schema information from a PostgreSQL database."""
     conn = None
     try:
@@ -16,8 +19,10 @@ def load_postgres_schema(db_credentials: Dict) -> Dict:
             "relationships": []
         }
 
-        for table in tables:
-            print(f"Processing table: {table}")
+        for i, table in enumerate(tables):
+            logger.debug("Processing table: %s", table)
+            if progress:
+                progress("tables introspected", i, len(tables))
             columns = get_table_schema(table, cursor)
             row_count = get_table_size(table, cursor)
 
@@ -50,6 +55,9 @@ def load_postgres_schema(db_credentials: Dict) -> Dict:
                     })
             schema_data["tables"].append(table_entry)
 
+        if progress:
+            progress("tables introspected", len(tables), len(tables))
+
         cursor.close()
         return schema_data
 
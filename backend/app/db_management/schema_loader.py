@@ -1,51 +1,62 @@
 # app/db_management/schema_loader.py
 import os
 import json
-from typing import Dict, Any, List, Tuple
+import logging
+from typing import Dict, Any, List, Tuple, Callable, Optional
 from app.db_management.connection import DatabaseConnection, PostgresConnection, DatabricksConnection, SnowflakeConnection
-from app.db_management.postgres_schema_loader import load_postgres_schema 
-from app.db_management.databricks_schema_loader import load_databricks_schema 
-from app.db_management.snowflake_schema_loader import load_snowflake_schema
+from app.observability.tracing import span
+from app.config import data_path
 
 
+logger = logging.getLogger(__name__)
+
 path = os.path.dirname(os.path.abspath(__file__))
 
-SCHEMA_OUTPUT_DIR = f'{path}/schema' 
+SCHEMA_OUTPUT_DIR = data_path(f'{path}/schema', 'schema')
 
-def load_db_schema(db_connection: DatabaseConnection, db_type: str) -> Dict:
+def load_db_schema(db_connection: DatabaseConnection, db_type: str,
+                   progress: Optional[Callable[[str, int, Optional[int]], None]] = None) -> Dict:
     """
     Loads schema information from the database based on db_type.
     Dispatches to database-specific schema loaders.
     Now uses the provided DatabaseConnection object.
+    Each loader (and its database driver) is imported only when its db_type is used.
+    schema.json is replaced atomically, so readers keep the old schema until the new one is complete.
     """
     output_dir = SCHEMA_OUTPUT_DIR
     os.makedirs(output_dir, exist_ok=True)
 
     db_type_lower = db_type.lower()
 
-    if db_type_lower == 'postgres':
-        if isinstance(db_connection, PostgresConnection): 
-            schema_data = load_postgres_schema(db_connection.db_credentials) # Call postgres schema loader
-        else:
-            raise ValueError("Invalid DatabaseConnection object for PostgreSQL.") 
-    elif db_type_lower == 'databricks':
-        if isinstance(db_connection, DatabricksConnection):
-            schema_data = load_databricks_schema(db_connection.db_credentials) # Call databricks schema loader (placeholder for now)
-        else:
-             raise ValueError("Invalid DatabaseConnection object for Databricks.") # Type mismatch error
-    elif db_type_lower == 'snowflake':
-        if isinstance(db_connection, SnowflakeConnection):
-            schema_data = load_snowflake_schema(db_connection.db_credentials) # Call snowflake schema loader (placeholder for now)
+    with span(f"load_{db_type_lower}_schema"):
+        if db_type_lower == 'postgres':
+            if isinstance(db_connection, PostgresConnection): 
+                from app.db_management.postgres_schema_loader import load_postgres_schema # Imports psycopg2
+                schema_data = load_postgres_schema(db_connection.db_credentials, progress) # Call postgres schema loader
+            else:
+                raise ValueError("Invalid DatabaseConnection object for PostgreSQL.") 
+        elif db_type_lower == 'databricks':
+            if isinstance(db_connection, DatabricksConnection):
+                from app.db_management.databricks_schema_loader import load_databricks_schema
+                schema_data = load_databricks_schema(db_connection.db_credentials) # Call databricks schema loader (placeholder for now)
+            else:
+                 raise ValueError("Invalid DatabaseConnection object for Databricks.") # Type mismatch error
+        elif db_type_lower == 'snowflake':
+            if isinstance(db_connection, SnowflakeConnection):
+                from app.db_management.snowflake_schema_loader import load_snowflake_schema # Imports snowflake.connector
+                schema_data = load_snowflake_schema(db_connection.db_credentials, progress) # Call snowflake schema loader (placeholder for now)
+            else:
+                 raise ValueError("Invalid DatabaseConnection object for Snowflake.") # Type mismatch error
         else:
-             raise ValueError("Invalid DatabaseConnection object for Snowflake.") # Type mismatch error
-    else:
-        raise ValueError(f"Schema loading not implemented for database type: {db_type}")
+            raise ValueError(f"Schema loading not implemented for database type: {db_type}")
 
     output_file = os.path.join(output_dir, 'schema.json')
-    with open(output_file, 'w') as f:
+    temp_file = f"{output_file}.tmp"
+    with open(temp_file, 'w') as f:
         json.dump(schema_data, f, indent=4)
+    os.replace(temp_file, output_file)
 
-    print(f"Schema documentation generated in '{output_file}'")
+    logger.info("Schema documentation generated in '%s'", output_file)
     return schema_data
 
 
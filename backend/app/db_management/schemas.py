@@ -1,4 +1,5 @@
 # app/db_management/schemas.py
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 class PostgresDBCredentials(BaseModel):
@@ -21,3 +22,12 @@ class SnowflakeDBCredentials(BaseModel):
 
 class ExecuteQueryRequest(BaseModel):
     sql_query: str = Field(..., description="SQL query to execute")
+    confirmed: bool = Field(False, description="Run the query even if its estimated cost is above the thresholds")
+    question: Optional[str] = Field(None, description="Question the SQL was generated for, recorded as an example on success")
+    session_id: str = Field("default", description="Chat session the SQL was generated in, used to check it was not edited")
+
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str] = Field(..., description="Natural language questions to generate SQL for")
+    workers: int = Field(4, ge=1, le=64, description="Number of questions processed concurrently")
+    use_cache: bool = Field(False, description="Answer from the semantic cache when possible")
@@ -1,7 +1,10 @@
+import logging
 import snowflake.connector
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Callable, Optional
 
-def load_snowflake_schema(db_credentials: Dict) -> Dict:
+logger = logging.getLogger(__name__)
+
+def load_snowflake_schema(db_credentials: Dict, progress: Optional[Callable[[str, int, Optional[int]], None]] = None) -> Dict:
     """Loads schema information from a Snowflake database."""
     conn = None
     try:
@@ -14,8 +17,10 @@ def load_snowflake_schema(db_credentials: Dict) -> Dict:
             "relationships": []
         }
 
-        for table in tables:
-            print(f"Processing table: {table}")
+        for i, table in enumerate(tables):
+            logger.debug("Processing table: %s", table)
+            if progress:
+                progress("tables introspected", i, len(tables))
             columns = get_table_schema(table, cursor, db_credentials['database'], db_credentials['schema'])
             row_count = get_table_size(table, cursor)
 
@@ -42,6 +47,9 @@ def load_snowflake_schema(db_credentials: Dict) -> Dict:
 
             schema_data["tables"].append(table_entry)
 
+        if progress:
+            progress("tables introspected", len(tables), len(tables))
+
         return schema_data
 
     except Exception as e:
@@ -0,0 +1,193 @@
+# app/job_management/job_runner.py
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from app.observability.tracing import start_trace, traceparent
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Called by a build as progress(stage, done, total); total may be None when unknown
+ProgressCallback = Callable[[str, int, Optional[int]], None]
+# Receives job snapshots for the other API workers
+PublishCallback = Callable[[Dict], None]
+
+# Progress is published at most this often; status changes always are
+PUBLISH_INTERVAL_SECONDS = 1.0
+
+
+class Job:
+    """State of one background build, updated from its worker thread."""
+
+    def __init__(self, kind: str, publish: Optional[PublishCallback] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.stage: Optional[str] = None
+        self.stages: "OrderedDict[str, Dict[str, Optional[int]]]" = OrderedDict()
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Bumped on every change so watchers only send new snapshots
+        self.version = 0
+        self.future: Optional[Future] = None
+        # Trace of the build (see /debug/traces/) and of the request that submitted it
+        self.trace_id: Optional[str] = None
+        self.submitted_by = traceparent()
+        self._publish = publish
+        self._published_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def report(self, stage: str, done: int, total: Optional[int] = None) -> None:
+        """Progress callback handed to the build function."""
+        with self._lock:
+            self.stage = stage
+            self.stages[stage] = {"done": done, "total": total}
+            self.version += 1
+        if time.time() - self._published_at >= PUBLISH_INTERVAL_SECONDS or done == total:
+            self.publish()
+
+    def _set(self, **fields) -> None:
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+        self.publish()
+
+    def publish(self) -> None:
+        if self._publish is None:
+            return
+        self._published_at = time.time()
+        try:
+            self._publish(self.to_dict())
+        except Exception as e:
+            # Other workers see a stale snapshot, the build itself goes on
+            logger.warning("Failed to publish job %s: %s", self.id, e)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "stage": self.stage,
+                "stages": {name: dict(progress) for name, progress in self.stages.items()},
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "elapsed_seconds": round((self.finished_at or time.time()) - (self.started_at or self.created_at), 2),
+                "trace_id": self.trace_id
+            }
+
+
+class JobRunner:
+    """
+    Runs schema, metadata and vector store builds on a small thread pool.
+    Only one job per kind can be queued or running: submitting a kind that is already
+    in progress returns the existing job instead of starting a duplicate build.
+    Finished jobs are kept for status queries, oldest dropped first.
+    """
+
+    def __init__(self, max_workers: int = 2, max_history: int = 100, publish: Optional[PublishCallback] = None):
+        self.max_history = max_history
+        self.publish = publish
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="build-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def _run(self, job: Job, build: Callable[[ProgressCallback], Optional[Dict]]) -> None:
+        try:
+            with start_trace(f"job {job.kind}", job_id=job.id, submitted_by=job.submitted_by) as trace:
+                job._set(status=RUNNING, started_at=time.time(), trace_id=trace.trace_id)
+                logger.info("Job %s %s started", job.kind, job.id)
+                try:
+                    result = build(job.report)
+                    job._set(status=SUCCEEDED, result=result or {}, finished_at=time.time())
+                    logger.info("Job %s %s succeeded", job.kind, job.id)
+                except Exception as e:
+                    trace.root.attributes["error"] = str(e)
+                    job._set(status=FAILED, error=str(e), finished_at=time.time())
+                    logger.error("Job %s %s failed: %s", job.kind, job.id, e)
+        finally:
+            with self._lock:
+                if self._active.get(job.kind) is job:
+                    del self._active[job.kind]
+
+    def submit(self, kind: str, build: Callable[[ProgressCallback], Optional[Dict]]) -> Tuple[Job, bool]:
+        """Queue a build; returns (job, created) where created is False for an existing job of that kind."""
+        with self._lock:
+            active = self._active.get(kind)
+            if active is not None:
+                return active, False
+            job = Job(kind, self.publish)
+            self._active[kind] = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_history:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if not oldest.finished:
+                    break
+                del self._jobs[oldest_id]
+            job.future = self._executor.submit(self._run, job, build)
+        job.publish()
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    async def wait(self, job: Job) -> Job:
+        """Wait on the event loop until the job has finished."""
+        await asyncio.wrap_future(job.future)
+        return job
+
+    async def watch(self, job: Job, interval: float = 0.5) -> AsyncIterator[Dict]:
+        """Snapshots of the job whenever it changes, ending with its final state."""
+        version = -1
+        while True:
+            if job.version != version:
+                version = job.version
+                snapshot = job.to_dict()
+                yield snapshot
+                if snapshot["status"] in (SUCCEEDED, FAILED):
+                    return
+            await asyncio.sleep(interval)
+
+
+async def watch_snapshots(load: Callable[[], Optional[Dict]], interval: float = 0.5) -> AsyncIterator[Dict]:
+    """
+    Like JobRunner.watch for a job running in another worker, polling its published snapshots.
+    Ends with the final state, or when the snapshot disappears.
+    """
+    previous = None
+    while True:
+        snapshot = await asyncio.to_thread(load)
+        if snapshot is None:
+            return
+        if snapshot != previous:
+            previous = snapshot
+            yield snapshot
+            if snapshot["status"] in (SUCCEEDED, FAILED):
+                return
+        await asyncio.sleep(interval)
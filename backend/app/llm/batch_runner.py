@@ -0,0 +1,116 @@
+# app/llm/batch_runner.py
+from __future__ import annotations
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional
+
+from app.llm.llm_chain import agenerate_sql_query_with_llm
+from app.llm.rate_limiter import BATCH
+from app.llm.semantic_cache import SemanticCache
+from app.llm.sql_validator import SchemaIndex
+
+if TYPE_CHECKING:
+    from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+
+
+async def run_batch(
+    questions: List[str],
+    embeddings: AzureOpenAIEmbeddings,
+    llm: AzureChatOpenAI,
+    vector_store_path: str,
+    db_type: str,
+    workers: int = 4,
+    cache: Optional[SemanticCache] = None,
+    schema_fingerprint: str = "",
+    schema_index: Optional[SchemaIndex] = None
+) -> AsyncIterator[Dict]:
+    """
+    Generate SQL for a list of questions with a fixed number of concurrent workers.
+    Every question runs with an empty chat history so results do not contaminate each
+    other. Results are yielded in completion order, each tagged with its input index, with
+    the validation errors left after the repair attempts (empty when the SQL is valid).
+    """
+    pending: asyncio.Queue = asyncio.Queue()
+    for index, question in enumerate(questions):
+        pending.put_nowait((index, question))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        while True:
+            try:
+                index, question = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            validation_errors: List[str] = []
+            try:
+                response, validation_errors = await agenerate_sql_query_with_llm(
+                    user_query=question,
+                    chat_history=[],
+                    embeddings=embeddings,
+                    llm=llm,
+                    vector_store_path=vector_store_path,
+                    db_type=db_type,
+                    cache=cache,
+                    schema_fingerprint=schema_fingerprint,
+                    schema_index=schema_index,
+                    priority=BATCH
+                )
+                error = response if response.startswith("Error") else None
+            except Exception as e:
+                response, error = None, str(e)
+            await results.put({
+                "index": index,
+                "question": question,
+                "sql_query": None if error else response,
+                "error": error,
+                "validation_errors": validation_errors,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+            })
+
+    tasks = [asyncio.create_task(worker()) for _ in range(max(1, min(workers, len(questions))))]
+    try:
+        for _ in range(len(questions)):
+            yield await results.get()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def main():
+    """Run a batch from the command line and write JSONL results to stdout."""
+    from app.llm.llm_chain import initialize_llm
+    from app.llm.vector_store import VECTOR_STORE_PATH
+    from app.llm.sql_validator import load_schema_index
+    from app.db_management.schema_loader import SCHEMA_OUTPUT_DIR
+
+    parser = argparse.ArgumentParser(description="Generate SQL for a file of questions (one per line).")
+    parser.add_argument("questions_file")
+    parser.add_argument("--db-type", default="postgres")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--vector-store", default=VECTOR_STORE_PATH)
+    parser.add_argument("--no-validate", action="store_true", help="Skip SQL validation against schema.json")
+    args = parser.parse_args()
+
+    with open(args.questions_file, 'r') as f:
+        questions = [line.strip() for line in f if line.strip()]
+
+    llm, embeddings = initialize_llm()
+    schema_index = None if args.no_validate else load_schema_index(f"{SCHEMA_OUTPUT_DIR}/schema.json")
+
+    async def run():
+        started = time.perf_counter()
+        async for result in run_batch(questions, embeddings, llm, args.vector_store, args.db_type,
+                                      workers=args.workers, schema_index=schema_index):
+            sys.stdout.write(json.dumps(result) + "\n")
+            sys.stdout.flush()
+        print(f"Generated {len(questions)} queries in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
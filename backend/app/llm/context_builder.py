@@ -0,0 +1,158 @@
+# app/llm/context_builder.py
+import re
+import logging
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Retrieved chunks come from a splitter with chunk_overlap=200, so neighbouring
+# chunks share up to that many characters.
+MAX_OVERLAP_CHARS = 200
+MIN_OVERLAP_CHARS = 40
+
+TABLE_NAME_PATTERN = re.compile(r'"table"\s*:\s*"([^"]+)"')
+
+ScoredChunk = Tuple[str, float]
+
+HISTORY_PREFIXES = {"user": "User", "assistant": "Assistant", "summary": "Earlier conversation"}
+
+
+@lru_cache(maxsize=1)
+def _get_encoding(encoding_name: str):
+    """Load the local tiktoken encoding once, or None if it is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logger.warning("Tokenizer '%s' unavailable, estimating tokens from length: %s", encoding_name, e)
+        return None
+
+
+def count_tokens(text: str, encoding_name: str = "o200k_base") -> int:
+    """Count tokens in text with the local tokenizer."""
+    if not text:
+        return 0
+    encoding = _get_encoding(encoding_name)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _strip_overlap(kept: str, chunk: str) -> str:
+    """Remove the part of chunk that repeats the start or end of an already kept chunk."""
+    max_len = min(len(kept), len(chunk), MAX_OVERLAP_CHARS)
+    for size in range(max_len, MIN_OVERLAP_CHARS - 1, -1):
+        if kept.endswith(chunk[:size]):
+            return chunk[size:].lstrip()
+    for size in range(max_len, MIN_OVERLAP_CHARS - 1, -1):
+        if kept.startswith(chunk[-size:]):
+            return chunk[:-size].rstrip()
+    return chunk
+
+
+def dedupe_chunks(chunks: List[ScoredChunk]) -> List[ScoredChunk]:
+    """Drop duplicate chunks and trim text shared with higher-scored chunks, best score first."""
+    kept: List[ScoredChunk] = []
+    for text, score in sorted(chunks, key=lambda c: c[1], reverse=True):
+        text = text.strip()
+        if not text or any(text in kept_text for kept_text, _ in kept):
+            continue
+        for kept_text, _ in kept:
+            text = _strip_overlap(kept_text, text)
+        if text:
+            kept.append((text, score))
+    return kept
+
+
+def extract_table_names(schema_chunks: List[ScoredChunk]) -> List[str]:
+    """Find the table names mentioned in retrieved schema chunks."""
+    names = []
+    for text, _ in schema_chunks:
+        for name in TABLE_NAME_PATTERN.findall(text):
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def filter_metadata_chunks(metadata_chunks: List[ScoredChunk], table_names: List[str]) -> List[ScoredChunk]:
+    """Keep only metadata chunks that mention at least one of the retrieved tables."""
+    if not table_names:
+        return metadata_chunks
+    pattern = re.compile(r"\b(" + "|".join(re.escape(name) for name in table_names) + r")\b", re.IGNORECASE)
+    return [chunk for chunk in metadata_chunks if pattern.search(chunk[0])]
+
+
+def _format_history(chat_history: List[Dict[str, str]], token_budget: int, encoding_name: str) -> Tuple[str, int]:
+    """Take the most recent messages that fit in the history budget, oldest first."""
+    lines: List[str] = []
+    used = 0
+    for msg in reversed(chat_history):
+        prefix = HISTORY_PREFIXES.get(msg['role'], "Assistant")
+        line = f"{prefix}: {msg['content']}"
+        tokens = count_tokens(line, encoding_name)
+        if used + tokens > token_budget:
+            break
+        lines.insert(0, line)
+        used += tokens
+    return "\n".join(lines), used
+
+
+def select_examples(examples: List[str], token_budget: int, encoding_name: str = "o200k_base") -> Tuple[str, int]:
+    """Take examples in the given (best first) order while they fit in the examples budget."""
+    selected: List[str] = []
+    used = 0
+    for example in examples:
+        tokens = count_tokens(example, encoding_name)
+        if used + tokens > token_budget:
+            break
+        selected.append(example)
+        used += tokens
+    return "\n\n".join(selected), used
+
+
+def assemble_context(
+    user_query: str,
+    schema_chunks: List[ScoredChunk],
+    metadata_chunks: List[ScoredChunk],
+    chat_history: List[Dict[str, str]],
+    token_budget: int,
+    history_token_budget: int,
+    encoding_name: str = "o200k_base"
+) -> Tuple[str, str, str, Dict[str, int]]:
+    """
+    Build the schema, metadata and history sections of the prompt within a token budget.
+    History is filled first from its own share, then schema and metadata chunks are added
+    in order of relevance score until the remaining budget is spent.
+    Returns (schema_context, metadata_context, history, tokens used per section).
+    """
+    usage = {"query": count_tokens(user_query, encoding_name)}
+
+    history_str, usage["history"] = _format_history(
+        chat_history, min(history_token_budget, token_budget), encoding_name
+    )
+    remaining = token_budget - usage["history"]
+
+    schema_chunks = dedupe_chunks(schema_chunks)
+    metadata_chunks = filter_metadata_chunks(
+        dedupe_chunks(metadata_chunks), extract_table_names(schema_chunks)
+    )
+
+    candidates = [(score, "schema", text) for text, score in schema_chunks]
+    candidates += [(score, "metadata", text) for text, score in metadata_chunks]
+    candidates.sort(key=lambda c: c[0], reverse=True)
+
+    selected: Dict[str, List[str]] = {"schema": [], "metadata": []}
+    usage["schema"] = 0
+    usage["metadata"] = 0
+    for _, section, text in candidates:
+        tokens = count_tokens(text, encoding_name)
+        # Always keep the best schema chunk, the query cannot be answered without one.
+        if tokens > remaining and (section != "schema" or selected["schema"]):
+            continue
+        selected[section].append(text)
+        usage[section] += tokens
+        remaining -= tokens
+
+    usage["total"] = usage["query"] + usage["history"] + usage["schema"] + usage["metadata"]
+    return "\n\n".join(selected["schema"]), "\n\n".join(selected["metadata"]), history_str, usage
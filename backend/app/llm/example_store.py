@@ -0,0 +1,65 @@
+# app/llm/example_store.py
+import os
+import hashlib
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from app.config import data_path
+from app.llm.semantic_cache import normalize_question
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+
+path = os.path.dirname(os.path.abspath(__file__))
+
+EXAMPLE_STORE_PATH = data_path(f"{path}/example_store", "example_store")
+
+# (question, sql, tables used, similarity score)
+Example = Tuple[str, str, List[str], float]
+
+
+class ExampleStore:
+    """
+    Local store of question/SQL pairs that executed successfully.
+    Questions are embedded for similarity search; the SQL, dialect and tables used are
+    kept as document metadata so examples can be filtered against the current schema.
+    """
+
+    def __init__(self, embeddings: "Embeddings", persist_dir: str = EXAMPLE_STORE_PATH):
+        from langchain_chroma import Chroma # Imported on first use, chromadb is slow to import
+        self.vector_store = Chroma(
+            collection_name="sql_examples",
+            persist_directory=persist_dir,
+            embedding_function=embeddings
+        )
+
+    def record(self, question: str, sql: str, db_type: str, tables: List[str]) -> None:
+        """Store a successful pair; the same question for a dialect replaces its previous SQL."""
+        example_id = hashlib.sha1(f"{db_type}:{normalize_question(question)}".encode("utf-8")).hexdigest()
+        self.vector_store.add_texts(
+            texts=[question],
+            metadatas=[{"db_type": db_type, "sql": sql, "tables": ",".join(sorted(t.lower() for t in tables))}],
+            ids=[example_id]
+        )
+
+    def find_similar(self, question: str, db_type: str, k: int = 3,
+                     min_score: float = 0.0) -> List[Example]:
+        """Top-k examples for the dialect whose question is similar to the given one."""
+        results = self.vector_store.similarity_search_with_relevance_scores(
+            question,
+            k=k,
+            filter={"db_type": db_type}
+        )
+        examples = []
+        for doc, score in results:
+            if score < min_score:
+                continue
+            tables = [t for t in doc.metadata.get("tables", "").split(",") if t]
+            examples.append((doc.page_content, doc.metadata["sql"], tables, score))
+        return examples
+
+    def count(self) -> int:
+        return len(self.vector_store.get(include=[])["ids"])
+
+def format_example(question: str, sql: str) -> str:
+    """Render an example the way it is shown to the LLM."""
+    return f"Question: {question}\nSQL:\n{sql}"
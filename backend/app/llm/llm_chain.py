@@ -1,71 +1,511 @@
-from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
-from typing import List, Dict
-from app.config import load_env_variables
-from app.llm.prompts import get_prompt_template
-from app.llm.vector_store import get_relevant_info
+from __future__ import annotations
+import time
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple, AsyncIterator
+from app.config import get_settings
+from app.llm.prompts import get_prompt_template, get_repair_prompt_template
+from app.llm.rules_engine import DEFAULT_TENANT, get_rules_repository, rules_fingerprint
+from app.llm.vector_store import aget_relevant_documents
+from app.llm.context_builder import assemble_context, select_examples, count_tokens
+from app.llm.example_store import ExampleStore, format_example
+from app.llm.semantic_cache import SemanticCache, history_digest
+from app.llm.sql_validator import SchemaIndex, extract_sql, validate_sql
+from app.llm.rate_limiter import (INTERACTIVE, MAX_RATE_LIMIT_RETRIES, get_rate_limiter,
+                                  get_retry_after, retry_delay, estimate_prompt_tokens, acall_with_rate_limit)
+from app.observability.metrics import time_stage, observe_stage, CACHE_LOOKUPS, TOKENS, LLM_CALLS
+from app.observability.tracing import record_span
+
+if TYPE_CHECKING:
+    from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models import BaseChatModel
+    from app.llm.rate_limited_embeddings import RateLimitedEmbeddings
+
+logger = logging.getLogger(__name__)
+
+# Retrieve more chunks than fit in the budget so the assembler can pick by relevance
+RETRIEVAL_CANDIDATES = 8
+
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+_llm_calls_in_flight = 0
+
+
+def get_llm_semaphore() -> asyncio.Semaphore:
+    """Shared semaphore capping the number of in-flight LLM calls."""
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(get_settings()['llm_max_concurrency'])
+    return _llm_semaphore
+
+
+@asynccontextmanager
+async def llm_slot() -> AsyncIterator[None]:
+    """Hold a slot of the LLM semaphore for one call, counted for llm_calls_in_flight."""
+    global _llm_calls_in_flight
+    async with get_llm_semaphore():
+        _llm_calls_in_flight += 1
+        try:
+            yield
+        finally:
+            _llm_calls_in_flight -= 1
+
+
+def llm_calls_in_flight() -> int:
+    """Slots of the LLM semaphore currently taken."""
+    return _llm_calls_in_flight
 
 
 def initialize_llm():
-    """Initialize Azure OpenAI LLM and Embeddings."""
-    env_vars = load_env_variables()
-    embeddings = AzureOpenAIEmbeddings(
+    """
+    Initialize Azure OpenAI LLM and Embeddings.
+    Client retries are disabled: the shared rate limiters retry 429s using retry-after
+    and server errors, timeouts and connection errors with backoff (see retry_delay).
+    """
+    from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings # Slow to import, only needed here
+    from app.llm.rate_limited_embeddings import RateLimitedEmbeddings
+
+    env_vars = get_settings()
+    embeddings = RateLimitedEmbeddings(AzureOpenAIEmbeddings(
         azure_endpoint=env_vars['azure_endpoint'],
         api_key=env_vars['api_key'],
         api_version=env_vars['api_version'],
-        azure_deployment=env_vars['embedding_deployment']
-    )
+        azure_deployment=env_vars['embedding_deployment'],
+        max_retries=0
+    ), priority=INTERACTIVE)
 
     llm = AzureChatOpenAI(
         azure_endpoint=env_vars['azure_endpoint'],
         api_key=env_vars['api_key'],
         api_version=env_vars['api_version'],
         azure_deployment=env_vars['chat_deployment'],
-        temperature=0
+        temperature=0,
+        max_retries=0
     )
     return llm, embeddings
 
 
-def generate_sql_query_with_llm(
+_llm_clients: Optional[Tuple[AzureChatOpenAI, RateLimitedEmbeddings]] = None
+_llm_clients_lock = threading.Lock()
+
+
+def get_llm_clients() -> Tuple[AzureChatOpenAI, RateLimitedEmbeddings]:
+    """The shared LLM and embeddings clients, built by the first caller instead of at import."""
+    global _llm_clients
+    if _llm_clients is None:
+        with _llm_clients_lock:
+            if _llm_clients is None:
+                _llm_clients = initialize_llm()
+    return _llm_clients
+
+
+def set_llm_clients(llm: BaseChatModel, embeddings: Embeddings) -> None:
+    """Use the given clients instead of building Azure OpenAI ones (the offline benchmarks use fakes)."""
+    global _llm_clients
+    with _llm_clients_lock:
+        _llm_clients = (llm, embeddings)
+
+
+def llm_clients_ready() -> bool:
+    return _llm_clients is not None
+
+
+async def ainvoke_chat(chain, inputs: Dict[str, str], priority: int = INTERACTIVE):
+    """Invoke a chat chain through the chat rate limiter and the in-flight semaphore."""
+    async def call():
+        async with llm_slot():
+            return await chain.ainvoke(inputs)
+
+    return await acall_with_rate_limit(
+        get_rate_limiter("chat"), estimate_prompt_tokens(inputs), priority, call
+    )
+
+
+def assemble_prompt_inputs(
+    user_query: str,
+    chat_history: List[Dict[str, str]],
+    schema_docs: List[Tuple[str, float]],
+    metadata_docs: List[Tuple[str, float]],
+    examples: Optional[List[str]] = None
+) -> Optional[Dict[str, str]]:
+    """Assemble the prompt variables from retrieved chunks, None if no schema was found."""
+    if not schema_docs:
+        return None
+
+    env_vars = get_settings()
+    with time_stage("prompt_build"):
+        examples_text, examples_tokens = select_examples(
+            examples or [], env_vars['examples_token_budget'], env_vars['tokenizer_encoding']
+        )
+        schema_context, metadata_context, history_str, token_usage = assemble_context(
+            user_query,
+            schema_docs,
+            metadata_docs,
+            chat_history,
+            token_budget=env_vars['context_token_budget'] - examples_tokens,
+            history_token_budget=env_vars['history_token_budget'],
+            encoding_name=env_vars['tokenizer_encoding']
+        )
+    token_usage["examples"] = examples_tokens
+    token_usage["total"] += examples_tokens
+    for section, tokens in token_usage.items():
+        if section != "total":
+            TOKENS.inc(tokens, section=section)
+    logger.debug("Context tokens used: %s", token_usage)
+
+    return {
+        "schema": schema_context,
+        # If metadata_context is empty, provide a placeholder
+        "context": metadata_context if metadata_context else "No additional context available.",
+        "examples": examples_text if examples_text else "No similar examples available.",
+        "history": history_str,
+        "query": user_query
+    }
+
+
+async def abuild_prompt_inputs(
     user_query: str,
     chat_history: List[Dict[str, str]],
     embeddings: AzureOpenAIEmbeddings,
-    llm: AzureChatOpenAI,
     vector_store_path: str,
-    db_type: str
-) -> str:
-    """Generate SQL query using context and chat history."""
-
-    schema_context, metadata_context = get_relevant_info(
-        user_query,
-        embeddings,
-        vector_store_path 
+    query_vector: Optional[List[float]] = None,
+    example_store: Optional[ExampleStore] = None,
+    db_type: str = "",
+    schema_index: Optional[SchemaIndex] = None
+) -> Optional[Dict[str, str]]:
+    """
+    Retrieve context for the query and assemble the prompt variables, None if no schema is found.
+    With an example store, similar solved questions are retrieved alongside the schema;
+    examples using tables missing from the current schema index are skipped.
+    """
+    async def find_examples() -> List[str]:
+        if example_store is None:
+            return []
+        env_vars = get_settings()
+        with time_stage("example_search"):
+            found = await asyncio.to_thread(
+                example_store.find_similar,
+                user_query,
+                db_type,
+                k=env_vars['example_store_top_k'],
+                min_score=env_vars['example_store_min_score']
+            )
+        return [
+            format_example(question, sql)
+            for question, sql, tables, _ in found
+            if schema_index is None or all(schema_index.has_table(t) for t in tables)
+        ]
+
+    (schema_docs, metadata_docs), examples = await asyncio.gather(
+        aget_relevant_documents(
+            user_query,
+            embeddings,
+            vector_store_path,
+            num_results=RETRIEVAL_CANDIDATES,
+            query_vector=query_vector
+        ),
+        find_examples()
     )
+    return assemble_prompt_inputs(user_query, chat_history, schema_docs, metadata_docs, examples)
 
-    if not schema_context:
-        return "Error: No schema information available."
 
-    # Convert chat history to string format
-    history_str = "\n".join([
-        f"User: {msg['content']}" if msg['role'] == 'user' else f"Assistant: {msg['content']}"
-        for msg in chat_history[-6:]  # Last 3 exchanges (6 messages)
+async def avalidate_and_repair(
+    response: str,
+    prompt_inputs: Dict[str, str],
+    llm: AzureChatOpenAI,
+    db_type: str,
+    schema_index: Optional[SchemaIndex],
+    priority: int = INTERACTIVE,
+    tenant: str = DEFAULT_TENANT
+) -> Tuple[str, List[str], int]:
+    """
+    Validate the generated SQL against the schema and ask the LLM to repair it while errors remain.
+    Returns (final response, remaining errors, number of repair attempts).
+    """
+    if schema_index is None:
+        return response, [], 0
+
+    max_attempts = get_settings()['sql_repair_attempts']
+    with time_stage("validation"):
+        errors = validate_sql(extract_sql(response), db_type, schema_index)
+    attempts = 0
+    while errors and attempts < max_attempts:
+        attempts += 1
+        logger.info("SQL validation failed (attempt %d): %s", attempts, errors)
+        chain = get_repair_prompt_template() | llm
+        rule_set = get_rules_repository().get(db_type, tenant)
+        LLM_CALLS.inc(purpose="repair")
+        with time_stage("llm_repair"):
+            repaired = await ainvoke_chat(chain, {
+                "db_type": rule_set.display_name,
+                "cheat_sheet": "\n".join(rule_set.cheat_sheet),
+                "schema": prompt_inputs["schema"],
+                "query": prompt_inputs["query"],
+                "sql": extract_sql(response),
+                "errors": "\n".join(f"- {error}" for error in errors)
+            }, priority)
+        response = repaired.content
+        with time_stage("validation"):
+            errors = validate_sql(extract_sql(response), db_type, schema_index)
+    return response, errors, attempts
+
+
+async def agenerate_candidates(
+    prompt_template,
+    prompt_inputs: Dict[str, str],
+    llm: AzureChatOpenAI,
+    n: int,
+    priority: int = INTERACTIVE
+) -> List[str]:
+    """Ask for n completions of the same prompt in a single call, sampled for diversity."""
+    messages = prompt_template.format_messages(**prompt_inputs)
+    temperature = get_settings()['candidate_temperature']
+
+    async def call():
+        async with llm_slot():
+            return await llm.agenerate([messages], n=n, temperature=temperature)
+
+    LLM_CALLS.inc(purpose="candidates")
+    with time_stage("llm_candidates"):
+        result = await acall_with_rate_limit(
+            get_rate_limiter("chat"),
+            estimate_prompt_tokens(prompt_inputs, completion_tokens=512 * n),
+            priority,
+            call
+        )
+    texts = [generation.text for generation in result.generations[0]]
+    TOKENS.inc(sum(count_tokens(text) for text in texts), section="completion")
+    return texts
+
+
+def _cost_key(estimate: Optional[Dict]) -> Tuple[float, float]:
+    """Sort key for plan estimates, unknown costs last."""
+    if not estimate or estimate.get("error"):
+        return float("inf"), float("inf")
+    cost = estimate.get("estimated_cost")
+    scanned = estimate.get("bytes_scanned")
+    return (float("inf") if cost is None else cost), (float("inf") if scanned is None else scanned)
+
+
+async def aselect_cheapest_candidate(
+    candidates: List[str],
+    db_type: str,
+    schema_index: Optional[SchemaIndex],
+    db_connection=None
+) -> Tuple[str, str]:
+    """
+    Pick the candidate with the lowest estimated cost among those that pass schema validation.
+    Plans are estimated in parallel with the connection's EXPLAIN; without a connection
+    (or without valid candidates) the first valid (or first) candidate is returned.
+    Returns (chosen response, summary of the selection).
+    """
+    valid = [
+        c for c in candidates
+        if schema_index is None or not validate_sql(extract_sql(c), db_type, schema_index)
+    ]
+    if not valid:
+        return candidates[0], f"No valid candidate among {len(candidates)}, repairing the first one"
+    if db_connection is None or len(valid) == 1:
+        return valid[0], f"{len(valid)} of {len(candidates)} candidates valid"
+
+    estimates = await asyncio.gather(*[
+        asyncio.to_thread(db_connection.estimate_query_cost, extract_sql(c)) for c in valid
     ])
+    ranked = sorted(zip(valid, estimates), key=lambda pair: _cost_key(pair[1]))
+    chosen, estimate = ranked[0]
+    cost = _cost_key(estimate)[0]
+    cost_text = "unknown" if cost == float("inf") else f"{cost:,.2f}"
+    return chosen, f"{len(valid)} of {len(candidates)} candidates valid, chose estimated cost {cost_text}"
+
+
+async def lookup_cached_response(
+    user_query: str,
+    embeddings: AzureOpenAIEmbeddings,
+    db_type: str,
+    cache: Optional[SemanticCache],
+    schema_fingerprint: str,
+    history_key: str
+) -> Tuple[Optional[str], Optional[List[float]]]:
+    """
+    Look the question up in the semantic cache.
+    Returns (cached response or None, query embedding if one was computed for the lookup).
+    """
+    if cache is None:
+        return None, None
+    cached = cache.lookup_exact(user_query, db_type, schema_fingerprint, history_key)
+    if cached is not None:
+        CACHE_LOOKUPS.inc(result="exact")
+        return cached, None
+    with time_stage("retrieval_embedding"):
+        query_vector = await embeddings.aembed_query(user_query)
+    cached = cache.lookup(user_query, query_vector, db_type, schema_fingerprint, history_key)
+    CACHE_LOOKUPS.inc(result="semantic" if cached is not None else "miss")
+    return cached, query_vector
+
+
+async def agenerate_sql_query_with_llm(
+    user_query: str,
+    chat_history: List[Dict[str, str]],
+    embeddings: AzureOpenAIEmbeddings,
+    llm: AzureChatOpenAI,
+    vector_store_path: str,
+    db_type: str,
+    cache: Optional[SemanticCache] = None,
+    schema_fingerprint: str = "",
+    schema_index: Optional[SchemaIndex] = None,
+    priority: int = INTERACTIVE,
+    example_store: Optional[ExampleStore] = None,
+    tenant: str = DEFAULT_TENANT
+) -> Tuple[str, List[str]]:
+    """
+    Generate SQL query using context and chat history, bounded by the shared LLM semaphore.
+    With a schema index the SQL is validated and repaired before it is returned.
+    Returns (response, validation errors that remain after the repair attempts).
+    """
+
+    history_key = history_digest(chat_history)
+    # Cached answers are only valid for the rules they were generated with
+    schema_fingerprint = f"{schema_fingerprint}:{rules_fingerprint(db_type, tenant)}"
+    cached, query_vector = await lookup_cached_response(
+        user_query, embeddings, db_type, cache, schema_fingerprint, history_key
+    )
+    if cached is not None:
+        return cached, []
+
+    prompt_inputs = await abuild_prompt_inputs(
+        user_query, chat_history, embeddings, vector_store_path, query_vector=query_vector,
+        example_store=example_store, db_type=db_type, schema_index=schema_index
+    )
+    if prompt_inputs is None:
+        return "Error: No schema information available.", []
 
     try:
-        # Get dynamic prompt template based on user query
-        prompt_template = get_prompt_template(user_query, db_type)
-        
-        print('prompt_template:', prompt_template)
-        # If metadata_context is empty, provide a placeholder
-        context_to_use = metadata_context if metadata_context else "No additional context available."
-        
+        with time_stage("prompt_template"):
+            prompt_template = get_prompt_template(user_query, db_type, tenant)
         chain = prompt_template | llm
-        response = chain.invoke({
-            "schema": schema_context,
-            "context": context_to_use,
-            "history": history_str,
-            "query": user_query
-        })
-        return response.content
+        LLM_CALLS.inc(purpose="generate")
+        with time_stage("llm_total"):
+            response = await ainvoke_chat(chain, prompt_inputs, priority)
+        TOKENS.inc(count_tokens(response.content), section="completion")
+        content, errors, _ = await avalidate_and_repair(
+            response.content, prompt_inputs, llm, db_type, schema_index, priority, tenant
+        )
+        if cache is not None and query_vector is not None and not errors:
+            cache.store(user_query, query_vector, content, db_type, schema_fingerprint, history_key)
+        return content, errors
+    except Exception as e:
+        return f"Error generating query: {str(e)}", []
+
+
+async def stream_sql_query_with_llm(
+    user_query: str,
+    chat_history: List[Dict[str, str]],
+    embeddings: AzureOpenAIEmbeddings,
+    llm: AzureChatOpenAI,
+    vector_store_path: str,
+    db_type: str,
+    cache: Optional[SemanticCache] = None,
+    schema_fingerprint: str = "",
+    schema_index: Optional[SchemaIndex] = None,
+    priority: int = INTERACTIVE,
+    example_store: Optional[ExampleStore] = None,
+    candidates: int = 1,
+    db_connection=None,
+    tenant: str = DEFAULT_TENANT
+) -> AsyncIterator[Tuple[str, str]]:
+    """
+    Generate SQL query token by token.
+    Yields (event, data) pairs: "status" for each stage, "token" for every streamed
+    chunk, then "sql_query" with the complete response or "error".
+    When a semantic cache is given, a cached response for a similar question is
+    returned as a single "sql_query" event without retrieval or generation.
+    With a schema index the SQL is validated (and repaired) before "sql_query";
+    errors that remain after the repair attempts are sent as a "validation" event.
+    With candidates > 1 the completions are not streamed: n candidates are generated in
+    one call and the valid one with the cheapest EXPLAIN estimate is returned.
+    """
+    history_key = history_digest(chat_history)
+    # Cached answers are only valid for the rules they were generated with
+    schema_fingerprint = f"{schema_fingerprint}:{rules_fingerprint(db_type, tenant)}"
+    cached, query_vector = await lookup_cached_response(
+        user_query, embeddings, db_type, cache, schema_fingerprint, history_key
+    )
+    if cached is not None:
+        yield "status", "Answered from cache"
+        yield "sql_query", cached
+        return
+
+    yield "status", "Retrieving schema context..."
+    prompt_inputs = await abuild_prompt_inputs(
+        user_query, chat_history, embeddings, vector_store_path, query_vector=query_vector,
+        example_store=example_store, db_type=db_type, schema_index=schema_index
+    )
+    if prompt_inputs is None:
+        yield "error", "Error: No schema information available."
+        return
+
+    yield "status", "Generating SQL..."
+    try:
+        with time_stage("prompt_template"):
+            prompt_template = get_prompt_template(user_query, db_type, tenant)
+        chain = prompt_template | llm
+
+        if candidates > 1:
+            yield "status", f"Generating {candidates} candidate queries..."
+            responses = await agenerate_candidates(prompt_template, prompt_inputs, llm, candidates, priority)
+            yield "status", "Validating candidates and estimating cost..."
+            response, summary = await aselect_cheapest_candidate(responses, db_type, schema_index, db_connection)
+            yield "status", summary
+        else:
+            limiter = get_rate_limiter("chat")
+            prompt_tokens = estimate_prompt_tokens(prompt_inputs)
+            parts: List[str] = []
+            LLM_CALLS.inc(purpose="generate")
+            started = time.perf_counter()
+            for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+                await limiter.acquire(prompt_tokens, priority)
+                try:
+                    async with llm_slot():
+                        async for chunk in chain.astream(prompt_inputs):
+                            if chunk.content:
+                                if not parts:
+                                    # Includes rate limiter and semaphore waits, as the user sees it
+                                    observe_stage("llm_first_token", time.perf_counter() - started)
+                                parts.append(chunk.content)
+                                yield "token", chunk.content
+                    limiter.record_success()
+                    break
+                except Exception as e:
+                    # A stream that already sent tokens cannot be retried transparently
+                    if parts:
+                        raise
+                    retry_after = get_retry_after(e)
+                    delay = retry_delay(limiter, e, attempt)
+                    if delay is None:
+                        raise
+                    if retry_after is not None:
+                        yield "status", f"Rate limited, retrying in {retry_after:.1f}s..."
+                    else:
+                        yield "status", f"Azure OpenAI call failed, retrying in {delay:.1f}s..."
+                        await asyncio.sleep(delay)
+            response = "".join(parts)
+            observe_stage("llm_total", time.perf_counter() - started)
+            record_span("chain.astream", started, attempts=attempt + 1, chunks=len(parts))
+            TOKENS.inc(count_tokens(response), section="completion")
+
+        if schema_index is not None and candidates <= 1:
+            yield "status", "Validating SQL..."
+        response, errors, attempts = await avalidate_and_repair(
+            response, prompt_inputs, llm, db_type, schema_index, priority, tenant
+        )
+        if attempts:
+            yield "status", f"Repaired SQL after {attempts} attempt(s)"
+        if errors:
+            yield "validation", "; ".join(errors)
+        elif cache is not None and query_vector is not None:
+            cache.store(user_query, query_vector, response, db_type, schema_fingerprint, history_key)
+        yield "sql_query", response
     except Exception as e:
-        return f"Error generating query: {str(e)}"
-    
\ No newline at end of file
+        yield "error", f"Error generating query: {str(e)}"
@@ -1,4 +1,4 @@
-# from langchain.prompts import ChatPromptTemplate
+# from langchain_core.prompts import ChatPromptTemplate
 
 # PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
 #     ("system", """You are an expert SQL query generator that provides helpful explanations. Generate queries based on the provided schema, context, and chat history.
@@ -37,7 +37,7 @@
 
 # ----------------------------------------------------------------------------------------------------------------
 
-# from langchain.prompts import ChatPromptTemplate
+# from langchain_core.prompts import ChatPromptTemplate
 # from app.llm.rules_engine import get_query_specific_rules
 
 # def get_prompt_template(user_query):
@@ -78,19 +78,46 @@
 
 # ---------------------------------------------------------------------------------------------------------------
 
-from langchain.prompts import ChatPromptTemplate
-from app.llm.rules_engine import get_query_specific_rules
+from functools import lru_cache
+from typing import TYPE_CHECKING, FrozenSet
+from app.llm.rules_engine import DEFAULT_TENANT, CompiledRuleSet, get_rules_repository
+from app.observability.tracing import span
+
+if TYPE_CHECKING:
+    # Loading ChatPromptTemplate pulls in most of langchain_core, so it is imported when first built
+    from langchain_core.prompts import ChatPromptTemplate
+
+
+def _escape_braces(text: str) -> str:
+    """Keep literal braces in rule text from being read as template variables."""
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def cheat_sheet_fragment(rule_set: CompiledRuleSet) -> str:
+    """Function reference for the dialect, placed after the rules in the system prompt."""
+    if not rule_set.cheat_sheet:
+        return ""
+    lines = "\n".join(f"        - {line}" for line in rule_set.cheat_sheet)
+    return _escape_braces(f"\n        {rule_set.display_name} function reference:\n{lines}")
+
+
+@lru_cache(maxsize=1024)
+def compile_prompt_template(db_type: str, tenant: str, version: str, rule_ids: FrozenSet[str]) -> "ChatPromptTemplate":
+    """
+    Build the prompt template for a dialect, tenant and rule combination, memoized.
+    The rule-set version is part of the key so edited rule files never serve a stale template.
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+    rule_set = get_rules_repository().get(db_type, tenant)
+    rules = rule_set.rules_for(rule_ids)
+    rules_text = _escape_braces("\n".join([f"{i+1}. {rule}" for i, rule in enumerate(rules)]))
 
-def get_prompt_template(user_query, db_type):
-    # Get query-specific rules
-    rules = get_query_specific_rules(user_query)
-    rules_text = "\n".join([f"{i+1}. {rule}" for i, rule in enumerate(rules)])
-    
     return ChatPromptTemplate.from_messages([
-        ("system", f"""You are an expert {db_type} query generator that provides helpful explanations. Generate queries based on the provided schema, context, and chat history.
+        ("system", f"""You are an expert {rule_set.display_name} query generator that provides helpful explanations. Generate queries based on the provided schema, context, and chat history.
 
         Rules:
         {rules_text}
+{cheat_sheet_fragment(rule_set)}
 
         dont provide a brief short explanation of what the query will do.
         just provide the SQL query.
@@ -102,6 +129,9 @@ def get_prompt_template(user_query, db_type):
         Additional Context:
         {context}
 
+        Similar Solved Examples:
+        {examples}
+
         Recent Chat History:
         {history}
 
@@ -110,3 +140,51 @@ def get_prompt_template(user_query, db_type):
         Generate explanation and SQL query:""")
             ])
 
+
+@lru_cache(maxsize=1)
+def get_repair_prompt_template() -> "ChatPromptTemplate":
+    """Prompt asking the LLM to fix a query that failed schema validation."""
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return ChatPromptTemplate.from_messages([
+        ("system", """You are an expert {db_type} query generator. The SQL query below was generated for the user query but failed validation against the schema.
+
+        Fix every listed error using ONLY tables and columns from the schema.
+        Use only functions and syntax valid for {db_type}.
+        Keep the intent of the original query.
+        just provide the corrected SQL query.
+        {cheat_sheet}"""),
+        ("human", """Schema:
+        {schema}
+
+        User Query: {query}
+
+        SQL query:
+        {sql}
+
+        Validation errors:
+        {errors}
+
+        Corrected SQL query:""")
+    ])
+
+
+def precompile_prompt_templates(db_type: str, tenant: str = DEFAULT_TENANT) -> None:
+    """
+    Warm the template cache for a dialect with no rules and with each single rule.
+    Combinations grow as 2^n with the rule count, so they are compiled on first use instead.
+    """
+    rule_set = get_rules_repository().get(db_type, tenant)
+    compile_prompt_template(db_type, tenant, rule_set.version, frozenset())
+    for rule in rule_set.rules:
+        compile_prompt_template(db_type, tenant, rule_set.version, frozenset([rule["id"]]))
+
+
+def get_prompt_template(user_query, db_type, tenant=DEFAULT_TENANT):
+    """Return the compiled prompt template matching the rules triggered by the query."""
+    with span("get_prompt_template", db_type=db_type, tenant=tenant) as current:
+        rule_set = get_rules_repository().get(db_type, tenant)
+        rule_ids = rule_set.match(user_query)
+        if current is not None:
+            current.attributes["rules"] = sorted(rule_ids)
+        return compile_prompt_template(db_type, tenant, rule_set.version, rule_ids)
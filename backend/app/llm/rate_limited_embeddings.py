@@ -0,0 +1,46 @@
+# app/llm/rate_limited_embeddings.py
+# Kept apart from rate_limiter: the Embeddings base class imports most of langchain_core,
+# which the API should only load once embeddings are actually built
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+from app.llm.context_builder import count_tokens
+from app.llm.rate_limiter import INTERACTIVE, get_rate_limiter, call_with_rate_limit, acall_with_rate_limit
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """Embeddings wrapper that sends every call through the shared embeddings limiter."""
+
+    def __init__(self, embeddings: Embeddings, priority: int = INTERACTIVE):
+        self.embeddings = embeddings
+        self.priority = priority
+        self.limiter = get_rate_limiter("embeddings")
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        # One batch per API request the wrapped client would send
+        size = getattr(self.embeddings, "chunk_size", None) or 16
+        return [texts[i:i + size] for i in range(0, len(texts), size)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for batch in self._batches(texts):
+            tokens = sum(count_tokens(text) for text in batch)
+            vectors.extend(call_with_rate_limit(self.limiter, tokens, self.priority,
+                                                lambda: self.embeddings.embed_documents(batch)))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return call_with_rate_limit(self.limiter, count_tokens(text), self.priority,
+                                    lambda: self.embeddings.embed_query(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for batch in self._batches(texts):
+            tokens = sum(count_tokens(text) for text in batch)
+            vectors.extend(await acall_with_rate_limit(self.limiter, tokens, self.priority,
+                                                       lambda: self.embeddings.aembed_documents(batch)))
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await acall_with_rate_limit(self.limiter, count_tokens(text), self.priority,
+                                           lambda: self.embeddings.aembed_query(text))
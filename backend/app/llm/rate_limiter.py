@@ -0,0 +1,248 @@
+# app/llm/rate_limiter.py
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from app.config import load_env_variables
+from app.llm.context_builder import count_tokens
+
+# Lower value is served first
+INTERACTIVE = 0
+BATCH = 1
+BULK = 2
+
+# How many times a call rejected with 429 is retried after waiting for retry-after
+MAX_RATE_LIMIT_RETRIES = 5
+DEFAULT_RETRY_AFTER_SECONDS = 2.0
+# Server errors, timeouts and dropped connections are retried with exponential backoff,
+# as the OpenAI client would (its own retries are off so 429s go through the limiters)
+MAX_TRANSIENT_RETRIES = 2
+TRANSIENT_BACKOFF_SECONDS = 0.5
+TRANSIENT_STATUS_CODES = {408, 409, 500, 502, 503, 504}
+
+T = TypeVar("T")
+
+
+class RateLimiter:
+    """
+    Client-side limiter for requests per minute and tokens per minute.
+    Both budgets are token buckets refilled continuously. Waiting callers are served in
+    (priority, arrival) order, so interactive calls overtake queued bulk work. A 429 pauses
+    the limiter for its retry-after and halves the refill rate, which then recovers on success.
+    Safe to use from threads (acquire_sync) and from the event loop (acquire).
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: float):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_bucket = float(requests_per_minute)
+        self._token_bucket = float(tokens_per_minute)
+        self._rate_scale = 1.0
+        self._paused_until = 0.0
+        self._updated_at = time.monotonic()
+        self._waiters: List = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        scale = self._rate_scale / 60.0
+        self._request_bucket = min(self.requests_per_minute, self._request_bucket + elapsed * self.requests_per_minute * scale)
+        self._token_bucket = min(self.tokens_per_minute, self._token_bucket + elapsed * self.tokens_per_minute * scale)
+
+    def _try_acquire(self, ticket, tokens: int) -> float:
+        """Take capacity if this ticket is first in line; otherwise return how long to wait."""
+        tokens = min(tokens, self.tokens_per_minute)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._waiters[0] != ticket:
+                return 0.01
+            if now < self._paused_until:
+                return self._paused_until - now
+
+            missing_requests = 1 - self._request_bucket
+            missing_tokens = tokens - self._token_bucket
+            if missing_requests <= 0 and missing_tokens <= 0:
+                self._request_bucket -= 1
+                self._token_bucket -= tokens
+                heapq.heappop(self._waiters)
+                return 0.0
+
+            scale = self._rate_scale / 60.0
+            wait = max(
+                missing_requests / (self.requests_per_minute * scale),
+                missing_tokens / (self.tokens_per_minute * scale)
+            )
+            return max(wait, 0.01)
+
+    def _enqueue(self, priority: int):
+        ticket = (priority, next(self._sequence))
+        with self._lock:
+            heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _cancel(self, ticket) -> None:
+        with self._lock:
+            if ticket in self._waiters:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+
+    async def acquire(self, tokens: int, priority: int = INTERACTIVE) -> None:
+        """Wait on the event loop until a request with this many tokens may be sent."""
+        ticket = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._try_acquire(ticket, tokens)
+                if wait == 0.0:
+                    return
+                self.throttled += 1
+                await asyncio.sleep(min(wait, 1.0))
+        except BaseException:
+            self._cancel(ticket)
+            raise
+
+    def acquire_sync(self, tokens: int, priority: int = BULK) -> None:
+        """Blocking version of acquire for worker threads and offline builds."""
+        ticket = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._try_acquire(ticket, tokens)
+                if wait == 0.0:
+                    return
+                self.throttled += 1
+                time.sleep(min(wait, 1.0))
+        except BaseException:
+            self._cancel(ticket)
+            raise
+
+    def penalize(self, retry_after: float) -> None:
+        """Back off after a 429: pause for retry_after and halve the refill rate."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self._rate_scale = max(0.1, self._rate_scale / 2)
+
+    def record_success(self) -> None:
+        """Recover the refill rate gradually after successful calls."""
+        with self._lock:
+            self._rate_scale = min(1.0, self._rate_scale + 0.05)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "queued": len(self._waiters),
+                "rate_scale": round(self._rate_scale, 2),
+                "throttled_waits": self.throttled,
+                "request_budget": round(self._request_bucket, 1),
+                "token_budget": round(self._token_bucket)
+            }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(kind: str) -> RateLimiter:
+    """Shared limiter for "chat" or "embeddings", configured from the environment."""
+    with _limiters_lock:
+        if kind not in _limiters:
+            env_vars = load_env_variables()
+            _limiters[kind] = RateLimiter(
+                kind,
+                requests_per_minute=env_vars[f'{kind}_requests_per_minute'],
+                tokens_per_minute=env_vars[f'{kind}_tokens_per_minute']
+            )
+        return _limiters[kind]
+
+
+def rate_limit_stats() -> Dict:
+    return {kind: limiter.stats() for kind, limiter in _limiters.items()}
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Seconds to wait from a 429 error's retry-after headers, None if it is not a rate limit error."""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return None
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return DEFAULT_RETRY_AFTER_SECONDS
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Whether a failed call may succeed if sent again: 5xx, timeouts and connection errors."""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status in TRANSIENT_STATUS_CODES or isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # openai.APIConnectionError and its APITimeoutError, matched by name to keep openai unimported here
+    return any(cls.__name__ == "APIConnectionError" for cls in type(error).__mro__)
+
+
+def retry_delay(limiter: RateLimiter, error: Exception, attempt: int) -> Optional[float]:
+    """
+    Seconds to sleep before sending a failed call again, None when it must not be retried.
+    A 429 pauses the limiter for its retry-after instead, so the next acquire waits it out.
+    """
+    retry_after = get_retry_after(error)
+    if retry_after is not None:
+        if attempt >= MAX_RATE_LIMIT_RETRIES:
+            return None
+        limiter.penalize(retry_after)
+        return 0.0
+    if is_transient_error(error) and attempt < MAX_TRANSIENT_RETRIES:
+        return TRANSIENT_BACKOFF_SECONDS * 2 ** attempt
+    return None
+
+
+def estimate_prompt_tokens(prompt_inputs: Dict[str, Any], completion_tokens: int = 512) -> int:
+    """Estimated tokens of a chat call: the prompt variables plus the expected completion."""
+    return sum(count_tokens(str(value)) for value in prompt_inputs.values()) + completion_tokens
+
+
+async def acall_with_rate_limit(limiter: RateLimiter, tokens: int, priority: int,
+                                call: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run an async call under the limiter, waiting out 429s with the server's retry-after
+    and retrying transient failures with backoff.
+    """
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        await limiter.acquire(tokens, priority)
+        try:
+            result = await call()
+            limiter.record_success()
+            return result
+        except Exception as e:
+            delay = retry_delay(limiter, e, attempt)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+
+
+def call_with_rate_limit(limiter: RateLimiter, tokens: int, priority: int, call: Callable[[], T]) -> T:
+    """Blocking version of acall_with_rate_limit."""
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        limiter.acquire_sync(tokens, priority)
+        try:
+            result = call()
+            limiter.record_success()
+            return result
+        except Exception as e:
+            delay = retry_delay(limiter, e, attempt)
+            if delay is None:
+                raise
+            time.sleep(delay)
+
@@ -1,116 +1,226 @@
-from business_rules import run_all, export_rule_data
-from business_rules.actions import BaseActions, rule_action
-from business_rules.fields import FIELD_TEXT
-from business_rules.variables import BaseVariables, string_rule_variable, boolean_rule_variable
-
-
-class QueryVariables(BaseVariables):
-    def __init__(self, query):
-        self.query = query
-        self.query_lower = query.lower()
-    
-    @string_rule_variable()
-    def user_query(self):
-        return self.query
-    
-    @boolean_rule_variable()
-    def contains_date_filter(self):
-        date_patterns = ['date', 'year', 'month', 'day', 'between', 'since', 'before', 'after']
-        return any(pattern in self.query_lower for pattern in date_patterns)
-    
-    @boolean_rule_variable()
-    def contains_group_by(self):
-        group_patterns = ['group', 'average', 'sum', 'count', 'aggregate']
-        return any(pattern in self.query_lower for pattern in group_patterns)
-    
-    @boolean_rule_variable()
-    def contains_sorting(self):
-        sort_patterns = ['sort', 'order', 'rank', 'top', 'bottom', 'highest', 'lowest']
-        return any(pattern in self.query_lower for pattern in sort_patterns)
-    
-
-class QueryActions(BaseActions):
-    def __init__(self, rules_list):
-        self.rules_list = rules_list
-    
-    @rule_action(params={"rule": FIELD_TEXT})
-    def add_rule(self, rule):
-        if rule not in self.rules_list:
-            self.rules_list.append(rule)
-
-
-def get_query_specific_rules(user_query):
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from app.config import load_env_variables
+
+logger = logging.getLogger(__name__)
+
+path = os.path.dirname(os.path.abspath(__file__))
+
+# default.json holds the rules for every tenant, tenants/<tenant>.json adds to or overrides them
+RULES_DIR = f"{path}/rules"
+DEFAULT_TENANT = "default"
+
+# Rule files are checked for changes at most this often
+RULES_RELOAD_INTERVAL_SECONDS = 2.0
+
+# Tenant names become file names, so keep them to a safe character set
+TENANT_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over lower-cased keywords.
+    Finds every keyword occurring in a text, overlapping ones included, in a single pass
+    whose cost does not depend on the number of keywords.
+    """
+
+    def __init__(self, keywords: Dict[str, FrozenSet[str]]):
+        # keywords: keyword -> ids of the rules it triggers
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[FrozenSet[str]] = [frozenset()]
+
+        for keyword, rule_ids in keywords.items():
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(frozenset())
+                state = next_state
+            self._output[state] = self._output[state] | rule_ids
+
+        # Breadth-first pass to link every state to its longest proper suffix state
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                if state:
+                    fallback = self._fail[state]
+                    while fallback and char not in self._goto[fallback]:
+                        fallback = self._fail[fallback]
+                    self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] | self._output[self._fail[next_state]]
+
+    def match(self, text: str) -> FrozenSet[str]:
+        """Ids of all rules whose keywords occur in text."""
+        matched = set()
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                matched.update(output[state])
+        return frozenset(matched)
+
+
+class CompiledRuleSet:
+    """Rules for one (tenant, dialect), compiled once into a keyword automaton."""
+
+    def __init__(self, base_rules: List[str], rules: List[Dict], version: str,
+                 display_name: str = "", cheat_sheet: Optional[List[str]] = None):
+        self.base_rules = base_rules
+        self.rules = rules
+        self.version = version
+        self.display_name = display_name
+        self.cheat_sheet = cheat_sheet or []
+        self._rule_text = {rule["id"]: rule["rule"] for rule in rules}
+        self._rule_order = {rule["id"]: i for i, rule in enumerate(rules)}
+
+        keywords: Dict[str, set] = {}
+        for rule in rules:
+            for pattern in rule.get("patterns", []):
+                keywords.setdefault(pattern.lower(), set()).add(rule["id"])
+        self._automaton = KeywordAutomaton({k: frozenset(v) for k, v in keywords.items()})
+
+    def match(self, user_query: str) -> FrozenSet[str]:
+        """Ids of the rules triggered by the query."""
+        return self._automaton.match(user_query)
+
+    def rules_for(self, rule_ids: FrozenSet[str]) -> List[str]:
+        """Base rules followed by the triggered rules, in file order and without duplicates."""
+        rules_list = list(self.base_rules)
+        for rule_id in sorted(rule_ids, key=lambda r: self._rule_order.get(r, len(self._rule_order))):
+            rule = self._rule_text.get(rule_id)
+            if rule and rule not in rules_list:
+                rules_list.append(rule)
+        return rules_list
+
+
+def _load_rules_file(file_path: str) -> Dict:
+    if not os.path.exists(file_path):
+        return {}
+    with open(file_path, 'r') as f:
+        return json.load(f)
+
+
+def _merge_rules(sections: List[Dict]) -> Dict:
+    """
+    Combine rule sections in order; a later rule with the same id replaces an earlier one,
+    and a later display name or cheat sheet replaces the earlier one.
+    """
+    base_rules: List[str] = []
+    rules: Dict[str, Dict] = {}
+    merged = {"display_name": "", "cheat_sheet": []}
+    for section in sections:
+        for rule in section.get("base_rules", []):
+            if rule not in base_rules:
+                base_rules.append(rule)
+        for rule in section.get("rules", []):
+            rules[rule["id"]] = rule
+        for key in ("display_name", "cheat_sheet"):
+            if section.get(key):
+                merged[key] = section[key]
+    merged["base_rules"] = base_rules
+    merged["rules"] = list(rules.values())
+    return merged
+
+
+class RulesRepository:
+    """
+    Loads rule files from a directory and hands out compiled rule sets per (tenant, dialect).
+    Files are re-checked every few seconds; when one changes, its compiled sets are rebuilt
+    on the next request, so rules hot-reload without a restart.
+    """
+
+    def __init__(self, rules_dir: str = RULES_DIR, reload_interval: float = RULES_RELOAD_INTERVAL_SECONDS):
+        self.rules_dir = rules_dir
+        self.reload_interval = reload_interval
+        self._compiled: Dict[Tuple[str, str], CompiledRuleSet] = {}
+        self._mtimes: Dict[str, float] = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _rule_files(self, tenant: str) -> List[str]:
+        files = [os.path.join(self.rules_dir, "default.json")]
+        if tenant != DEFAULT_TENANT:
+            files.append(os.path.join(self.rules_dir, "tenants", f"{tenant}.json"))
+        return files
+
+    def _check_for_changes(self) -> None:
+        """Drop compiled sets when any rule file was added, changed or removed (caller holds the lock)."""
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        mtimes = {}
+        for root, _, files in os.walk(self.rules_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    file_path = os.path.join(root, name)
+                    mtimes[file_path] = os.path.getmtime(file_path)
+        if mtimes != self._mtimes:
+            if self._mtimes:
+                logger.info("Rule files changed in %s, reloading", self.rules_dir)
+            self._mtimes = mtimes
+            self._compiled.clear()
+
+    def get(self, db_type: str, tenant: str = DEFAULT_TENANT) -> CompiledRuleSet:
+        """
+        Compiled rules for a tenant and dialect. Sections apply in order: default rules, default
+        dialect pack, tenant rules, tenant dialect pack.
+        """
+        if not TENANT_PATTERN.match(tenant):
+            raise ValueError(f"Invalid tenant name: {tenant!r}")
+        db_type = (db_type or "").lower()
+        with self._lock:
+            self._check_for_changes()
+            key = (tenant, db_type)
+            rule_set = self._compiled.get(key)
+            if rule_set is None:
+                sections = []
+                for file_path in self._rule_files(tenant):
+                    config = _load_rules_file(file_path)
+                    sections.append(config)
+                    sections.append(config.get("dialects", {}).get(db_type, {}))
+                merged = _merge_rules(sections)
+                version = str(max((self._mtimes.get(f, 0) for f in self._rule_files(tenant)), default=0))
+                rule_set = CompiledRuleSet(merged["base_rules"], merged["rules"], version,
+                                           display_name=merged["display_name"] or db_type,
+                                           cheat_sheet=merged["cheat_sheet"])
+                self._compiled[key] = rule_set
+            return rule_set
+
+
+_repository: Optional[RulesRepository] = None
+
+
+def get_rules_repository() -> RulesRepository:
+    global _repository
+    if _repository is None:
+        _repository = RulesRepository(load_env_variables()['rules_dir'] or RULES_DIR)
+    return _repository
+
+
+def rules_fingerprint(db_type: str, tenant: str = DEFAULT_TENANT) -> str:
+    """Tenant and rule-set version, for keys of anything derived from the rules."""
+    return f"{tenant}:{get_rules_repository().get(db_type, tenant).version}"
+
+
+def get_query_specific_rules(user_query, db_type="postgres", tenant=DEFAULT_TENANT):
     """Generate query-specific rules based on the content of the user query"""
-    rules_list = [
-        "Use ONLY tables and columns from the schema",
-        "Follow the exact schema for names",
-        "Incorporate insights from additional context when available",
-        "Ensure proper JOIN conditions",
-        "Handle NULL values appropriately"
-    ]
-    
-    variables = QueryVariables(user_query)
-    actions = QueryActions(rules_list)
-    
-    rules = [
-        # Date filtering rule
-        {
-            'conditions': {
-                'all': [
-                    {
-                        'name': 'contains_date_filter',
-                        'operator': 'is_true',
-                        'value': True
-                    }
-                ]
-            },
-            'actions': [
-                {
-                    'name': 'add_rule',  
-                    'params': {'rule': 'Use appropriate date functions for filtering (e.g., EXTRACT, DATE_TRUNC)'}
-                }
-            ]
-        },
-        # Group by rule
-        {
-            'conditions': {
-                'all': [
-                    {
-                        'name': 'contains_group_by',
-                        'operator': 'is_true',
-                        'value': True
-                    }
-                ]
-            },
-            'actions': [
-                {
-                    'name': 'add_rule',
-                    'params': {'rule': 'Use GROUP BY with appropriate aggregate functions (COUNT, SUM, AVG)'}
-                }
-            ]
-        },
-        # Sorting rule
-        {
-            'conditions': {
-                'all': [
-                    {
-                        'name': 'contains_sorting',
-                        'operator': 'is_true',
-                        'value': True
-                    }
-                ]
-            },
-            'actions': [
-                {
-                    'name': 'add_rule',
-                    'params': {'rule': 'Use ORDER BY with appropriate sorting direction (ASC/DESC)'}
-                }
-            ]
-        }
-    ]
-    
-    run_all(rule_list=rules,
-            defined_variables=variables,
-            defined_actions=actions)
-    
-    return rules_list
+    rule_set = get_rules_repository().get(db_type, tenant)
+    return rule_set.rules_for(rule_set.match(user_query))
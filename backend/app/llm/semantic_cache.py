@@ -0,0 +1,133 @@
+# app/llm/semantic_cache.py
+import os
+import re
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_question(question: str) -> str:
+    """Lower-case the question and collapse whitespace and trailing punctuation."""
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip("?.! ")
+
+
+def history_digest(chat_history: List[Dict[str, str]], max_messages: int = 6) -> str:
+    """Digest of the recent conversation, empty for a standalone question."""
+    if not chat_history:
+        return ""
+    recent = [[msg['role'], msg['content']] for msg in chat_history[-max_messages:]]
+    return hashlib.sha1(json.dumps(recent).encode("utf-8")).hexdigest()
+
+
+def compute_schema_fingerprint(schema_path: str, vector_store_path: str) -> str:
+    """Fingerprint of the schema file contents and the vector store build."""
+    digest = hashlib.sha256()
+    if os.path.exists(schema_path):
+        with open(schema_path, 'rb') as f:
+            digest.update(f.read())
+    if os.path.isdir(vector_store_path):
+        for name in sorted(os.listdir(vector_store_path)):
+            stat = os.stat(os.path.join(vector_store_path, name))
+            digest.update(f"{name}:{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class CacheEntry:
+    def __init__(self, question: str, embedding: np.ndarray, response: str, created_at: float):
+        self.question = question
+        self.embedding = embedding
+        self.response = response
+        self.created_at = created_at
+
+
+class SemanticCache:
+    """
+    In-memory cache of generated SQL keyed by question embedding.
+    Entries are partitioned by (db_type, schema fingerprint, history digest); inside a
+    partition a lookup hits when the cosine similarity reaches the threshold.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, ttl_seconds: int = 3600, max_entries: int = 1000):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str, str], CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+
+    def _is_expired(self, entry: CacheEntry, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def lookup_exact(self, question: str, db_type: str, fingerprint: str, history_key: str = "") -> Optional[str]:
+        """Return a cached response for the same normalized question without embedding it."""
+        key = (db_type, fingerprint, history_key, normalize_question(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._is_expired(entry, time.time()):
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.exact_hits += 1
+            return entry.response
+
+    def lookup(self, question: str, embedding: List[float], db_type: str, fingerprint: str,
+               history_key: str = "") -> Optional[str]:
+        """Return the cached response of the most similar question above the threshold."""
+        query_vector = np.asarray(embedding, dtype=np.float32)
+        query_vector /= (np.linalg.norm(query_vector) or 1.0)
+        now = time.time()
+
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            for key, entry in list(self._entries.items()):
+                if self._is_expired(entry, now):
+                    del self._entries[key]
+                    continue
+                if key[:3] != (db_type, fingerprint, history_key):
+                    continue
+                score = float(np.dot(query_vector, entry.embedding))
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key].response
+
+    def store(self, question: str, embedding: List[float], response: str, db_type: str, fingerprint: str,
+              history_key: str = "") -> None:
+        """Cache a response, evicting the least recently used entries over capacity."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= (np.linalg.norm(vector) or 1.0)
+        key = (db_type, fingerprint, history_key, normalize_question(question))
+        with self._lock:
+            self._entries[key] = CacheEntry(question, vector, response, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """Drop every entry, used when the schema or vector store is rebuilt."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and the current hit ratio."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "exact_hits": self.exact_hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,86 @@
+# app/llm/single_flight.py
+import asyncio
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Tuple
+
+Event = Tuple[str, str]
+
+
+class SharedStream:
+    """Buffers the events of one in-flight generation so every subscriber sees all of them."""
+
+    def __init__(self):
+        self.events: List[Event] = []
+        self.done = False
+        self._changed = asyncio.Condition()
+
+    async def publish(self, event: Event) -> None:
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def close(self) -> None:
+        async with self._changed:
+            self.done = True
+            self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Event]:
+        """Replay the events published so far, then follow the stream until it closes."""
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self.events) or self.done)
+                pending = self.events[index:]
+                finished = self.done
+            for event in pending:
+                yield event
+            index += len(pending)
+            if finished and index == len(self.events):
+                return
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent generations.
+    The first caller for a key starts the producer in its own task; callers arriving while
+    it runs subscribe to the same event stream instead of starting another one. The key is
+    released as soon as the producer finishes, so later requests run (or hit the cache) anew.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, SharedStream] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def _run(self, key: Hashable, shared: SharedStream,
+                   producer: Callable[[], AsyncIterator[Event]]) -> None:
+        try:
+            async for event in producer():
+                await shared.publish(event)
+        except Exception as e:
+            await shared.publish(("error", str(e)))
+        finally:
+            self._inflight.pop(key, None)
+            self._tasks.pop(key, None)
+            await shared.close()
+
+    def stream(self, key: Hashable, producer: Callable[[], AsyncIterator[Event]]) -> AsyncIterator[Event]:
+        """Subscribe to the in-flight stream for key, starting producer() if there is none."""
+        shared = self._inflight.get(key)
+        if shared is None:
+            shared = SharedStream()
+            self._inflight[key] = shared
+            # Run detached from the caller so a disconnecting leader does not cancel followers
+            self._tasks[key] = asyncio.create_task(self._run(key, shared, producer))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return shared.subscribe()
+
+    def stats(self) -> Dict:
+        """Number of producer runs, coalesced subscribers and generations in flight."""
+        return {
+            "in_flight": len(self._inflight),
+            "started": self.started,
+            "coalesced": self.coalesced
+        }
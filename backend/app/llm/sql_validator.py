@@ -0,0 +1,171 @@
+# app/llm/sql_validator.py
+import os
+import re
+import json
+from typing import Dict, List, Optional, Set, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError, SqlglotError
+
+# db_type used by the app -> sqlglot dialect name
+SQLGLOT_DIALECTS = {
+    "postgres": "postgres",
+    "snowflake": "snowflake",
+    "databricks": "databricks"
+}
+
+SQL_BLOCK_PATTERN = re.compile(r"```(?:sql)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+
+
+class SchemaIndex:
+    """In-memory lookup of table and column names from schema.json, case-insensitive."""
+
+    def __init__(self, tables: Dict[str, Set[str]]):
+        self.tables = tables
+
+    @classmethod
+    def from_schema(cls, schema: Dict) -> "SchemaIndex":
+        tables = {}
+        for table in schema.get("tables", []):
+            tables[table["table"].lower()] = {col["column_name"].lower() for col in table.get("columns", [])}
+        return cls(tables)
+
+    def has_table(self, name: str) -> bool:
+        return name.lower() in self.tables
+
+    def columns_of(self, name: str) -> Set[str]:
+        return self.tables.get(name.lower(), set())
+
+
+_schema_index_cache: Dict[str, Tuple[float, SchemaIndex]] = {}
+
+
+def load_schema_index(schema_path: str) -> Optional[SchemaIndex]:
+    """Load the schema index for a schema.json file, reloading only when the file changes."""
+    if not os.path.exists(schema_path):
+        return None
+    mtime = os.path.getmtime(schema_path)
+    cached = _schema_index_cache.get(schema_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(schema_path, 'r') as f:
+        index = SchemaIndex.from_schema(json.load(f))
+    _schema_index_cache[schema_path] = (mtime, index)
+    return index
+
+
+def extract_sql(response: str) -> str:
+    """Take the SQL out of an LLM response, preferring a fenced code block."""
+    blocks = SQL_BLOCK_PATTERN.findall(response)
+    if blocks:
+        return "\n".join(block.strip() for block in blocks)
+    return response.strip()
+
+
+def referenced_tables(sql: str, db_type: str) -> List[str]:
+    """Names of the physical tables a query reads, CTEs excluded."""
+    try:
+        statements = sqlglot.parse(sql, read=SQLGLOT_DIALECTS.get(db_type.lower()))
+    except SqlglotError:
+        return []
+    tables = []
+    for statement in statements:
+        if statement is None:
+            continue
+        cte_names = {cte.alias_or_name.lower() for cte in statement.find_all(exp.CTE)}
+        for table in statement.find_all(exp.Table):
+            if table.name and table.name.lower() not in cte_names and table.name not in tables:
+                tables.append(table.name)
+    return tables
+
+
+def is_single_select(sql: str, db_type: str) -> bool:
+    """Whether sql is exactly one read-only query: no DML, DDL, SELECT INTO or writing CTEs."""
+    try:
+        statements = [s for s in sqlglot.parse(sql, read=SQLGLOT_DIALECTS.get(db_type.lower())) if s is not None]
+    except SqlglotError:
+        return False
+    if len(statements) != 1 or not isinstance(statements[0], exp.Query):
+        return False
+    statement = statements[0]
+    writes = (exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop, exp.Alter, exp.Into)
+    return statement.find(*writes) is None
+
+
+def _validate_statement(statement: exp.Expression, index: SchemaIndex) -> List[str]:
+    errors = []
+    cte_names = {cte.alias_or_name.lower() for cte in statement.find_all(exp.CTE)}
+    derived_aliases = {sub.alias.lower() for sub in statement.find_all(exp.Subquery) if sub.alias}
+
+    # alias (or bare name) -> physical table name, for tables known to the schema
+    table_aliases: Dict[str, str] = {}
+    has_unresolvable_source = bool(derived_aliases)
+    for table in statement.find_all(exp.Table):
+        name = table.name.lower()
+        if not name:
+            continue
+        if name in cte_names:
+            has_unresolvable_source = True
+            table_aliases[table.alias_or_name.lower()] = ""
+            continue
+        if not index.has_table(name):
+            errors.append(f"Unknown table '{table.name}'")
+            # Columns of an unknown table cannot be checked, skip them rather than report noise
+            has_unresolvable_source = True
+            table_aliases[table.alias_or_name.lower()] = ""
+            continue
+        table_aliases[table.alias_or_name.lower()] = name
+        table_aliases[name] = name
+
+    select_aliases = {alias.alias.lower() for alias in statement.find_all(exp.Alias)}
+    physical_tables = {name for name in table_aliases.values() if name}
+
+    for column in statement.find_all(exp.Column):
+        name = column.name.lower()
+        if not name or isinstance(column.this, exp.Star):
+            continue
+        qualifier = column.table.lower()
+        if qualifier:
+            if qualifier in derived_aliases or qualifier in cte_names:
+                continue
+            table_name = table_aliases.get(qualifier)
+            if table_name is None:
+                errors.append(f"Unknown table or alias '{column.table}' in '{column.sql()}'")
+            elif table_name and name not in index.columns_of(table_name):
+                errors.append(f"Unknown column '{column.name}' in table '{table_name}'")
+        elif not has_unresolvable_source and name not in select_aliases:
+            if physical_tables and not any(name in index.columns_of(t) for t in physical_tables):
+                errors.append(
+                    f"Unknown column '{column.name}' (not in {', '.join(sorted(physical_tables))})"
+                )
+
+    # Keep messages unique and in order of appearance
+    return list(dict.fromkeys(errors))
+
+
+def validate_sql(sql: str, db_type: str, index: SchemaIndex) -> List[str]:
+    """
+    Parse SQL for the active dialect and resolve every table and column against the schema.
+    Returns a list of error messages, empty when the query is valid.
+    """
+    if not sql:
+        return ["No SQL query found in the response"]
+    try:
+        statements = sqlglot.parse(sql, read=SQLGLOT_DIALECTS.get(db_type.lower()))
+    except ParseError as e:
+        if e.errors:
+            return [
+                f"SQL syntax error: {err['description']} (line {err['line']}, column {err['col']})"
+                for err in e.errors
+            ]
+        return [f"SQL syntax error: {e}"]
+    except SqlglotError as e:
+        # Raised by the tokenizer, e.g. for prose around the query or an unterminated string
+        return [f"SQL syntax error: {e}"]
+
+    errors = []
+    for statement in statements:
+        if statement is not None:
+            errors.extend(_validate_statement(statement, index))
+    return errors
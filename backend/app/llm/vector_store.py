@@ -1,14 +1,46 @@
-from langchain_openai import AzureOpenAIEmbeddings
-from langchain_chroma import Chroma
-from typing import Tuple, Optional, Dict
+from __future__ import annotations
+from typing import TYPE_CHECKING, Callable, Tuple, Optional, Dict, List
 import os
 import json
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from app.config import load_env_variables 
+import time
+import logging
+import uuid
+import shutil
+import asyncio
+import hashlib
+from app.config import load_env_variables, data_path
+from app.llm.context_builder import TABLE_NAME_PATTERN
+from app.metadata_management.metadata_linker import (METADATA_INDEX_FILE_NAME, build_metadata_index,
+                                                     load_metadata_index, format_table_metadata)
+from app.llm.rate_limiter import BULK
+from app.observability.metrics import time_stage
+from app.observability.tracing import span
+
+if TYPE_CHECKING:
+    # Chroma and the OpenAI client are imported on first use, they dominate import time
+    from langchain_openai import AzureOpenAIEmbeddings
+    from langchain_chroma import Chroma
+    from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
 
 path = os.path.dirname(os.path.abspath(__file__))
 
-VECTOR_STORE_PATH = f"{path}/vector_store" 
+VECTOR_STORE_PATH = data_path(f"{path}/vector_store", "vector_store")
+
+# Builds go to VECTOR_STORE_PATH/v-<timestamp>-<id>; CURRENT names the live one
+CURRENT_FILE_NAME = "CURRENT"
+VERSION_PREFIX = "v-"
+# Live version plus the previous one, which requests that started before a swap may still read
+KEEP_VERSIONS = 2
+
+# Chunks sent to the store per add call
+ADD_BATCH_SIZE = 100
+# Column entries of one table document, in characters, before the table is split
+TABLE_CHUNK_CHARS = 1000
+
+# Opened vector stores, keyed by persist directory, reused across requests
+_vector_stores: Dict[str, Chroma] = {}
 
 def load_json_file(file_path: str) -> Dict: 
         """Load any JSON file."""
@@ -16,112 +48,249 @@ def load_json_file(file_path: str) -> Dict:
             with open(file_path, 'r') as f:
                 return json.load(f)
         except FileNotFoundError:
-            print(f"Warning: File not found: {file_path}")
+            logger.warning("File not found: %s", file_path)
             return {}
         except json.JSONDecodeError:
-            print(f"Warning: Invalid JSON in file: {file_path}")
+            logger.warning("Invalid JSON in file: %s", file_path)
             return {}
 
-def create_vector_store_from_files(schema_path: str, metadata_path: Optional[str] = None, persist_dir: str = VECTOR_STORE_PATH) -> None:
-    """Create and persist a single vector store containing both schema and metadata."""
-    
-    # Initialize Azure OpenAI embeddings
-    env_vars = load_env_variables()
-    embeddings = AzureOpenAIEmbeddings(
-        azure_endpoint=env_vars['azure_endpoint'],
-        api_key=env_vars['api_key'],
-        api_version=env_vars['api_version'],
-        deployment=env_vars['embedding_deployment'],
-        chunk_size=1
-    )
-
-    # Initialize text splitter
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200
-    )
-    
-    # Load schema and metadata
-    schema = load_json_file(schema_path)
-    metadata = load_json_file(metadata_path) if metadata_path else {}
-    
-    # Combined lists for texts and metadatas
-    all_texts = []
-    all_metadatas = []
-    
-    # Process schema
-    schema_text = json.dumps(schema, indent=2)
-    schema_chunks = text_splitter.split_text(schema_text)
-    
-    for chunk in schema_chunks:
-        all_texts.append(chunk)
-        all_metadatas.append({
-            "doc_type": "schema"
-        })
-    
-    # Process metadata if available
-    if metadata:
-        metadata_text = json.dumps(metadata, indent=2)
-        metadata_chunks = text_splitter.split_text(metadata_text)
-        
-        for chunk in metadata_chunks:
-            all_texts.append(chunk)
-            all_metadatas.append({
-                "doc_type": "metadata"
-            })
-    
-    # Create combined vector store if we have any texts
-    if all_texts:
-        # Create Chroma instance - it will automatically persist
-        Chroma.from_texts(
-            texts=all_texts,
-            metadatas=all_metadatas,
-            embedding=embeddings,
-            persist_directory=persist_dir
+def get_vector_store(vector_store_path: str, embeddings: AzureOpenAIEmbeddings) -> Chroma:
+    """Open the persisted vector store once and reuse it for later requests."""
+    vector_store = _vector_stores.get(vector_store_path)
+    if vector_store is None:
+        from langchain_chroma import Chroma
+        vector_store = Chroma(
+            persist_directory=vector_store_path,
+            embedding_function=embeddings
         )
-        print(f"Combined vector store created in {persist_dir}")
+        _vector_stores[vector_store_path] = vector_store
+    return vector_store
+
+
+def active_vector_store_path(root: str = VECTOR_STORE_PATH) -> str:
+    """Directory of the live vector store build; the root itself for stores built before versioning."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE_NAME), 'r') as f:
+            version = f.read().strip()
+        if version:
+            return os.path.join(root, version)
+    except FileNotFoundError:
+        pass
+    return root
+
+
+def vector_store_exists(root: str = VECTOR_STORE_PATH) -> bool:
+    active = active_vector_store_path(root)
+    return os.path.isdir(active) and bool(os.listdir(active))
+
+
+def _publish_version(root: str, version: str) -> None:
+    """Point CURRENT at a finished build in one atomic rename, then prune old builds."""
+    temp_path = os.path.join(root, f"{CURRENT_FILE_NAME}.tmp")
+    with open(temp_path, 'w') as f:
+        f.write(version)
+    os.replace(temp_path, os.path.join(root, CURRENT_FILE_NAME))
+
+    versions = sorted(name for name in os.listdir(root) if name.startswith(VERSION_PREFIX))
+    for name in versions[:-KEEP_VERSIONS]:
+        if name != version:
+            reset_vector_store_cache(os.path.join(root, name))
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def reset_vector_store_cache(vector_store_path: Optional[str] = None) -> None:
+    """Forget opened vector stores so the next request sees a rebuilt store."""
+    if vector_store_path is None:
+        _vector_stores.clear()
     else:
-        print("No valid data to create vector store")
+        _vector_stores.pop(vector_store_path, None)
 
 
-def get_relevant_info(
-    query: str,
-    embeddings: AzureOpenAIEmbeddings,
-    vector_store_path: str = VECTOR_STORE_PATH,
-    num_results: int = 5
-) -> Tuple[str, str]:
-    """Retrieve relevant schema and metadata"""
+def _document_id(doc_type: str, source: str, text: str) -> str:
+    """Content-addressed id: an unchanged chunk keeps its id and its embedding across builds."""
+    return hashlib.sha1(f"{doc_type}\0{source}\0{text}".encode("utf-8")).hexdigest()
 
-    print(f"Vector store path: {vector_store_path}")
-    print(f"Query: {query}")
-    try:
 
+def _table_documents(table: Dict, source: str, max_chars: int = TABLE_CHUNK_CHARS) -> List[Tuple[str, str, Dict]]:
+    """
+    One document per table as (id, text, metadata). Wide tables are split into column
+    groups, and every part repeats the table entry so it is never separated from its name.
+    """
+    header = {key: value for key, value in table.items() if key != "columns"}
+    groups: List[List[Dict]] = [[]]
+    size = 0
+    for column in table.get("columns", []):
+        column_size = len(json.dumps(column, indent=2))
+        if groups[-1] and size + column_size > max_chars:
+            groups.append([])
+            size = 0
+        groups[-1].append(column)
+        size += column_size
+
+    documents = []
+    for columns in groups:
+        text = json.dumps({**header, "columns": columns}, indent=2)
+        documents.append((
+            _document_id("schema", source, text),
+            text,
+            {"doc_type": "schema", "source": source, "table": table.get("table", "")}
+        ))
+    return documents
+
+
+def _sync_documents(vector_store: Chroma, documents: List[Tuple[str, str, Dict]],
+                    existing: Dict[str, Dict], keep, progress=None) -> Dict[str, int]:
+    """
+    Make the store hold exactly the given documents plus the existing ones accepted by keep.
+    Only chunks whose id is not stored yet are embedded; stale chunks are deleted.
+    """
+    wanted = {doc_id: (text, metadata) for doc_id, text, metadata in documents}
+    stale = [doc_id for doc_id, metadata in existing.items() if doc_id not in wanted and not keep(metadata)]
+    missing = [doc_id for doc_id in wanted if doc_id not in existing]
+
+    if stale:
+        vector_store.delete(ids=stale)
+    if progress:
+        progress("chunks embedded", 0, len(missing))
+    for i in range(0, len(missing), ADD_BATCH_SIZE):
+        batch = missing[i:i + ADD_BATCH_SIZE]
+        vector_store.add_texts(
+            texts=[wanted[doc_id][0] for doc_id in batch],
+            metadatas=[wanted[doc_id][1] for doc_id in batch],
+            ids=batch
+        )
+        if progress:
+            progress("chunks embedded", i + len(batch), len(missing))
+    return {"added": len(missing), "removed": len(stale)}
+
+
+def create_vector_store_from_files(schema_path: str, metadata_path: Optional[str] = None, persist_dir: str = VECTOR_STORE_PATH,
+                                   progress: Optional[Callable[[str, int, Optional[int]], None]] = None,
+                                   embeddings: Optional[Embeddings] = None) -> Dict:
+    """
+    Build a new version of the vector store of schema tables, one document per table.
+    The live version is copied and synced, so only new or changed tables are embedded;
+    the new version goes live atomically once complete, and queries keep reading the
+    old one until then. Metadata is not embedded: it is linked to tables by name (see
+    metadata_linker) and the index is stored with the version.
+    Returns the number of chunks added and removed and the new version.
+    embeddings defaults to a bulk-priority Azure OpenAI client (the benchmarks pass an offline one).
+    """
+    
+    from langchain_chroma import Chroma
+
+    if embeddings is None:
+        from langchain_openai import AzureOpenAIEmbeddings
+        from app.llm.rate_limited_embeddings import RateLimitedEmbeddings
+
+        # Initialize Azure OpenAI embeddings
+        env_vars = load_env_variables()
+        # Bulk build: queued behind interactive embedding calls by the shared limiter
+        embeddings = RateLimitedEmbeddings(AzureOpenAIEmbeddings(
+            azure_endpoint=env_vars['azure_endpoint'],
+            api_key=env_vars['api_key'],
+            api_version=env_vars['api_version'],
+            deployment=env_vars['embedding_deployment'],
+            chunk_size=1,
+            max_retries=0
+        ), priority=BULK)
 
+    # Load schema
+    schema = load_json_file(schema_path)
+    if not schema:
+        logger.warning("No valid data to create vector store")
+        return {"added": 0, "removed": 0, "version": None}
+
+    os.makedirs(persist_dir, exist_ok=True)
+    previous_dir = active_vector_store_path(persist_dir)
+    version = f"{VERSION_PREFIX}{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    build_dir = os.path.join(persist_dir, version)
+    try:
+        if vector_store_exists(persist_dir):
+            # Start from the live build so unchanged chunks keep their embeddings
+            shutil.copytree(previous_dir, build_dir, ignore=shutil.ignore_patterns(
+                f"{VERSION_PREFIX}*", f"{CURRENT_FILE_NAME}*"
+            ))
+        if progress:
+            progress("metadata linked", 0, 1)
+        build_metadata_index(schema_path, metadata_path, os.path.join(build_dir, METADATA_INDEX_FILE_NAME))
+        if progress:
+            progress("metadata linked", 1, 1)
 
         vector_store = Chroma(
-            persist_directory=vector_store_path,
+            persist_directory=build_dir,
             embedding_function=embeddings
         )
+        # Everything not in the new document set is stale, including metadata chunks of older builds
+        stored = vector_store.get(include=["metadatas"])
+        existing = {doc_id: doc_metadata or {} for doc_id, doc_metadata in zip(stored["ids"], stored["metadatas"])}
 
-        schema_results = vector_store.similarity_search(
-            query,
-            k=num_results,
-            filter={"doc_type": "schema"}
-        )
-        schema_context = "\n\n".join(doc.page_content for doc in schema_results)
+        source = os.path.basename(schema_path)
+        schema_docs = []
+        for table in schema.get("tables", []):
+            schema_docs.extend(_table_documents(table, source))
+        totals = _sync_documents(vector_store, schema_docs, existing, keep=lambda m: False, progress=progress)
+    except Exception:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+    _publish_version(persist_dir, version)
+    reset_vector_store_cache(previous_dir)
+    logger.info("Combined vector store version %s live in %s: %d chunks embedded, %d removed",
+                version, persist_dir, totals['added'], totals['removed'])
+    return {**totals, "version": version}
 
-        metadata_results = vector_store.similarity_search(
-            query,
-            k=num_results,
-            filter={"doc_type": "metadata"}
-        )
-        metadata_context = "\n\n".join(doc.page_content for doc in metadata_results) 
 
-        print(f"Schema context: {schema_context}")
-        print(f"Metadata context: {metadata_context}") 
+def attach_table_metadata(schema_docs: List[Tuple[str, float]], metadata_index_path: str) -> List[Tuple[str, float]]:
+    """Linked metadata of each retrieved table, scored like the table's best chunk."""
+    index = load_metadata_index(metadata_index_path)
+    if not index:
+        return []
+    best_scores: Dict[str, float] = {}
+    for text, score in schema_docs:
+        for name in TABLE_NAME_PATTERN.findall(text):
+            best_scores[name] = max(score, best_scores.get(name, score))
+    return [
+        (format_table_metadata(name, index[name.lower()]), score)
+        for name, score in best_scores.items()
+        if name.lower() in index
+    ]
 
-        return schema_context, metadata_context
-    except Exception as e:
-        print(f"Error retrieving context: {str(e)}")
-        return "", ""
 
+async def aget_relevant_documents(
+    query: str,
+    embeddings: AzureOpenAIEmbeddings,
+    vector_store_path: str = VECTOR_STORE_PATH,
+    num_results: int = 5,
+    query_vector: Optional[List[float]] = None
+) -> Tuple[List[Tuple[str, float]], List[Tuple[str, float]]]:
+    """
+    Retrieve relevant schema chunks and the linked metadata of their tables, with relevance scores.
+    The query is embedded once (unless query_vector is given) and the search runs off
+    the event loop; metadata comes from the table index, not a second search.
+    """
+
+    logger.debug("Retrieving context from %s for query: %s", vector_store_path, query)
+    with span("aget_relevant_documents", num_results=num_results):
+        try:
+            vector_store_path = active_vector_store_path(vector_store_path)
+            vector_store = get_vector_store(vector_store_path, embeddings)
+            if query_vector is None:
+                with time_stage("retrieval_embedding"):
+                    query_vector = await embeddings.aembed_query(query)
+            relevance_score_fn = vector_store._select_relevance_score_fn()
+
+            with time_stage("vector_search"):
+                results = await asyncio.to_thread(
+                    vector_store.similarity_search_by_vector_with_relevance_scores,
+                    query_vector,
+                    k=num_results,
+                    filter={"doc_type": "schema"}
+                )
+            schema_docs = [(doc.page_content, relevance_score_fn(distance)) for doc, distance in results]
+            return schema_docs, attach_table_metadata(
+                schema_docs, os.path.join(vector_store_path, METADATA_INDEX_FILE_NAME)
+            )
+        except Exception as e:
+            logger.error("Error retrieving context: %s", e)
+            return [], []
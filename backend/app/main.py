@@ -1,26 +1,176 @@
 # app/main.py
-from fastapi import FastAPI, HTTPException, Depends, Request
-from fastapi.responses import StreamingResponse
+from app.startup_timer import StartupTimer
+startup_timer = StartupTimer() # Started before the other imports so they are part of the report
+
+from fastapi import FastAPI, HTTPException, Depends, Request, Query
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from typing import Dict, List, Optional
-from pydantic import BaseModel
 from app.config import load_env_variables
-from app.llm.llm_chain import generate_sql_query_with_llm, initialize_llm
-from app.llm.vector_store import get_relevant_info, VECTOR_STORE_PATH, create_vector_store_from_files
+from app.llm.llm_chain import (stream_sql_query_with_llm, get_llm_clients,
+                               llm_clients_ready, llm_calls_in_flight)
+from app.llm.vector_store import (VECTOR_STORE_PATH, create_vector_store_from_files,
+                                  active_vector_store_path, vector_store_exists)
+from app.llm.prompts import precompile_prompt_templates
+from app.llm.rules_engine import DEFAULT_TENANT, TENANT_PATTERN, rules_fingerprint
+from app.session_management.history_store import ChatHistoryStore
+from app.job_management.job_runner import JobRunner, FAILED, SUCCEEDED, watch_snapshots
+from app.state_management.shared_state import SharedState, SHARED_STATE_DB_PATH
+from app.llm.semantic_cache import SemanticCache, compute_schema_fingerprint, normalize_question, history_digest
+from app.llm.single_flight import SingleFlight
+from app.llm.sql_validator import load_schema_index, extract_sql, referenced_tables, is_single_select
+from app.llm.rate_limiter import rate_limit_stats
+from app.observability.logs import configure_logging
+from app.observability.metrics import REGISTRY, Gauge, HTTP_REQUEST_SECONDS, observe_stage
+from app.observability.tracing import TRACES, TracingMiddleware, configure_tracing, span
+from app.llm.batch_runner import run_batch
+from app.llm.example_store import ExampleStore, EXAMPLE_STORE_PATH
 from app.db_management.schema_loader import load_db_schema, SCHEMA_OUTPUT_DIR
-from app.metadata_management.metadata_loader import process_metadata, METADATA_OUTPUT_FILE
-from app.db_management.connection import (DatabaseConnection, get_postgres_connection, 
+from app.metadata_management.metadata_loader import update_metadata, METADATA_OUTPUT_FILE
+from app.db_management.connection import (DatabaseConnection, normalize_sql, get_postgres_connection, 
                                           get_databricks_connection, PostgresConnection, DatabricksConnection
                                            , SnowflakeConnection, get_snowflake_connection)
 from app.db_management.schemas import (PostgresDBCredentials, DatabricksDBCredentials, 
-                                       SnowflakeDBCredentials, ExecuteQueryRequest)
+                                       SnowflakeDBCredentials, ExecuteQueryRequest, BatchQueryRequest)
 import os
 import json
+import uuid
+import asyncio
+import time
+import logging
+import threading
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
+startup_timer.mark("imports")
+
+logger = logging.getLogger(__name__)
+
+
+def preload_llm_clients() -> None:
+    """Build the LLM clients and example store in the background so the first request does not pay for them."""
+    try:
+        get_llm_clients()
+        get_example_store()
+        logger.info("LLM clients ready %.0f ms after start", (time.perf_counter() - startup_timer.started) * 1000)
+    except Exception as e:
+        logger.warning("LLM client preload failed, clients will be built on first use: %s", e)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup_timer.mark("server startup")
+    logger.info(startup_timer.summary())
+    if env_vars['llm_preload']:
+        threading.Thread(target=preload_llm_clients, name="llm-preload", daemon=True).start()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 env_vars = load_env_variables()
-llm, embeddings = initialize_llm()
-chat_history: List[Dict[str, str]] = []  # In-memory chat history
+configure_logging(env_vars['log_level'], env_vars['log_sample_rate'])
+configure_tracing(env_vars['trace_buffer_size'], env_vars['trace_sql_comments'])
+startup_timer.mark("config")
+# Connection, readiness flags and build jobs every API worker must agree on
+shared_state = SharedState(env_vars['shared_state_db_path'] or SHARED_STATE_DB_PATH, env_vars['shared_state_cache_seconds'])
+history_store = ChatHistoryStore(
+    max_sessions=env_vars['chat_history_max_sessions'],
+    max_messages=env_vars['chat_history_max_messages'],
+    idle_ttl_seconds=env_vars['chat_history_idle_ttl_seconds'],
+    # Several workers share sessions through SQLite; a single one keeps them in memory
+    db_path=env_vars['chat_history_db_path'] or (shared_state.db_path if env_vars['api_workers'] > 1 else None),
+    shared=env_vars['api_workers'] > 1
+)
+semantic_cache: Optional[SemanticCache] = SemanticCache(
+    similarity_threshold=env_vars['semantic_cache_threshold'],
+    ttl_seconds=env_vars['semantic_cache_ttl_seconds'],
+    max_entries=env_vars['semantic_cache_max_entries']
+) if env_vars['semantic_cache_enabled'] else None
+single_flight = SingleFlight()
+job_runner = JobRunner(max_workers=env_vars['job_workers'], publish=shared_state.save_job)
+startup_timer.mark("stores")
+
+_example_store: Optional[ExampleStore] = None
+_example_store_lock = threading.Lock()
+
+
+def get_example_store() -> Optional[ExampleStore]:
+    """The example store, opened on first use; None when disabled."""
+    global _example_store
+    if _example_store is None and env_vars['example_store_enabled']:
+        with _example_store_lock:
+            if _example_store is None:
+                _example_store = ExampleStore(get_llm_clients()[1], EXAMPLE_STORE_PATH)
+    return _example_store
+
+
+def format_sse_event(event: str, data: str) -> str:
+    """Frame an event as a Server-Sent Events message."""
+    return f"data: {json.dumps({'event': event, 'data': data})}\n\n"
+
+
+def get_schema_fingerprint() -> str:
+    """Fingerprint of the current schema and vector store, computed once per rebuild by any worker."""
+    generation = shared_state.get_cached("artifacts_generation", 0)
+    if getattr(app.state, 'artifacts_generation', None) != generation:
+        if semantic_cache is not None:
+            semantic_cache.invalidate()
+        app.state.schema_fingerprint = compute_schema_fingerprint(
+            os.path.join(SCHEMA_OUTPUT_DIR, 'schema.json'), active_vector_store_path(VECTOR_STORE_PATH)
+        )
+        app.state.artifacts_generation = generation
+    return app.state.schema_fingerprint
+
+
+def invalidate_generation_cache() -> None:
+    """Drop cached responses in every worker after the schema or vector store changed."""
+    shared_state.increment("artifacts_generation")
+
+
+CONNECTION_FACTORIES = {
+    "postgres": get_postgres_connection,
+    "snowflake": get_snowflake_connection,
+    "databricks": get_databricks_connection
+}
+# Credential fields kept in memory only; other workers take them from DB_PASSWORD
+SECRET_CREDENTIAL_FIELDS = ("password",)
+
+
+def set_db_connection(db_connection: DatabaseConnection, db_type: str, db_credentials: Optional[Dict] = None) -> None:
+    """
+    Make db_connection the active connection of every worker.
+    The other workers rebuild it from db_credentials, with secret fields taken from DB_PASSWORD
+    instead of the shared state; without credentials only this worker has the connection.
+    """
+    version = uuid.uuid4().hex
+    record = {"db_type": db_type, "credentials": None, "secret_fields": [], "version": version}
+    if db_credentials is not None:
+        record["credentials"] = {key: value for key, value in db_credentials.items()
+                                 if key not in SECRET_CREDENTIAL_FIELDS}
+        record["secret_fields"] = [key for key in db_credentials if key in SECRET_CREDENTIAL_FIELDS]
+    shared_state.set("connection", record)
+    app.state.db_connection = db_connection
+    app.state.db_type = db_type
+    app.state.connection_version = version
+    precompile_prompt_templates(db_type)
+
+
+def get_db_connection() -> Optional[DatabaseConnection]:
+    """The active connection, rebuilt when another worker connected since; None before any connect."""
+    record = shared_state.get_cached("connection")
+    if record is None:
+        return None
+    if getattr(app.state, 'connection_version', None) != record["version"]:
+        factory = CONNECTION_FACTORIES.get(record["db_type"])
+        if factory is None or record["credentials"] is None:
+            return None
+        if record.get("secret_fields") and not env_vars['db_password']:
+            logger.warning("Connection made through another worker cannot be reused: DB_PASSWORD is not set")
+            return None
+        credentials = {**record["credentials"], **{field: env_vars['db_password'] for field in record.get("secret_fields", [])}}
+        app.state.db_connection = factory(credentials)
+        app.state.db_type = record["db_type"]
+        app.state.connection_version = record["version"]
+        precompile_prompt_templates(record["db_type"])
+    return app.state.db_connection
 
 
 app.add_middleware(
@@ -32,14 +182,49 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    """Time every request per route template, so path parameters do not create new series."""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status)
+        )
+
+
+# Added last so it is the outermost middleware and its trace covers the others
+app.add_middleware(TracingMiddleware, profiling_enabled=env_vars['profiling_enabled'])
+
+
+# Pool and queue usage, read when /metrics is scraped
+REGISTRY.register(Gauge("sqlgen_llm_calls_in_flight", "Chat model calls holding an LLM semaphore slot",
+                        callback=lambda: {(): llm_calls_in_flight()}))
+REGISTRY.register(Gauge("sqlgen_rate_limiter_queued", "Calls waiting on an Azure OpenAI rate limiter", ["limiter"],
+                        callback=lambda: {(kind,): stats["queued"] for kind, stats in rate_limit_stats().items()}))
+REGISTRY.register(Gauge("sqlgen_generations_in_flight", "Distinct generations running (coalesced requests share one)",
+                        callback=lambda: {(): single_flight.stats()["in_flight"]}))
+REGISTRY.register(Gauge("sqlgen_build_jobs_active", "Schema, metadata and vector store builds queued or running",
+                        callback=lambda: {(): sum(1 for job in job_runner.list() if not job.finished)}))
+REGISTRY.register(Gauge("sqlgen_chat_sessions", "Chat sessions held in memory",
+                        callback=lambda: {(): history_store.stats()["sessions"]}))
+
+
 @app.post("/connect-postgres/")
 async def connect_postgres(db_credentials: PostgresDBCredentials = Depends()): # Directly use PostgresDBCredentials
     """Endpoint to test PostgreSQL database connection."""
     try:
         db_connection: PostgresConnection = get_postgres_connection(db_credentials.dict()) # Get Postgres connection using factory
         if db_connection.test_connection():
-            app.state.db_connection = db_connection
-            app.state.db_type = "postgres" # Hardcode db_type here as it's postgres endpoint
+            set_db_connection(db_connection, "postgres", db_credentials.dict()) # Hardcode db_type here as it's postgres endpoint
             return {"message": "Database connection to Postgres successful"}
         else:
             raise HTTPException(status_code=400, detail="Database connection to Postgres failed")
@@ -52,8 +237,7 @@ async def connect_snowflake(db_credentials: SnowflakeDBCredentials = Depends()):
     try:
         db_connection: SnowflakeConnection = get_snowflake_connection(db_credentials.dict()) # Get Snowflake connection using factory
         if db_connection.test_connection():
-            app.state.db_connection = db_connection
-            app.state.db_type = "snowflake" # Hardcode db_type here as it's snowflake endpoint
+            set_db_connection(db_connection, "snowflake", db_credentials.dict()) # Hardcode db_type here as it's snowflake endpoint
             return {"message": "Database connection to Snowflake successful"}
         else:
             raise HTTPException(status_code=400, detail="Database connection to Snowflake failed")
@@ -66,8 +250,7 @@ async def connect_databricks(db_credentials: DatabricksDBCredentials = Depends()
     try:
         db_connection: DatabricksConnection = get_databricks_connection(db_credentials.dict()) # Get Databricks connection using factory
         if db_connection.test_connection():
-            app.state.db_connection = db_connection
-            app.state.db_type = "databricks" # Hardcode db_type here as it's databricks endpoint
+            set_db_connection(db_connection, "databricks", db_credentials.dict()) # Hardcode db_type here as it's databricks endpoint
             return {"message": "Database connection to Databricks successful"}
         else:
             raise HTTPException(status_code=400, detail="Database connection to Databricks failed")
@@ -76,110 +259,364 @@ async def connect_databricks(db_credentials: DatabricksDBCredentials = Depends()
 
 
 
+def find_shared_job(kind: str) -> Optional[Dict]:
+    """Unfinished build of this kind running in another worker, if any."""
+    if not shared_state.is_locked(kind):
+        return None
+    return next((snapshot for snapshot in shared_state.list_jobs(kind)
+                 if snapshot["status"] not in (SUCCEEDED, FAILED) and job_runner.get(snapshot["job_id"]) is None), None)
+
+
+async def submit_build_job(kind: str, build, wait: bool, message: str, error_message: str):
+    """
+    Queue a build on the job runner and answer 202 with the job to poll.
+    A build of the same kind already in progress, in any worker, is returned instead of starting another.
+    With wait=true the request blocks until the build finished, as before jobs existed.
+    """
+    def locked_build(progress):
+        # Serializes builds writing the same artifacts across workers
+        with shared_state.lock(kind, on_wait=lambda: progress("waiting for another worker", 0, 1)):
+            return build(progress)
+
+    snapshot = await asyncio.to_thread(find_shared_job, kind)
+    if snapshot is not None:
+        if wait:
+            job_id = snapshot["job_id"]
+            async for snapshot in watch_snapshots(lambda: shared_state.get_job(job_id)):
+                pass
+            if snapshot["status"] == FAILED:
+                raise HTTPException(status_code=500, detail=f"{error_message}: {snapshot['error']}")
+            return {"message": message, **(snapshot["result"] or {}), "job": snapshot}
+        return JSONResponse(status_code=202, content={
+            "message": f"{kind} job already in progress", "job_id": snapshot["job_id"], "job": snapshot
+        })
+
+    job, created = job_runner.submit(kind, locked_build)
+    if wait:
+        await job_runner.wait(job)
+        if job.status == FAILED:
+            raise HTTPException(status_code=500, detail=f"{error_message}: {job.error}")
+        return {"message": message, **(job.result or {}), "job": job.to_dict()}
+    return JSONResponse(status_code=202, content={
+        "message": f"{kind} job queued" if created else f"{kind} job already in progress",
+        "job_id": job.id,
+        "job": job.to_dict()
+    })
+
+
 @app.post("/load-schema/")
-async def load_schema():
-    """Endpoint to trigger schema loading from the database."""
-    if not hasattr(app.state, 'db_connection'):
+async def load_schema(wait: bool = False):
+    """Endpoint to trigger schema loading from the database, as a background job."""
+    db_connection = get_db_connection()
+    if db_connection is None:
         raise HTTPException(status_code=400, detail="Database connection not established. Please connect to database first.")
-    try:
-        schema_data = load_db_schema(app.state.db_connection, app.state.db_type)
-        app.state.schema_loaded = True
-        return {"message": "Database schema loaded successfully", "schema_info": f"Schema documentation generated in '{os.path.join(SCHEMA_OUTPUT_DIR, 'schema.json')}'"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to load database schema: {e}")
+    db_type = app.state.db_type
+
+    def build(progress):
+        load_db_schema(db_connection, db_type, progress=progress)
+        shared_state.set("schema_loaded", True)
+        invalidate_generation_cache()
+        return {"schema_info": f"Schema documentation generated in '{os.path.join(SCHEMA_OUTPUT_DIR, 'schema.json')}'"}
+
+    return await submit_build_job("load-schema", build, wait,
+                                  "Database schema loaded successfully", "Failed to load database schema")
 
 
 @app.post("/load-metadata/")
-async def load_metadata():
-    """Endpoint to trigger metadata loading from files."""
-    try:
-        metadata = process_metadata()
-        app.state.metadata_loaded = True
-        return {"message": "Metadata loaded successfully", "metadata_info": f"Metadata documentation generated in '{METADATA_OUTPUT_FILE}'"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to load metadata: {e}")
+async def load_metadata(wait: bool = False):
+    """Endpoint to trigger metadata loading from files, as a background job."""
+
+    def build(progress):
+        diff = update_metadata(progress=progress)
+        shared_state.set("metadata_loaded", True)
+        return {
+            "metadata_info": f"Metadata documentation generated in '{METADATA_OUTPUT_FILE}'",
+            "changes": {key: files for key, files in diff.items() if key != "unchanged"}
+        }
+
+    return await submit_build_job("load-metadata", build, wait,
+                                  "Metadata loaded successfully", "Failed to load metadata")
 
 
 @app.post("/create-vector-store/")
-async def create_vector_store():
-    """Endpoint to create vector store from schema and metadata files."""
-    if not hasattr(app.state, 'schema_loaded'):
+async def create_vector_store(wait: bool = False):
+    """
+    Endpoint to create vector store from schema and metadata files, as a background job.
+    Queries keep using the previous vector store until the new one is complete.
+    """
+    if not shared_state.get_cached("schema_loaded"):
         raise HTTPException(status_code=400, detail="Database schema not loaded. Please load schema first.")
-    if not hasattr(app.state, 'metadata_loaded'):
+    if not shared_state.get_cached("metadata_loaded"):
         raise HTTPException(status_code=400, detail="Metadata not loaded. Please load metadata first.")
-    
-    try:
-        # Check if schema and metadata files exist
-        schema_path = os.path.join(SCHEMA_OUTPUT_DIR, 'schema.json')
-        if not os.path.exists(schema_path):
-            raise HTTPException(status_code=400, detail="Schema file not found. Please load schema first.")
-        if not os.path.exists(METADATA_OUTPUT_FILE):
-            raise HTTPException(status_code=400, detail="Metadata file not found. Please load metadata first.")
-        
-        # Create vector store
-        create_vector_store_from_files(
+
+    # Check if schema and metadata files exist
+    schema_path = os.path.join(SCHEMA_OUTPUT_DIR, 'schema.json')
+    if not os.path.exists(schema_path):
+        raise HTTPException(status_code=400, detail="Schema file not found. Please load schema first.")
+    if not os.path.exists(METADATA_OUTPUT_FILE):
+        raise HTTPException(status_code=400, detail="Metadata file not found. Please load metadata first.")
+
+    def build(progress):
+        # Create vector store, re-embedding only tables that changed since the last build
+        counts = create_vector_store_from_files(
             schema_path=schema_path,
             metadata_path=METADATA_OUTPUT_FILE,
-            persist_dir=VECTOR_STORE_PATH
+            persist_dir=VECTOR_STORE_PATH,
+            progress=progress
         )
-        
-        return {"message": "Vector store created successfully", "path": VECTOR_STORE_PATH}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to create vector store: {str(e)}")
+        invalidate_generation_cache()
+        return {"path": VECTOR_STORE_PATH, "chunks": counts}
 
+    return await submit_build_job("create-vector-store", build, wait,
+                                  "Vector store created successfully", "Failed to create vector store")
 
-@app.post("/generate-query/")
-async def generate_query(query_text: str):
-    """Endpoint to generate SQL query using SSE for streaming."""
-    global chat_history
 
-    if not hasattr(app.state, 'db_connection'):
+@app.get("/jobs/")
+async def list_jobs():
+    """Endpoint to list recent build jobs of every worker, newest first."""
+    jobs = [job.to_dict() for job in job_runner.list()]
+    local_ids = {job["job_id"] for job in jobs}
+    jobs += [snapshot for snapshot in shared_state.list_jobs() if snapshot["job_id"] not in local_ids]
+    return {"jobs": sorted(jobs, key=lambda job: job["created_at"], reverse=True)}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Endpoint to get the status and per-stage progress of a build job."""
+    job = job_runner.get(job_id)
+    snapshot = job.to_dict() if job is not None else shared_state.get_job(job_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return snapshot
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Endpoint to follow a build job with SSE: a "job" event on every change until it finishes."""
+    job = job_runner.get(job_id)
+    if job is None and shared_state.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # A job of another worker is followed through its published snapshots
+    snapshots = job_runner.watch(job) if job is not None else watch_snapshots(lambda: shared_state.get_job(job_id))
+
+    async def event_stream():
+        async for snapshot in snapshots:
+            yield f"data: {json.dumps({'event': 'job', 'data': snapshot})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/generate-query/")
+async def generate_query(query_text: str, session_id: str = "default", candidates: int = Query(1, ge=1, le=8),
+                         tenant: str = Query(DEFAULT_TENANT, pattern=TENANT_PATTERN.pattern)):
+    """
+    Endpoint to generate SQL query using SSE for streaming.
+    candidates > 1 opts into generating several queries and returning the cheapest valid plan.
+    tenant selects the rule pack from app/llm/rules/tenants/ layered over the default rules.
+    """
+    db_connection = get_db_connection()
+    if db_connection is None:
         raise HTTPException(status_code=400, detail="Database connection not established. Please connect to database first.")
-    if not hasattr(app.state, 'schema_loaded'):
+    if not shared_state.get_cached("schema_loaded"):
         raise HTTPException(status_code=400, detail="Database schema not loaded. Please load schema first.")
 
     async def event_stream():
         try:
             # Check if vector store exists
-            if not os.path.exists(VECTOR_STORE_PATH) or not os.listdir(VECTOR_STORE_PATH):
-                yield json.dumps({"event": "error", "data": "Vector store not found. Please call /create-vector-store/ endpoint first."})
+            if not vector_store_exists(VECTOR_STORE_PATH):
+                yield format_sse_event("error", "Vector store not found. Please call /create-vector-store/ endpoint first.")
                 return
 
-            # yield json.dumps({"event": "status", "data": "Analyzing schema..."})
-            sql_query_explanation = generate_sql_query_with_llm(
+            # Shared sessions are read from and written to SQLite, keep that off the event loop
+            chat_history = await asyncio.to_thread(history_store.get_history, session_id)
+            schema_fingerprint = get_schema_fingerprint()
+            db_type = app.state.db_type
+            # Identical questions with the same conversation context share one generation
+            flight_key = (normalize_question(query_text), db_type, schema_fingerprint, history_digest(chat_history),
+                          candidates, rules_fingerprint(db_type, tenant))
+
+            llm, embeddings = await asyncio.to_thread(get_llm_clients)
+            example_store = await asyncio.to_thread(get_example_store)
+            sql_query_explanation = None
+            started = time.perf_counter()
+            async for event, data in single_flight.stream(flight_key, lambda: stream_sql_query_with_llm(
                 user_query=query_text,
                 chat_history=chat_history,
                 embeddings=embeddings,
                 llm=llm,
                 vector_store_path=VECTOR_STORE_PATH,
-                db_type=app.state.db_type
-            )
-            # yield json.dumps({"event": "status", "data": "Generating SQL..."})
-            yield json.dumps({"event": "sql_query", "data": sql_query_explanation})
+                db_type=db_type,
+                cache=semantic_cache,
+                schema_fingerprint=schema_fingerprint,
+                schema_index=load_schema_index(os.path.join(SCHEMA_OUTPUT_DIR, 'schema.json')),
+                example_store=example_store,
+                candidates=candidates,
+                db_connection=db_connection,
+                tenant=tenant
+            )):
+                if event == "sql_query":
+                    sql_query_explanation = data
+                yield format_sse_event(event, data)
+            observe_stage("total", time.perf_counter() - started)
 
-            # Update chat history
-            chat_history.extend([
-                {"role": "user", "content": query_text},
-                {"role": "assistant", "content": sql_query_explanation}
-            ])
+            if sql_query_explanation is not None:
+                # Update chat history
+                await asyncio.to_thread(history_store.append_exchange, session_id, query_text, sql_query_explanation)
 
         except Exception as e:
-            yield json.dumps({"event": "error", "data": str(e)})
+            yield format_sse_event("error", str(e))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/generate-query-batch/")
+async def generate_query_batch(request_body: BatchQueryRequest):
+    """Endpoint to generate SQL for many questions at once, streamed back as JSON lines."""
+    db_connection = get_db_connection()
+    if db_connection is None:
+        raise HTTPException(status_code=400, detail="Database connection not established. Please connect to database first.")
+    if not shared_state.get_cached("schema_loaded"):
+        raise HTTPException(status_code=400, detail="Database schema not loaded. Please load schema first.")
+    if not vector_store_exists(VECTOR_STORE_PATH):
+        raise HTTPException(status_code=400, detail="Vector store not found. Please call /create-vector-store/ endpoint first.")
+
+    async def result_stream():
+        llm, embeddings = await asyncio.to_thread(get_llm_clients)
+        async for result in run_batch(
+            request_body.questions,
+            embeddings=embeddings,
+            llm=llm,
+            vector_store_path=VECTOR_STORE_PATH,
+            db_type=app.state.db_type,
+            workers=request_body.workers,
+            cache=semantic_cache if request_body.use_cache else None,
+            schema_fingerprint=get_schema_fingerprint(),
+            schema_index=load_schema_index(os.path.join(SCHEMA_OUTPUT_DIR, 'schema.json'))
+        ):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
 
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.delete("/chat-history/")
+async def clear_chat_history(session_id: str = "default"):
+    """Endpoint to clear the chat history of a session."""
+    await asyncio.to_thread(history_store.clear, session_id)
+    return {"message": f"Chat history cleared for session '{session_id}'"}
+
+
+@app.get("/cache-stats/")
+async def cache_stats():
+    """Endpoint to report semantic cache hit ratios and request coalescing."""
+    if semantic_cache is None:
+        return {"enabled": False, "coalescing": single_flight.stats()}
+    return {"enabled": True, **semantic_cache.stats(), "coalescing": single_flight.stats()}
+
+
+@app.get("/rate-limit-stats/")
+async def rate_limit_stats_endpoint():
+    """Endpoint to report the state of the Azure OpenAI rate limiters."""
+    return rate_limit_stats()
+
+
+@app.get("/startup-stats/")
+async def startup_stats():
+    """Endpoint to report how long process start-up took, phase by phase."""
+    return {**startup_timer.report(), "llm_clients_ready": llm_clients_ready()}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Endpoint exposing stage latencies, cache, token and pool metrics in the Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/traces/")
+async def list_traces(limit: int = Query(50, ge=1, le=1000), min_duration_ms: float = 0, name: Optional[str] = None):
+    """Endpoint listing recent request and build traces, newest first, optionally only slow ones."""
+    return {"traces": [trace.summary() for trace in TRACES.list(limit, min_duration_ms, name)]}
+
+
+@app.get("/debug/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """Endpoint returning every span of one trace."""
+    trace = TRACES.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace {trace_id} not found")
+    return trace.to_dict()
+
+
+@app.get("/debug/traces/{trace_id}/profile")
+async def get_trace_profile(trace_id: str):
+    """Endpoint returning the profiler report of a request sent with an X-Profile header."""
+    trace = TRACES.get(trace_id)
+    if trace is None or trace.profile is None:
+        raise HTTPException(status_code=404, detail=f"No profile for trace {trace_id}")
+    return PlainTextResponse(trace.profile)
+
+
+def was_generated(session_id: str, question: str, sql: str) -> bool:
+    """Whether sql is, unedited, what /generate-query/ answered to question in the session."""
+    history = history_store.get_history(session_id)
+    target = normalize_sql(sql)
+    return any(
+        asked["role"] == "user" and asked["content"] == question and answer["role"] == "assistant"
+        and normalize_sql(extract_sql(answer["content"])) == target
+        for asked, answer in zip(history, history[1:])
+    )
 
 
 @app.post("/execute-query/")
 async def execute_query_endpoint(request_body: ExecuteQueryRequest):
     """Endpoint to execute SQL query."""
-    if not hasattr(app.state, 'db_connection'):
+    db_connection: Optional[DatabaseConnection] = get_db_connection()
+    if db_connection is None:
         raise HTTPException(status_code=400, detail="Database connection not established. Please connect to database first.")
 
     sql_query = request_body.sql_query
 
-    db_connection: DatabaseConnection = app.state.db_connection
-    results, columns, error = db_connection.execute_query(sql_query)
+    if env_vars['cost_guard_enabled']:
+        # EXPLAIN and execution are blocking round-trips, keep them off the event loop
+        estimate, reasons = await asyncio.to_thread(
+            db_connection.check_query_cost,
+            sql_query,
+            max_rows=env_vars['cost_guard_max_rows'],
+            max_cost=env_vars['cost_guard_max_cost'],
+            max_bytes=env_vars['cost_guard_max_bytes']
+        )
+        if reasons and env_vars['cost_guard_mode'] == "reject":
+            raise HTTPException(status_code=400, detail={"message": "Query rejected by cost guard", "reasons": reasons, "cost_estimate": estimate})
+        if reasons and not request_body.confirmed:
+            return {"results": None, "error": None, "requires_confirmation": True, "reasons": reasons, "cost_estimate": estimate}
+
+    with span("execute_query", db_type=getattr(app.state, 'db_type', None)):
+        results, columns, error = await asyncio.to_thread(db_connection.execute_query, sql_query)
     formatted_results = db_connection.format_results(results, columns, error)
+
+    sql = extract_sql(sql_query)
+    if (not error and request_body.question and env_vars['example_store_enabled']
+            and is_single_select(sql, app.state.db_type)
+            and await asyncio.to_thread(was_generated, request_body.session_id, request_body.question, sql)):
+        # Keep the successful pair as a few-shot example for similar questions
+        try:
+            example_store = await asyncio.to_thread(get_example_store)
+            await asyncio.to_thread(
+                example_store.record,
+                request_body.question,
+                sql,
+                app.state.db_type,
+                referenced_tables(sql, app.state.db_type)
+            )
+        except Exception as e:
+            logger.warning("Failed to record example: %s", e)
     return {"results": formatted_results, "error": error}
 
 
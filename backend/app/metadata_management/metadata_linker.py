@@ -0,0 +1,135 @@
+# app/metadata_management/metadata_linker.py
+import os
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Metadata records linked to schema tables, stored with each vector store build
+METADATA_INDEX_FILE_NAME = "metadata_index.json"
+
+# Record fields (lower-cased) naming the table or column a record describes
+TABLE_KEYS = ("table", "table_name")
+COLUMN_KEYS = ("column_name", "column", "field", "field_name")
+
+# File name endings stripped before matching a file to a table, e.g. sales_metadata.csv -> sales
+FILE_SUFFIXES = ("_metadata", "_dictionary", "_columns", "_description", "_descriptions")
+
+
+def _field(record: Dict, keys: Tuple[str, ...]) -> Optional[str]:
+    for key, value in record.items():
+        if str(key).lower() in keys and value not in (None, ""):
+            return str(value).strip()
+    return None
+
+
+def _record_text(record: Dict) -> str:
+    """The descriptive part of a record: its remaining non-empty fields."""
+    values = [
+        (key, value) for key, value in record.items()
+        if str(key).lower() not in TABLE_KEYS + COLUMN_KEYS and value not in (None, "")
+    ]
+    if len(values) == 1:
+        return str(values[0][1]).strip()
+    return "; ".join(f"{key}: {str(value).strip()}" for key, value in values)
+
+
+def match_file_to_table(file_name: str, tables: Dict[str, Dict]) -> Optional[str]:
+    """Table a metadata file describes, from its name (case-insensitive, singular or plural)."""
+    stem = os.path.splitext(file_name)[0].lower()
+    for suffix in FILE_SUFFIXES:
+        if stem.endswith(suffix):
+            stem = stem[:-len(suffix)]
+    for candidate in (stem, f"{stem}s", stem[:-1] if stem.endswith("s") else None):
+        if candidate and candidate in tables:
+            return candidate
+    return None
+
+
+def link_metadata(schema: Dict, metadata: Dict[str, List[Dict]]) -> Tuple[Dict[str, Dict], Dict[str, int]]:
+    """
+    Attach metadata records to schema tables and columns by name.
+    A record's own table field wins; otherwise the file name decides the table; otherwise a
+    column name that exists in exactly one table does. Records that match nothing are dropped.
+    Returns the index {table: {"notes": [...], "columns": {column: [...]}}} and link counts.
+    """
+    tables = {
+        table["table"].lower(): {col["column_name"].lower(): col["column_name"] for col in table.get("columns", [])}
+        for table in schema.get("tables", [])
+    }
+    table_names = {table["table"].lower(): table["table"] for table in schema.get("tables", [])}
+    column_owners: Dict[str, List[str]] = {}
+    for table, columns in tables.items():
+        for column in columns:
+            column_owners.setdefault(column, []).append(table)
+
+    index: Dict[str, Dict] = {}
+    counts = {"linked": 0, "unlinked": 0}
+    for file_name, records in metadata.items():
+        file_table = match_file_to_table(file_name, tables)
+        for record in records:
+            text = _record_text(record)
+            column = (_field(record, COLUMN_KEYS) or "").lower()
+            table = (_field(record, TABLE_KEYS) or "").lower().split(".")[-1] or file_table
+            if table is None and len(column_owners.get(column, [])) == 1:
+                table = column_owners[column][0]
+            if not text or table not in tables:
+                counts["unlinked"] += 1
+                continue
+
+            entry = index.setdefault(table_names[table], {"notes": [], "columns": {}})
+            if column in tables[table]:
+                entry["columns"].setdefault(tables[table][column], []).append(text)
+            elif column:
+                # Column not in the schema (renamed or dropped): keep it as a table note
+                entry["notes"].append(f"{column}: {text}")
+            else:
+                entry["notes"].append(text)
+            counts["linked"] += 1
+    return index, counts
+
+
+def build_metadata_index(schema_path: str, metadata_path: Optional[str], output_file: str) -> Dict[str, int]:
+    """Link metadata.json to schema.json and write the per-table index. Returns link counts."""
+    with open(schema_path, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+    metadata = {}
+    if metadata_path and os.path.exists(metadata_path):
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+    index, counts = link_metadata(schema, metadata)
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    temp_path = f"{output_file}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    os.replace(temp_path, output_file)
+    logger.info("Metadata index: %d records linked to %d tables, %d unlinked", counts['linked'], len(index), counts['unlinked'])
+    return counts
+
+
+_index_cache: Dict[str, Tuple[float, Dict[str, Dict]]] = {}
+
+
+def load_metadata_index(index_path: str) -> Dict[str, Dict]:
+    """Load the metadata index, reloading only when the file changes; empty if it was never built."""
+    if not os.path.exists(index_path):
+        return {}
+    mtime = os.path.getmtime(index_path)
+    cached = _index_cache.get(index_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(index_path, "r", encoding="utf-8") as f:
+        index = {table.lower(): entry for table, entry in json.load(f).items()}
+    _index_cache[index_path] = (mtime, index)
+    return index
+
+
+def format_table_metadata(table: str, entry: Dict) -> str:
+    """Render a table's linked metadata the way it is shown to the LLM."""
+    lines = [f"Table {table}:"]
+    lines.extend(f"- {note}" for note in entry.get("notes", []))
+    for column, descriptions in entry.get("columns", {}).items():
+        lines.append(f"- {column}: {' | '.join(descriptions)}")
+    return "\n".join(lines)
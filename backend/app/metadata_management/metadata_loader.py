@@ -1,47 +1,255 @@
 # app/metadata_management/metadata_loader.py
 import os
-import pandas as pd
 import json
-from typing import Dict
+import hashlib
+import logging
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple
+from app.config import load_env_variables, data_path
+
+if TYPE_CHECKING:
+    import pandas as pd # Imported where files are read, so the API does not load it at startup
+
+logger = logging.getLogger(__name__)
 
 path = os.path.dirname(os.path.abspath(__file__))
-print(path)
 
-METADATA_OUTPUT_FILE = f"{path}/metadata/metadata.json" # Define output file constant
+METADATA_OUTPUT_FILE = data_path(f"{path}/metadata/metadata.json", "metadata", "metadata.json") # Define output file constant
 INPUT_METADATA_FOLDER = f"{path}/input_metadata" # Define input folder constant
+MANIFEST_FILE_NAME = "manifest.json" # Size, mtime and hash of every file already parsed, next to the output
+
+PARTS_DIR_NAME = "parts" # One JSONL file of records per input file, next to the output
+
+METADATA_EXTENSIONS = (".csv", ".xls", ".xlsx")
+CSV_CHUNK_ROWS = 50000
+
+
+def file_sha256(file_path: str) -> str:
+    """Content hash of a file, read in blocks so large spreadsheets are not loaded at once."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
 
-def read_and_merge_files(folder_path: str) -> Dict:
-    """Reads and merges metadata files from a folder."""
-    metadata = {}
+def load_manifest(manifest_file: str) -> Dict[str, Dict]:
+    """Manifest of previously parsed files: file name -> {size, mtime, sha256}."""
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
 
-    for file_name in os.listdir(folder_path):
+
+def scan_metadata_files(folder_path: str, manifest: Dict[str, Dict]) -> Tuple[Dict[str, Dict], Dict[str, List[str]]]:
+    """
+    Compare the metadata files in a folder with the manifest.
+    Files whose size and mtime match are unchanged without being read; otherwise the
+    content hash decides, so a touched but identical file is not parsed again.
+    Returns the new manifest and the diff: added, modified, removed and unchanged file names.
+    """
+    new_manifest = {}
+    diff = {"added": [], "modified": [], "removed": [], "unchanged": []}
+
+    for file_name in sorted(os.listdir(folder_path)):
         file_path = os.path.join(folder_path, file_name)
+        if not (os.path.isfile(file_path) and file_name.lower().endswith(METADATA_EXTENSIONS)):
+            continue
+
+        stat = os.stat(file_path)
+        previous = manifest.get(file_name)
+        if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+            new_manifest[file_name] = previous
+            diff["unchanged"].append(file_name)
+            continue
+
+        sha256 = file_sha256(file_path)
+        new_manifest[file_name] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha256}
+        if previous is None:
+            diff["added"].append(file_name)
+        elif previous["sha256"] == sha256:
+            diff["unchanged"].append(file_name)
+        else:
+            diff["modified"].append(file_name)
+
+    diff["removed"] = sorted(set(manifest) - set(new_manifest))
+    return new_manifest, diff
+
+
+def _has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+def _clean_records(df: "pd.DataFrame") -> List[Dict]:
+    """DataFrame rows as records with missing values as None instead of NaN."""
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def iter_metadata_records(file_path: str, chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[List[Dict]]:
+    """
+    Reads one CSV or Excel metadata file as batches of records.
+    CSV files are streamed in chunks with pandas, which types every chunk the same way
+    whatever optional readers are installed. Excel files are read whole, with calamine when installed.
+    """
+    import pandas as pd
+    if file_path.lower().endswith(".csv"):
+        for df in pd.read_csv(file_path, chunksize=chunk_rows):
+            yield _clean_records(df)
+    else:
+        engine = "calamine" if _has_module("python_calamine") else None
+        yield _clean_records(pd.read_excel(file_path, engine=engine))
 
-        if os.path.isfile(file_path) and file_name.lower().endswith((".csv", ".xls", ".xlsx")):
-            try:
-                if file_name.lower().endswith(".csv"):
-                    df = pd.read_csv(file_path)
-                else:
-                    df = pd.read_excel(file_path)
-                metadata[file_name] = df.to_dict(orient="records")
-            except Exception as e:
-                print(f"Error reading {file_name}: {e}")
-    return metadata
 
+def read_metadata_file(file_path: str) -> List[Dict]:
+    """Reads one CSV or Excel metadata file into a list of records."""
+    records = []
+    for batch in iter_metadata_records(file_path):
+        records.extend(batch)
+    return records
 
-def process_metadata(input_folder: str = INPUT_METADATA_FOLDER, output_file: str = METADATA_OUTPUT_FILE) -> Dict:
+
+def part_path(parts_dir: str, file_name: str) -> str:
+    """Line-delimited records of one input file."""
+    return os.path.join(parts_dir, f"{file_name}.jsonl")
+
+
+def parse_to_part(file_path: str, parts_dir: str, chunk_rows: int = CSV_CHUNK_ROWS) -> Tuple[str, int, Optional[str]]:
     """
-    Processes metadata files from the input folder, merges them, and saves to a JSON file.
-    Returns the loaded metadata as a dictionary.
+    Parse one metadata file into its JSONL part, one record per line, replacing the old
+    part only once parsing succeeded. Runs in a worker process.
+    Returns (file name, record count, error message or None).
+    """
+    file_name = os.path.basename(file_path)
+    target = part_path(parts_dir, file_name)
+    temp_path = f"{target}.tmp"
+    count = 0
+    try:
+        with open(temp_path, "w", encoding="utf-8") as out_f:
+            for batch in iter_metadata_records(file_path, chunk_rows):
+                for record in batch:
+                    out_f.write(json.dumps(record, default=str) + "\n")
+                count += len(batch)
+        os.replace(temp_path, target)
+        return file_name, count, None
+    except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return file_name, 0, str(e)
+
+
+def parse_files_to_parts(folder_path: str, file_names: List[str], parts_dir: str,
+                         workers: int = 0, chunk_rows: int = CSV_CHUNK_ROWS,
+                         progress: Optional[Callable[[str, int, Optional[int]], None]] = None) -> Dict[str, Optional[str]]:
     """
+    Parse files into JSONL parts, in parallel on a process pool when there is more than one.
+    Returns file name -> error message (None on success).
+    """
+    os.makedirs(parts_dir, exist_ok=True)
+    paths = [os.path.join(folder_path, name) for name in file_names]
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    results: Dict[str, Optional[str]] = {}
+
+    def record(outcome: Tuple[str, int, Optional[str]]) -> None:
+        file_name, count, error = outcome
+        if error:
+            logger.error("Error reading %s: %s", file_name, error)
+        results[file_name] = error
+        if progress:
+            progress("files parsed", len(results), len(paths))
+
+    if progress:
+        progress("files parsed", 0, len(paths))
+    if workers <= 1:
+        for file_path in paths:
+            record(parse_to_part(file_path, parts_dir, chunk_rows))
+    else:
+        # Spawned, not forked: builds run on a job thread of a multithreaded server, and a
+        # forked child can inherit locks (logging, imports) held by the other threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(parse_to_part, file_path, parts_dir, chunk_rows) for file_path in paths]
+            for future in as_completed(futures):
+                record(future.result())
+    return results
+
+
+def iter_part_records(parts_dir: str, file_name: str) -> Iterator[Dict]:
+    """Records of one parsed file, read back line by line."""
+    with open(part_path(parts_dir, file_name), "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_merged_metadata(output_file: str, parts_dir: str, file_names: List[str]) -> None:
+    """
+    Write metadata.json ({file name: [records]}) by streaming the parts, so the merged
+    output never has to be held in memory.
+    """
+    temp_path = f"{output_file}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as out_f:
+        out_f.write("{")
+        for i, file_name in enumerate(file_names):
+            out_f.write(("," if i else "") + f"\n    {json.dumps(file_name)}: [")
+            with open(part_path(parts_dir, file_name), "r", encoding="utf-8") as part_f:
+                first = True
+                for line in part_f:
+                    line = line.strip()
+                    if line:
+                        out_f.write(("," if not first else "") + "\n        " + line)
+                        first = False
+            out_f.write("\n    ]")
+        out_f.write("\n}\n")
+    os.replace(temp_path, output_file)
+
+
+def update_metadata(input_folder: str = INPUT_METADATA_FOLDER, output_file: str = METADATA_OUTPUT_FILE,
+                    manifest_file: Optional[str] = None,
+                    progress: Optional[Callable[[str, int, Optional[int]], None]] = None) -> Dict[str, List[str]]:
+    """
+    Incrementally refresh the merged metadata file.
+    Only new or modified files are parsed, in parallel, each into its own JSONL part;
+    parts of removed files are deleted and metadata.json is re-assembled from the parts.
+    Returns the file diff (added, modified, removed, unchanged and failed file names).
+    """
+    env_vars = load_env_variables()
     output_dir = os.path.dirname(output_file)
-    os.makedirs(output_dir, exist_ok=True) # Ensure metadata dir exists
+    parts_dir = os.path.join(output_dir, PARTS_DIR_NAME)
+    os.makedirs(parts_dir, exist_ok=True) # Ensure metadata dir exists
+    manifest_file = manifest_file or os.path.join(output_dir, MANIFEST_FILE_NAME)
+
+    # Files in the manifest without a part have to be parsed again
+    manifest = {
+        name: entry for name, entry in load_manifest(manifest_file).items()
+        if os.path.exists(part_path(parts_dir, name))
+    }
+
+    new_manifest, diff = scan_metadata_files(input_folder, manifest)
+    changed = diff["added"] + diff["modified"]
+    errors = parse_files_to_parts(
+        input_folder, changed, parts_dir,
+        workers=env_vars['metadata_parse_workers'],
+        chunk_rows=env_vars['metadata_csv_chunk_rows'],
+        progress=progress
+    )
 
-    metadata = read_and_merge_files(input_folder)
+    # Files that failed to parse stay out of the manifest and the output so the next run retries them
+    diff["failed"] = [name for name in changed if errors.get(name)]
+    for file_name in diff["failed"] + diff["removed"]:
+        new_manifest.pop(file_name, None)
+        if os.path.exists(part_path(parts_dir, file_name)):
+            os.remove(part_path(parts_dir, file_name))
+        for key in ("added", "modified"):
+            if file_name in diff[key]:
+                diff[key].remove(file_name)
 
-    with open(output_file, "w", encoding="utf-8") as out_f:
-        json.dump(metadata, out_f, indent=4) # Write merged metadata to JSON
+    if changed or diff["removed"] or not os.path.exists(output_file):
+        write_merged_metadata(output_file, parts_dir, sorted(new_manifest))
+    with open(manifest_file, "w", encoding="utf-8") as f:
+        json.dump(new_manifest, f, indent=2)
 
-    print(f"Metadata documentation generated in '{output_file}'")
-    return metadata # Return the metadata
\ No newline at end of file
+    logger.info("Metadata files: %d added, %d modified, %d removed, %d unchanged, %d failed",
+                len(diff['added']), len(diff['modified']), len(diff['removed']), len(diff['unchanged']), len(diff['failed']))
+    return diff
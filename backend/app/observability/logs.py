@@ -0,0 +1,26 @@
+# app/observability/logs.py
+import random
+import logging
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Fraction of sampled debug messages that are emitted when DEBUG is enabled
+_sample_rate = 1.0
+
+
+def configure_logging(level: str = "INFO", sample_rate: float = 1.0) -> None:
+    """Set the level of the app's loggers and the sampling rate of large debug payloads."""
+    global _sample_rate
+    _sample_rate = sample_rate
+    logging.basicConfig(format=LOG_FORMAT)
+    logging.getLogger("app").setLevel(level.upper())
+
+
+def debug_sampled(logger: logging.Logger, message: str, *args) -> None:
+    """
+    Debug log for large payloads such as retrieved contexts.
+    The level is checked first, so nothing is formatted when DEBUG is off; with DEBUG on,
+    only a sample of the messages is written.
+    """
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < _sample_rate:
+        logger.debug(message, *args)
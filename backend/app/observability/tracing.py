@@ -0,0 +1,306 @@
+# app/observability/tracing.py
+import io
+import re
+import time
+import uuid
+import threading
+import importlib.util
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+# Recent traces kept in memory for /debug/traces/
+TRACE_BUFFER_SIZE = 200
+# Lines of cProfile output kept with a profiled trace
+PROFILE_LINES = 40
+
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+class Span:
+    """One timed operation of a trace."""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start", "end")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return round(((self.end or time.perf_counter()) - self.start) * 1000, 2)
+
+    def to_dict(self) -> Dict:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "offset_ms": round((self.start - self.trace.root.start) * 1000, 2),
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes
+        }
+
+
+class Trace:
+    """Spans of one request or build job; the first span is the root."""
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, parent_span_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.started_at = time.time()
+        self.profile: Optional[str] = None
+        self._lock = threading.Lock()
+        self.spans: List[Span] = []
+        self.root = self.add(name, parent_span_id, {})
+
+    def add(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Span:
+        span_ = Span(self, name, parent_id, attributes)
+        with self._lock:
+            self.spans.append(span_)
+        return span_
+
+    def summary(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": self.started_at,
+            "duration_ms": self.root.duration_ms,
+            "spans": len(self.spans),
+            "profiled": self.profile is not None,
+            "status": self.root.attributes.get("status")
+        }
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            spans = [span_.to_dict() for span_ in self.spans]
+        return {**self.summary(), "spans": spans}
+
+
+class TraceBuffer:
+    """Ring buffer of finished traces, oldest dropped first."""
+
+    def __init__(self, size: int = TRACE_BUFFER_SIZE):
+        self._traces: "deque[Trace]" = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def resize(self, size: int) -> None:
+        with self._lock:
+            self._traces = deque(self._traces, maxlen=size)
+
+    def add(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces.append(trace)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            return next((trace for trace in self._traces if trace.trace_id == trace_id), None)
+
+    def list(self, limit: int = 50, min_duration_ms: float = 0, name: Optional[str] = None) -> List[Trace]:
+        """Newest first, optionally only slow traces or those whose root name contains name."""
+        with self._lock:
+            traces = list(reversed(self._traces))
+        return [
+            trace for trace in traces
+            if trace.root.duration_ms >= min_duration_ms and (not name or name in trace.root.name)
+        ][:limit]
+
+
+TRACES = TraceBuffer()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def _reset(token, fallback: Optional[Span]) -> None:
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        # Exited in another context than it was entered (e.g. an async generator closed elsewhere)
+        _current_span.set(fallback)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """
+    Time the enclosed block as a child of the current span.
+    Outside a trace (no request or job running) this does nothing.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    span_ = parent.trace.add(name, parent.span_id, attributes)
+    token = _current_span.set(span_)
+    try:
+        yield span_
+    except BaseException as e:
+        span_.attributes["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span_.end = time.perf_counter()
+        _reset(token, parent)
+
+
+def record_span(name: str, started: float, **attributes) -> None:
+    """
+    Add a span that already finished (started is a perf_counter value) under the current span.
+    For work that yields in between, where a with-block would leave the span current
+    for the caller too.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return
+    span_ = parent.trace.add(name, parent.span_id, attributes)
+    span_.start = started
+    span_.end = time.perf_counter()
+
+
+@contextmanager
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes) -> Iterator[Trace]:
+    """
+    Start a trace with a root span; it goes to the ring buffer once the block exits.
+    A valid W3C traceparent continues the caller's trace id.
+    """
+    match = TRACEPARENT_PATTERN.match(traceparent or "")
+    trace = Trace(name, *(match.groups() if match else ()))
+    trace.root.attributes.update(attributes)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.attributes["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        trace.root.end = time.perf_counter()
+        _reset(token, None)
+        TRACES.add(trace)
+
+
+def traceparent() -> Optional[str]:
+    """W3C traceparent of the current span, None outside a trace."""
+    span_ = _current_span.get()
+    if span_ is None:
+        return None
+    return f"00-{span_.trace.trace_id}-{span_.span_id}-01"
+
+
+_sql_comments_enabled = True
+
+
+def configure_tracing(buffer_size: int = TRACE_BUFFER_SIZE, sql_comments: bool = True) -> None:
+    global _sql_comments_enabled
+    TRACES.resize(buffer_size)
+    _sql_comments_enabled = sql_comments
+
+
+def with_trace_comment(query: str) -> str:
+    """
+    Prefix a query sent to the database with the current traceparent (sqlcommenter style),
+    so a slow query in the warehouse's query history can be traced back to its API request.
+    The comment goes first: a trailing one could end up inside a -- comment or after a semicolon.
+    """
+    parent = traceparent()
+    if not _sql_comments_enabled or parent is None:
+        return query
+    return f"/* traceparent='{parent}' */ {query}"
+
+
+# Python allows one active profiler per process, so profiled requests are serialized
+_profile_lock = threading.Lock()
+
+
+def profiler_available(mode: str) -> bool:
+    if mode == "pyinstrument":
+        return importlib.util.find_spec("pyinstrument") is not None
+    return mode == "cprofile"
+
+
+@contextmanager
+def profile_trace(trace: Trace, mode: str) -> Iterator[None]:
+    """
+    Profile the enclosed block and keep the report with the trace.
+    cProfile sees everything on the event loop while it runs, including other requests;
+    pyinstrument (when installed) attributes awaited time to the profiled request.
+    If another request is being profiled, this one runs unprofiled.
+    """
+    if not profiler_available(mode) or not _profile_lock.acquire(blocking=False):
+        trace.root.attributes["profile"] = "skipped"
+        yield
+        return
+    try:
+        if mode == "pyinstrument":
+            from pyinstrument import Profiler
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                trace.profile = profiler.output_text(unicode=True)
+        else:
+            import cProfile
+            import pstats
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                output = io.StringIO()
+                pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_LINES)
+                trace.profile = output.getvalue()
+        trace.root.attributes["profile"] = mode
+    finally:
+        _profile_lock.release()
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware tracing every HTTP request, including the streamed body of SSE responses.
+    The trace id is returned in the X-Trace-Id header. With profiling enabled, a request
+    sent with an X-Profile header (or profile= query parameter) of "cprofile" or
+    "pyinstrument" is profiled and the report kept with its trace.
+    """
+
+    def __init__(self, app, profiling_enabled: bool = False):
+        self.app = app
+        self.profiling_enabled = profiling_enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+        mode = headers.get("x-profile") or _query_param(scope, "profile")
+        with start_trace(f"{scope['method']} {scope['path']}", headers.get("traceparent")) as trace:
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", trace.trace_id.encode())]
+                    trace.root.attributes["status"] = message["status"]
+                await send(message)
+
+            if self.profiling_enabled and mode:
+                with profile_trace(trace, mode.lower()):
+                    await self.app(scope, receive, send_with_trace_id)
+            else:
+                await self.app(scope, receive, send_with_trace_id)
+            route = scope.get("route")
+            if route is not None:
+                trace.root.name = f"{scope['method']} {route.path}"
+
+
+def _query_param(scope, name: str) -> Optional[str]:
+    for pair in scope.get("query_string", b"").decode("latin-1").split("&"):
+        key, _, value = pair.partition("=")
+        if key == name and value:
+            return value
+    return None
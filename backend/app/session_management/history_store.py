@@ -0,0 +1,186 @@
+# app/session_management/history_store.py
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+SUMMARY_ROLE = "summary"
+# How often idle sessions are deleted from the SQLite file
+PRUNE_INTERVAL_SECONDS = 60
+
+
+class ChatSession:
+    def __init__(self, summary: str = "", messages: Optional[List[Dict[str, str]]] = None,
+                 last_access: Optional[float] = None):
+        self.summary = summary
+        self.messages = messages or []
+        self.last_access = last_access or time.time()
+
+
+def _summarize_message(msg: Dict[str, str], max_chars: int = 160) -> str:
+    """One compact line for a message rolled out of the recent history."""
+    content = " ".join(msg['content'].split())
+    if len(content) > max_chars:
+        content = content[:max_chars - 3] + "..."
+    return f"{'Q' if msg['role'] == 'user' else 'A'}: {content}"
+
+
+class ChatHistoryStore:
+    """
+    Per-session chat history with bounded memory.
+    Each session keeps its most recent messages verbatim; older ones are rolled into a
+    compact extractive summary. Idle sessions are evicted least recently used first and,
+    when a SQLite path is given, sessions are persisted so they survive eviction and restarts.
+    With shared=True the file is also written by other API workers: sessions are always
+    read from it and updated in a transaction, so a follow-up may go to any worker.
+    Persisted sessions idle for longer than idle_ttl_seconds are deleted.
+    """
+
+    def __init__(self, max_sessions: int = 1000, max_messages: int = 12, idle_ttl_seconds: int = 3600,
+                 summary_max_chars: int = 1500, db_path: Optional[str] = None, shared: bool = False):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.summary_max_chars = summary_max_chars
+        self.db_path = db_path
+        self.shared = bool(db_path) and shared
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+        if db_path:
+            with self._connection() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS chat_sessions (
+                        session_id TEXT PRIMARY KEY,
+                        summary TEXT NOT NULL,
+                        messages TEXT NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    @contextmanager
+    def _connection(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        """Connection committed on success, rolled back on error and always closed."""
+        conn = self._connect()
+        try:
+            with conn:
+                if immediate:
+                    conn.execute("BEGIN IMMEDIATE")
+                yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[Optional[sqlite3.Connection]]:
+        """Write transaction for a read-modify-write of a shared session, None otherwise."""
+        if not self.shared:
+            yield None
+            return
+        with self._connection(immediate=True) as conn:
+            yield conn
+
+    def _load(self, session_id: str, conn: Optional[sqlite3.Connection] = None) -> Optional[ChatSession]:
+        if not self.db_path:
+            return None
+        if conn is None:
+            with self._connection() as conn:
+                return self._load(session_id, conn)
+        row = conn.execute(
+            "SELECT summary, messages, last_access FROM chat_sessions WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        if row is None or time.time() - row[2] > self.idle_ttl_seconds:
+            return None
+        return ChatSession(row[0], json.loads(row[1]), row[2])
+
+    def _save(self, session_id: str, session: ChatSession, conn: Optional[sqlite3.Connection] = None) -> None:
+        if not self.db_path:
+            return
+        if conn is None:
+            with self._connection() as conn:
+                return self._save(session_id, session, conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO chat_sessions (session_id, summary, messages, last_access) VALUES (?, ?, ?, ?)",
+            (session_id, session.summary, json.dumps(session.messages), session.last_access)
+        )
+        if session.last_access - self._pruned_at >= PRUNE_INTERVAL_SECONDS:
+            self._pruned_at = session.last_access
+            conn.execute("DELETE FROM chat_sessions WHERE last_access < ?",
+                         (session.last_access - self.idle_ttl_seconds,))
+
+    def _evict(self, now: float) -> None:
+        """Drop idle sessions and the least recently used ones over capacity (caller holds the lock)."""
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access <= self.idle_ttl_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+    def _get_session(self, session_id: str, conn: Optional[sqlite3.Connection] = None) -> ChatSession:
+        """Fetch a session, loading it from disk or creating it (caller holds the lock)."""
+        now = time.time()
+        # A shared session may have been updated by another worker since it was cached
+        session = None if self.shared else self._sessions.get(session_id)
+        if session is not None and now - session.last_access > self.idle_ttl_seconds:
+            session = None
+        if session is None:
+            session = self._load(session_id, conn) or ChatSession()
+        session.last_access = now
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        self._evict(now)
+        return session
+
+    def _roll_into_summary(self, session: ChatSession) -> None:
+        """Move messages over the per-session cap into the summary, keeping it bounded."""
+        overflow = len(session.messages) - self.max_messages
+        if overflow <= 0:
+            return
+        rolled, session.messages = session.messages[:overflow], session.messages[overflow:]
+        lines = session.summary.split("\n") if session.summary else []
+        lines.extend(_summarize_message(msg) for msg in rolled)
+        while lines and sum(len(line) + 1 for line in lines) > self.summary_max_chars:
+            lines.pop(0)
+        session.summary = "\n".join(lines)
+
+    def get_history(self, session_id: str) -> List[Dict[str, str]]:
+        """Return the session summary (if any) followed by the recent messages."""
+        with self._lock:
+            session = self._get_session(session_id)
+            history = list(session.messages)
+            if session.summary:
+                history.insert(0, {"role": SUMMARY_ROLE, "content": session.summary})
+            return history
+
+    def append_exchange(self, session_id: str, user_content: str, assistant_content: str) -> None:
+        """Record a question and its answer for a session."""
+        with self._lock, self._transaction() as conn:
+            session = self._get_session(session_id, conn)
+            session.messages.extend([
+                {"role": "user", "content": user_content},
+                {"role": "assistant", "content": assistant_content}
+            ])
+            self._roll_into_summary(session)
+            self._save(session_id, session, conn)
+
+    def clear(self, session_id: str) -> None:
+        """Forget a session."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            if self.db_path:
+                with self._connection() as conn:
+                    conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+
+    def stats(self) -> Dict:
+        """Number of sessions held in memory and messages across them."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "messages": sum(len(s.messages) for s in self._sessions.values())
+            }
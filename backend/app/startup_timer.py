@@ -0,0 +1,27 @@
+# app/startup_timer.py
+import time
+from typing import Dict
+
+
+class StartupTimer:
+    """
+    Wall-clock breakdown of the API process start-up.
+    mark(phase) records the time since the previous mark, so phases add up to the total.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: Dict[str, float] = {}
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases[phase] = round((now - self._last) * 1000, 1)
+        self._last = now
+
+    def report(self) -> Dict:
+        return {"phases_ms": dict(self.phases), "total_ms": round((self._last - self.started) * 1000, 1)}
+
+    def summary(self) -> str:
+        phases = ", ".join(f"{phase} {ms:.0f} ms" for phase, ms in self.phases.items())
+        return f"Startup took {(self._last - self.started) * 1000:.0f} ms ({phases})"
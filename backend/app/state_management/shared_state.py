@@ -0,0 +1,202 @@
+# app/state_management/shared_state.py
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from app.config import data_path
+
+try:
+    import fcntl # POSIX only; without it locks only hold within one process
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+path = os.path.dirname(os.path.abspath(__file__))
+
+SHARED_STATE_DB_PATH = data_path(f"{path}/shared_state.db", "shared_state.db")
+LOCKS_DIR_NAME = "locks"
+# Finished build jobs kept for status queries from any worker
+MAX_SHARED_JOBS = 100
+
+_MISSING = object()
+
+
+class SharedState:
+    """
+    State every API worker must agree on, kept in a SQLite file next to the artifacts:
+    the active database connection, readiness flags, the artifact generation and
+    snapshots of build jobs. File locks next to it serialize builds writing the same artifacts.
+    Workers on several hosts share it when DATA_DIR is on a filesystem with POSIX locks.
+    get_cached serves hot reads from memory for cache_seconds, so request handlers on the
+    event loop do not query the file on every call.
+    """
+
+    def __init__(self, db_path: str = SHARED_STATE_DB_PATH, cache_seconds: float = 1.0):
+        self.db_path = db_path
+        self.cache_seconds = cache_seconds
+        # key -> (read at, value), _MISSING for keys that were not set
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self._cache_lock = threading.Lock()
+        self.locks_dir = os.path.join(os.path.dirname(os.path.abspath(db_path)), LOCKS_DIR_NAME)
+        os.makedirs(self.locks_dir, exist_ok=True)
+        self._thread_locks: Dict[str, threading.Lock] = {}
+        self._thread_locks_guard = threading.Lock()
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    snapshot TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+        # Connection details (passwords excepted) and job results are kept here
+        os.chmod(db_path, 0o600)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Connection committed on success, rolled back on error and always closed."""
+        conn = self._connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def get_cached(self, key: str, default: Any = None) -> Any:
+        """get, answered from memory when the key was read or written less than cache_seconds ago."""
+        now = time.monotonic()
+        with self._cache_lock:
+            cached = self._cache.get(key)
+        if cached is None or now - cached[0] >= self.cache_seconds:
+            cached = (now, self.get(key, _MISSING))
+            with self._cache_lock:
+                self._cache[key] = cached
+        return default if cached[1] is _MISSING else cached[1]
+
+    def _remember(self, values: Dict[str, Any]) -> None:
+        """Writes of this worker are visible to its own cached reads at once."""
+        now = time.monotonic()
+        with self._cache_lock:
+            self._cache.update({key: (now, value) for key, value in values.items()})
+
+    def set(self, key: str, value: Any) -> None:
+        self.update({key: value})
+
+    def update(self, values: Dict[str, Any]) -> None:
+        """Set several keys in one transaction, so other workers never see half of them."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO state (key, value, updated_at) VALUES (?, ?, ?)",
+                [(key, json.dumps(value), now) for key, value in values.items()]
+            )
+        self._remember(values)
+
+    def increment(self, key: str) -> int:
+        """Atomically add one to a counter and return the new value."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+            value = (json.loads(row[0]) if row else 0) + 1
+            conn.execute("INSERT OR REPLACE INTO state (key, value, updated_at) VALUES (?, ?, ?)",
+                         (key, json.dumps(value), time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+        self._remember({key: value})
+        return value
+
+    def save_job(self, snapshot: Dict) -> None:
+        """Publish a build job snapshot (see Job.to_dict) for the other workers."""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, kind, snapshot, updated_at) VALUES (?, ?, ?, ?)",
+                (snapshot["job_id"], snapshot["kind"], json.dumps(snapshot), time.time())
+            )
+            conn.execute(
+                "DELETE FROM jobs WHERE job_id NOT IN (SELECT job_id FROM jobs ORDER BY updated_at DESC LIMIT ?)",
+                (MAX_SHARED_JOBS,)
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT snapshot FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list_jobs(self, kind: Optional[str] = None) -> List[Dict]:
+        """Job snapshots of every worker, newest first."""
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT snapshot FROM jobs WHERE ? IS NULL OR kind = ? ORDER BY updated_at DESC", (kind, kind)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _thread_lock(self, name: str) -> threading.Lock:
+        with self._thread_locks_guard:
+            return self._thread_locks.setdefault(name, threading.Lock())
+
+    @contextmanager
+    def lock(self, name: str, on_wait: Optional[Callable[[], None]] = None) -> Iterator[None]:
+        """
+        Exclusive lock shared by every worker, held for the enclosed block.
+        on_wait is called when another holder has to be waited for. The operating
+        system releases the lock if its holder dies, so a crashed build never blocks the next.
+        """
+        thread_lock = self._thread_lock(name)
+        if not thread_lock.acquire(blocking=False):
+            if on_wait:
+                on_wait()
+            thread_lock.acquire()
+        try:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.locks_dir, f"{name}.lock"), 'a') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    if on_wait:
+                        on_wait()
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            thread_lock.release()
+
+    def is_locked(self, name: str) -> bool:
+        """Whether some worker holds the lock right now."""
+        if self._thread_lock(name).locked():
+            return True
+        if fcntl is None:
+            return False
+        with open(os.path.join(self.locks_dir, f"{name}.lock"), 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            return False
@@ -0,0 +1,121 @@
+# benchmarks/environment.py
+import os
+import json
+from typing import Dict, Optional, Tuple
+
+# Settings for offline runs; values already in the environment win
+OFFLINE_ENV = {
+    "AZURE_OPENAI_API_KEY": "offline",
+    "AZURE_OPENAI_ENDPOINT": "https://offline.invalid",
+    "AZURE_OPENAI_DEPLOYMENT": "offline",
+    # The fakes have no quota; limits would measure the limiter instead of the code
+    "CHAT_REQUESTS_PER_MINUTE": "1000000",
+    "CHAT_TOKENS_PER_MINUTE": "1000000000",
+    "EMBEDDINGS_REQUESTS_PER_MINUTE": "1000000",
+    "EMBEDDINGS_TOKENS_PER_MINUTE": "1000000000",
+    # Repeated questions would be answered from the cache instead of the pipeline
+    "SEMANTIC_CACHE_ENABLED": "false",
+    "LLM_PRELOAD": "false",
+    "LOG_LEVEL": "WARNING"
+}
+
+
+def configure_offline_environment(data_dir: str) -> None:
+    """
+    Point the app at a scratch DATA_DIR with offline settings.
+    Must run before app modules are imported: artifact paths are resolved at import.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    os.environ["DATA_DIR"] = data_dir
+    for key, value in OFFLINE_ENV.items():
+        os.environ.setdefault(key, value)
+
+
+def install_fake_clients(first_token_latency: float, token_latency: float, embedding_latency: float) -> Tuple:
+    """Make the app use the fake chat model and embeddings; returns (llm, embeddings)."""
+    from app.llm.llm_chain import set_llm_clients
+    from app.llm.rate_limited_embeddings import RateLimitedEmbeddings
+    from benchmarks.fakes import FakeChatModel, HashEmbeddings
+
+    llm = FakeChatModel(first_token_latency=first_token_latency, token_latency=token_latency)
+    embeddings = RateLimitedEmbeddings(HashEmbeddings(latency=embedding_latency))
+    set_llm_clients(llm, embeddings)
+    return llm, embeddings
+
+
+def write_schema(schema: Dict) -> str:
+    """Replace schema.json atomically, as load_db_schema does."""
+    from app.db_management.schema_loader import SCHEMA_OUTPUT_DIR
+
+    os.makedirs(SCHEMA_OUTPUT_DIR, exist_ok=True)
+    output_file = os.path.join(SCHEMA_OUTPUT_DIR, 'schema.json')
+    temp_file = f"{output_file}.tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(schema, f, indent=4)
+    os.replace(temp_file, output_file)
+    return output_file
+
+
+def write_metadata(metadata: Dict) -> str:
+    from app.metadata_management.metadata_loader import METADATA_OUTPUT_FILE
+
+    os.makedirs(os.path.dirname(METADATA_OUTPUT_FILE), exist_ok=True)
+    with open(METADATA_OUTPUT_FILE, 'w') as f:
+        json.dump(metadata, f, indent=4)
+    return METADATA_OUTPUT_FILE
+
+
+def build_vector_store(embeddings_latency: float, fresh: bool = True) -> Dict:
+    """Build the vector store from the written schema and metadata with offline embeddings."""
+    import shutil
+    from app.llm.rate_limiter import BULK
+    from app.llm.rate_limited_embeddings import RateLimitedEmbeddings
+    from app.llm.vector_store import VECTOR_STORE_PATH, create_vector_store_from_files, reset_vector_store_cache
+    from app.db_management.schema_loader import SCHEMA_OUTPUT_DIR
+    from app.metadata_management.metadata_loader import METADATA_OUTPUT_FILE
+    from benchmarks.fakes import HashEmbeddings
+
+    if fresh:
+        reset_vector_store_cache()
+        shutil.rmtree(VECTOR_STORE_PATH, ignore_errors=True)
+    return create_vector_store_from_files(
+        schema_path=os.path.join(SCHEMA_OUTPUT_DIR, 'schema.json'),
+        metadata_path=METADATA_OUTPUT_FILE,
+        persist_dir=VECTOR_STORE_PATH,
+        embeddings=RateLimitedEmbeddings(HashEmbeddings(latency=embeddings_latency), priority=BULK)
+    )
+
+
+def attach_connection(connection, db_type: str = "postgres", main_module=None):
+    """
+    Connect the API app to the stand-in database as the /connect-* and build endpoints would.
+    The SQLite stand-in is driven as "postgres": the generated SQL is plain ANSI.
+    """
+    if main_module is None:
+        import app.main as main_module
+    main_module.set_db_connection(connection, db_type)
+    main_module.shared_state.update({"schema_loaded": True, "metadata_loaded": True})
+    main_module.invalidate_generation_cache()
+    return main_module.app
+
+
+def postgres_credentials(dsn: Optional[str]) -> Optional[Dict]:
+    return {"dsn": dsn} if dsn else None
+
+
+def setup_offline_deployment(schema: Dict, metadata: Dict, work_dir: str, rows_per_table: int = 20, seed: int = 0,
+                             first_token_latency: float = 0.05, token_latency: float = 0.001,
+                             embedding_latency: float = 0.005):
+    """
+    Everything an analyst needs before asking questions, offline: the synthetic tables in
+    SQLite, schema.json, metadata, a vector store and fake clients. Returns the API app.
+    """
+    from benchmarks.local_db import SQLiteConnection, create_sqlite_database, load_sqlite_schema
+
+    db_path = os.path.join(work_dir, f"offline_{len(schema['tables'])}.sqlite")
+    create_sqlite_database(schema, db_path, rows_per_table, seed=seed)
+    write_schema(load_sqlite_schema(db_path))
+    write_metadata(metadata)
+    build_vector_store(embedding_latency)
+    install_fake_clients(first_token_latency, token_latency, embedding_latency)
+    return attach_connection(SQLiteConnection(db_path))
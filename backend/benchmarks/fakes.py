@@ -0,0 +1,122 @@
+# benchmarks/fakes.py
+import re
+import time
+import asyncio
+import hashlib
+import math
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from app.llm.context_builder import TABLE_NAME_PATTERN
+
+COLUMN_NAME_PATTERN = re.compile(r'"column_name"\s*:\s*"([^"]+)"')
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+# Characters per streamed chunk, roughly one token
+CHUNK_CHARS = 4
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for AzureChatOpenAI with a fixed latency.
+    The answer selects a few columns of the first table in the prompt's schema, so it
+    passes schema validation and runs against the synthetic database. Same prompt, same answer.
+    """
+
+    first_token_latency: float = 0.05
+    token_latency: float = 0.001
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        prompt = "\n".join(str(message.content) for message in messages)
+        match = TABLE_NAME_PATTERN.search(prompt)
+        if match is None:
+            return "No table in the schema matches the question."
+        table_text = prompt[match.start():]
+        next_table = TABLE_NAME_PATTERN.search(table_text, 1)
+        if next_table is not None:
+            table_text = table_text[:next_table.start()]
+        columns = COLUMN_NAME_PATTERN.findall(table_text)[:3] or ["*"]
+        return (
+            f"Lists {', '.join(columns)} from {match.group(1)}.\n\n"
+            f"```sql\nSELECT {', '.join(columns)}\nFROM {match.group(1)}\nLIMIT 10;\n```"
+        )
+
+    def _chunks(self, text: str) -> List[str]:
+        return [text[i:i + CHUNK_CHARS] for i in range(0, len(text), CHUNK_CHARS)]
+
+    def _result(self, text: str, n: int) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text)) for _ in range(n)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        text = self._answer(messages)
+        time.sleep(self.first_token_latency + self.token_latency * len(self._chunks(text)))
+        return self._result(text, kwargs.get("n", 1))
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        text = self._answer(messages)
+        await asyncio.sleep(self.first_token_latency + self.token_latency * len(self._chunks(text)))
+        return self._result(text, kwargs.get("n", 1))
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_latency)
+        for chunk in self._chunks(self._answer(messages)):
+            time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_latency)
+        for chunk in self._chunks(self._answer(messages)):
+            await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Offline stand-in for AzureOpenAIEmbeddings with a fixed latency per request.
+    Words are hashed into a fixed number of dimensions (feature hashing), so texts sharing
+    words get similar vectors and retrieval returns plausible tables.
+    """
+
+    def __init__(self, size: int = 256, latency: float = 0.005, chunk_size: int = 16):
+        self.size = size
+        self.latency = latency
+        self.chunk_size = chunk_size
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.size
+        words = WORD_PATTERN.findall(text.lower())
+        for word in words:
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.size
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def _requests(self, texts: List[str]) -> int:
+        return max(1, math.ceil(len(texts) / self.chunk_size))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency * self._requests(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency * self._requests(texts))
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self._embed(text)
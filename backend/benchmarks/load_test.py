@@ -0,0 +1,316 @@
+# benchmarks/load_test.py
+"""
+Concurrent load test of /generate-query/ and /execute-query/, run from backend/:
+
+    python -m benchmarks.load_test --profile analysts
+    python -m benchmarks.load_test --profile my_profile.json --users 1 10 50 --label after \\
+        --compare benchmarks/results/load-before.json
+
+Each virtual analyst has its own chat session and a seeded random stream of questions
+(new ones, popular ones shared with other analysts, follow-ups) with think time in
+between, so the same profile always sends the same requests. By default the app runs
+in-process against the offline stand-ins of benchmarks.environment, which also lets the
+harness measure event-loop lag and memory of the worker; --url drives a running server
+with questions from --questions-file instead.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+from typing import Dict, List, Optional
+
+from benchmarks.environment import configure_offline_environment
+from benchmarks.run import read_sse_events
+from app.llm.sql_validator import extract_sql
+from benchmarks.results import (REGRESSION_THRESHOLD, summarize, environment_info, save_results,
+                                load_results, compare_results, format_comparison)
+
+PROFILES: Dict[str, Dict] = {
+    # Quick check that the harness and the app work together
+    "smoke": {
+        "tables": 50, "users": [1, 4], "requests_per_user": 3, "think_time_ms": 0,
+        "mix": {"new": 0.5, "popular": 0.3, "follow_up": 0.2}, "execute_ratio": 0.5, "popular_questions": 5,
+        "llm_latency_ms": 20, "token_latency_ms": 1, "embedding_latency_ms": 2, "p99_budget_ms": 5000, "seed": 0
+    },
+    # Latencies close to Azure OpenAI, analysts reading each answer before the next question
+    "analysts": {
+        "tables": 500, "users": [1, 5, 10, 25, 50, 100], "requests_per_user": 10, "think_time_ms": 2000,
+        "mix": {"new": 0.5, "popular": 0.3, "follow_up": 0.2}, "execute_ratio": 0.6, "popular_questions": 20,
+        "llm_latency_ms": 800, "token_latency_ms": 15, "embedding_latency_ms": 60, "p99_budget_ms": 10000, "seed": 0
+    }
+}
+
+FOLLOW_UPS = [
+    "same but only the top 5",
+    "now group it by region",
+    "add the average as well",
+    "sort that descending",
+    "only for last month",
+    "exclude rows with a null status",
+]
+# Seconds between event-loop lag samples
+LAG_SAMPLE_INTERVAL = 0.01
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident memory of the process now (Linux only)."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+
+
+def load_profile(name_or_path: str) -> Dict:
+    if name_or_path in PROFILES:
+        return dict(PROFILES[name_or_path])
+    with open(name_or_path, 'r') as f:
+        return {**PROFILES["analysts"], **json.load(f)}
+
+
+class LevelRecorder:
+    """Latencies and failures of one concurrency level."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {"generate_query": [], "execute_query": []}
+        self.errors: Dict[str, int] = {"generate_query": 0, "execute_query": 0}
+        self.first_error: Optional[str] = None
+
+    def record(self, name: str, seconds: float, error: Optional[str] = None) -> None:
+        self.latencies[name].append(seconds)
+        if error:
+            self.errors[name] += 1
+            self.first_error = self.first_error or f"{name}: {error}"
+
+
+async def monitor_event_loop_lag(samples: List[float], stop: asyncio.Event) -> None:
+    """How late the loop wakes a sleeping task: time the loop was blocked or saturated."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(LAG_SAMPLE_INTERVAL)
+        samples.append(max(0.0, time.perf_counter() - started - LAG_SAMPLE_INTERVAL))
+
+
+async def analyst(user: int, level: int, client, profile: Dict, question_pool: List[str],
+                  new_question, recorder: LevelRecorder) -> None:
+    """One virtual analyst: generate, sometimes execute, think, repeat."""
+    rng = random.Random(f"{profile['seed']}-{level}-{user}")
+    session_id = f"load-{level}-{user}"
+    kinds, weights = zip(*profile["mix"].items())
+    asked = False
+    for _ in range(profile["requests_per_user"]):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "follow_up" and asked:
+            question = rng.choice(FOLLOW_UPS)
+        elif kind == "popular":
+            question = rng.choice(question_pool)
+        else:
+            question = new_question(rng)
+
+        started = time.perf_counter()
+        sql, error = None, None
+        try:
+            response = await client.post("/generate-query/", params={"query_text": question, "session_id": session_id})
+            if response.status_code != 200:
+                error = f"HTTP {response.status_code}"
+            else:
+                for event in read_sse_events(response.text):
+                    if event["event"] == "sql_query":
+                        sql = event["data"]
+                    elif event["event"] == "error":
+                        error = event["data"]
+                error = error or (None if sql else "no sql_query event")
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        recorder.record("generate_query", time.perf_counter() - started, error)
+        asked = True
+
+        if sql and rng.random() < profile["execute_ratio"]:
+            started = time.perf_counter()
+            try:
+                # As the frontend does, only the SQL of the answer is executed
+                response = await client.post("/execute-query/", json={"sql_query": extract_sql(sql)})
+                error = f"HTTP {response.status_code}" if response.status_code != 200 else response.json().get("error")
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            recorder.record("execute_query", time.perf_counter() - started, error)
+
+        if profile["think_time_ms"]:
+            await asyncio.sleep(rng.expovariate(1000 / profile["think_time_ms"]))
+
+
+async def run_level(users: int, client, profile: Dict, question_pool: List[str], new_question,
+                    chat_sessions=None, in_process: bool = True) -> Dict:
+    """
+    Run every analyst of one concurrency level to completion and summarize.
+    Event-loop lag and memory are those of this process, so only measured when the app runs in it.
+    """
+    recorder = LevelRecorder()
+    lag_samples: List[float] = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_event_loop_lag(lag_samples, stop)) if in_process else None
+    rss_start = current_rss_mb() if in_process else None
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*[
+            analyst(user, users, client, profile, question_pool, new_question, recorder) for user in range(users)
+        ])
+    finally:
+        elapsed = time.perf_counter() - started
+        stop.set()
+        if monitor is not None:
+            await monitor
+
+    rss_end = current_rss_mb() if in_process else None
+    requests = sum(len(latencies) for latencies in recorder.latencies.values())
+    result = {
+        name: {**summarize(latencies), "errors": recorder.errors[name]}
+        for name, latencies in recorder.latencies.items()
+    }
+    result["load"] = {
+        "users": users,
+        "requests": requests,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 3) if elapsed else None,
+        "event_loop_lag": summarize(lag_samples) if lag_samples else None,
+        "rss_start_mb": rss_start,
+        "rss_end_mb": rss_end,
+        "rss_growth_mb": round(rss_end - rss_start, 1) if rss_start is not None and rss_end is not None else None,
+        "chat_sessions": chat_sessions() if chat_sessions else None,
+        "first_error": recorder.first_error
+    }
+    generate = result["generate_query"]
+    lag = result["load"]["event_loop_lag"]
+    print(f"{users:>5} users  {result['load']['throughput_rps']:>7.2f} req/s  generate p50 "
+          f"{generate.get('p50_ms', 0):>9.1f} ms  p99 {generate.get('p99_ms', 0):>9.1f} ms  "
+          f"errors {generate['errors'] + result['execute_query']['errors']}  "
+          f"loop lag p99 {lag['p99_ms'] if lag else float('nan'):>7.1f} ms  "
+          f"rss {rss_end if rss_end is not None else float('nan'):>7.1f} MB", file=sys.stderr)
+    return result
+
+
+async def warm_up(client, question: str) -> None:
+    """One unmeasured request, so the first level does not pay for opening the stores."""
+    await client.post("/generate-query/", params={"query_text": question, "session_id": "load-warm-up"})
+
+
+def capacity(results: Dict[str, Dict], budget_ms: float) -> Optional[int]:
+    """Most concurrent analysts whose generate p99 stayed within budget without errors."""
+    passing = [
+        level["load"]["users"] for level in results.values()
+        if level["generate_query"].get("p99_ms", float("inf")) <= budget_ms
+        and not level["generate_query"]["errors"] and not level["execute_query"]["errors"]
+    ]
+    return max(passing) if passing else None
+
+
+async def run_offline(profile: Dict, work_dir: str) -> Dict[str, Dict]:
+    import httpx
+    from benchmarks.environment import setup_offline_deployment
+    from benchmarks.synthetic import generate_schema, generate_metadata, generate_questions
+
+    schema = generate_schema(profile["tables"], seed=profile["seed"])
+    app = setup_offline_deployment(
+        schema, generate_metadata(schema, seed=profile["seed"]), work_dir, seed=profile["seed"],
+        first_token_latency=profile["llm_latency_ms"] / 1000,
+        token_latency=profile["token_latency_ms"] / 1000,
+        embedding_latency=profile["embedding_latency_ms"] / 1000
+    )
+    import app.main as main_module
+
+    question_pool = generate_questions(schema, profile["popular_questions"], seed=profile["seed"])
+
+    def new_question(rng: random.Random) -> str:
+        return generate_questions(schema, 1, seed=rng.getrandbits(32))[0]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+        await warm_up(client, question_pool[0])
+        return {
+            f"users_{users}": await run_level(users, client, profile, question_pool, new_question,
+                                              lambda: main_module.history_store.stats()["sessions"])
+            for users in profile["users"]
+        }
+
+
+async def run_against_server(profile: Dict, url: str, questions: List[str]) -> Dict[str, Dict]:
+    import httpx
+
+    question_pool = questions[:profile["popular_questions"]]
+
+    def new_question(rng: random.Random) -> str:
+        return rng.choice(questions)
+
+    async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+        await warm_up(client, question_pool[0])
+        return {
+            f"users_{users}": await run_level(users, client, profile, question_pool, new_question, in_process=False)
+            for users in profile["users"]
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test of the SQL generation endpoints.")
+    parser.add_argument("--profile", default="analysts", help=f"One of {', '.join(PROFILES)} or a JSON file")
+    parser.add_argument("--users", type=int, nargs="+", help="Concurrency levels, overriding the profile")
+    parser.add_argument("--requests-per-user", type=int, help="Overrides the profile")
+    parser.add_argument("--seed", type=int, help="Overrides the profile")
+    parser.add_argument("--url", help="Running server to load instead of the in-process offline app")
+    parser.add_argument("--questions-file", help="Questions (one per line) for --url")
+    parser.add_argument("--label", help="Results file name, defaults to load-<commit>-<time>")
+    parser.add_argument("--compare", help="Load test results file to compare the p50 latencies against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    profile = load_profile(args.profile)
+    for key in ("users", "requests_per_user", "seed"):
+        if getattr(args, key) is not None:
+            profile[key] = getattr(args, key)
+
+    if args.url:
+        if not args.questions_file:
+            parser.error("--url needs --questions-file")
+        with open(args.questions_file, 'r') as f:
+            questions = [line.strip() for line in f if line.strip()]
+        levels = asyncio.run(run_against_server(profile, args.url, questions))
+    else:
+        work_dir = tempfile.mkdtemp(prefix="sqlgen-load-")
+        try:
+            configure_offline_environment(os.path.join(work_dir, "data"))
+            # One event loop for every level: the app's semaphores and limiters are bound to it
+            levels = asyncio.run(run_offline(profile, work_dir))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    info = environment_info()
+    results = {
+        **info,
+        "target": args.url or "in-process",
+        "profile": profile,
+        "capacity_users": capacity(levels, profile["p99_budget_ms"]),
+        "results": levels
+    }
+    print(f"Capacity: {results['capacity_users']} concurrent analysts within a p99 of "
+          f"{profile['p99_budget_ms']} ms", file=sys.stderr)
+    label = args.label or f"load-{info['commit'] or 'local'}-{time.strftime('%Y%m%d-%H%M%S')}"
+    print(f"Results written to {save_results(results, label)}", file=sys.stderr)
+
+    if args.compare:
+        baseline = load_results(args.compare)
+        if baseline.get("profile") != profile:
+            print("Warning: the runs used different profiles, latencies may not be comparable", file=sys.stderr)
+        rows = compare_results(baseline, results, args.threshold)
+        print(format_comparison(rows))
+        if args.fail_on_regression and any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# benchmarks/local_db.py
+import os
+import random
+import sqlite3
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.db_management.connection import DatabaseConnection
+from app.observability.metrics import time_stage
+from app.observability.tracing import with_trace_comment
+from benchmarks.synthetic import create_table_statements, generate_rows
+
+
+class SQLiteConnection(DatabaseConnection):
+    """
+    Local stand-in for the warehouse connections.
+    Like them it opens a connection per query, so connect time is part of the measurements.
+    """
+
+    def __init__(self, db_path: str):
+        super().__init__()
+        self.db_path = db_path
+
+    def test_connection(self) -> bool:
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("SELECT 1;").fetchone()
+            conn.close()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def execute_query(self, query: str) -> Tuple[List, Optional[List[str]], Optional[str]]:
+        conn = None
+        try:
+            with time_stage("db_connect"):
+                conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            with time_stage("db_execute"):
+                cursor.execute(with_trace_comment(query))
+            with time_stage("db_fetch"):
+                results = cursor.fetchall()
+            column_names = [desc[0] for desc in cursor.description]
+            return results, column_names, None
+        except Exception as e:
+            return [], None, str(e)
+        finally:
+            if conn:
+                conn.close()
+
+    def format_results(self, results: List, columns: Optional[List[str]], error: Optional[str]) -> str:
+        if error:
+            return f"Error: {error}"
+        if not results:
+            return "No results found."
+        output = []
+        if columns:
+            output.append(" | ".join(columns))
+            output.append("-" * len(output[0]))
+        for row in results[:50]:
+            output.append(" | ".join(str(value) for value in row))
+        if len(results) > 50:
+            output.append(f"\n... and {len(results) - 50} more rows")
+        return "\n".join(output)
+
+
+def create_sqlite_database(schema: Dict, db_path: str, rows_per_table: int = 20, seed: int = 0) -> None:
+    """Create the synthetic tables in a new SQLite file and fill them with rows."""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    try:
+        for table, statement in zip(schema["tables"], create_table_statements(schema)):
+            conn.execute(statement)
+            rows = generate_rows(table, rows_per_table, rng)
+            if rows:
+                placeholders = ", ".join("?" for _ in table["columns"])
+                conn.executemany(f"INSERT INTO {table['table']} VALUES ({placeholders})", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_sqlite_schema(db_path: str, progress: Optional[Callable[[str, int, Optional[int]], None]] = None) -> Dict:
+    """Introspect a SQLite file into the schema.json format of load_postgres_schema."""
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+        )]
+        schema_data: Dict = {"tables": [], "relationships": []}
+        for i, table in enumerate(tables):
+            if progress:
+                progress("tables introspected", i, len(tables))
+            foreign_keys = {row[3]: (row[2], row[4]) for row in conn.execute(f"PRAGMA foreign_key_list({table})")}
+            row_count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            table_entry = {"table": table, "row_count": row_count, "columns": []}
+            for _, name, data_type, not_null, default, primary_key in conn.execute(f"PRAGMA table_info({table})"):
+                foreign_table, foreign_column = foreign_keys.get(name, (None, None))
+                key_type = "PRIMARY KEY" if primary_key else "FOREIGN KEY" if foreign_table else ""
+                details = [f"Type: {data_type}", "Not Nullable" if not_null or primary_key else "Nullable"]
+                if key_type:
+                    details.append(key_type)
+                if foreign_table:
+                    details.append(f"References: {foreign_table}({foreign_column})")
+                    schema_data["relationships"].append({
+                        "source": f"{table}.{name}",
+                        "references": f"{foreign_table}.{foreign_column}"
+                    })
+                table_entry["columns"].append({
+                    "column_name": name,
+                    "data_type": data_type.lower(),
+                    "is_nullable": "NO" if not_null or primary_key else "YES",
+                    "default": default,
+                    "character_maximum_length": None,
+                    "numeric_precision": None,
+                    "numeric_scale": None,
+                    "key_type": key_type,
+                    "foreign_table": foreign_table,
+                    "foreign_column": foreign_column,
+                    "details": " | ".join(details)
+                })
+            schema_data["tables"].append(table_entry)
+        if progress:
+            progress("tables introspected", len(tables), len(tables))
+        return schema_data
+    finally:
+        conn.close()
+
+
+def create_postgres_tables(schema: Dict, db_credentials: Dict, rows_per_table: int = 20, seed: int = 0) -> None:
+    """Create and fill the synthetic tables in a scratch PostgreSQL database."""
+    import psycopg2 # Only needed when benchmarking against PostgreSQL
+    rng = random.Random(seed)
+    conn = psycopg2.connect(**db_credentials)
+    try:
+        cursor = conn.cursor()
+        for table, statement in zip(schema["tables"], create_table_statements(schema)):
+            cursor.execute(statement)
+            rows = generate_rows(table, rows_per_table, rng)
+            if rows:
+                placeholders = ", ".join("%s" for _ in table["columns"])
+                cursor.executemany(
+                    f"INSERT INTO {table['table']} VALUES ({placeholders}) ON CONFLICT DO NOTHING", rows
+                )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def drop_postgres_tables(schema: Dict, db_credentials: Dict) -> None:
+    import psycopg2 # Only needed when benchmarking against PostgreSQL
+    conn = psycopg2.connect(**db_credentials)
+    try:
+        cursor = conn.cursor()
+        for table in reversed(schema["tables"]):
+            cursor.execute(f"DROP TABLE IF EXISTS {table['table']} CASCADE")
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,104 @@
+# benchmarks/results.py
+import os
+import sys
+import json
+import time
+import math
+import platform
+import subprocess
+from typing import Dict, List, Optional, Sequence
+
+path = os.path.dirname(os.path.abspath(__file__))
+
+RESULTS_DIR = f"{path}/results"
+# Relative p50 increase reported as a regression by compare_results
+REGRESSION_THRESHOLD = 0.10
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(durations: Sequence[float]) -> Dict:
+    """Latency summary in milliseconds of durations given in seconds."""
+    values = sorted(d * 1000 for d in durations)
+    if not values:
+        return {"runs": 0}
+    return {
+        "runs": len(values),
+        "mean_ms": round(sum(values) / len(values), 3),
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+        "max_ms": round(values[-1], 3)
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=path, capture_output=True,
+                              text=True, timeout=5, check=True).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment_info() -> Dict:
+    """Where the numbers were measured, stored with them: results from different machines do not compare."""
+    return {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def save_results(results: Dict, label: str, results_dir: str = RESULTS_DIR) -> str:
+    os.makedirs(results_dir, exist_ok=True)
+    output_file = os.path.join(results_dir, f"{label}.json")
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2)
+    return output_file
+
+
+def load_results(file_path: str) -> Dict:
+    with open(file_path, 'r') as f:
+        return json.load(f)
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = REGRESSION_THRESHOLD) -> List[Dict]:
+    """
+    p50 of every benchmark present in both runs, keyed by scenario (e.g. schema size) and name.
+    A p50 more than threshold above the baseline is flagged as a regression.
+    """
+    rows = []
+    for scenario, benchmarks in current.get("results", {}).items():
+        for name, stats in benchmarks.items():
+            before = baseline.get("results", {}).get(scenario, {}).get(name)
+            if not before or "p50_ms" not in before or "p50_ms" not in stats:
+                continue
+            change = (stats["p50_ms"] - before["p50_ms"]) / before["p50_ms"] if before["p50_ms"] else 0.0
+            rows.append({
+                "scenario": scenario,
+                "benchmark": name,
+                "baseline_p50_ms": before["p50_ms"],
+                "current_p50_ms": stats["p50_ms"],
+                "change": round(change, 4),
+                "regression": change > threshold
+            })
+    return rows
+
+
+def format_comparison(rows: List[Dict]) -> str:
+    lines = [f"{'scenario':>10} {'benchmark':<24} {'baseline':>12} {'current':>12} {'change':>9}"]
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(
+            f"{row['scenario']:>10} {row['benchmark']:<24} {row['baseline_p50_ms']:>10.2f}ms "
+            f"{row['current_p50_ms']:>10.2f}ms {row['change']:>+8.1%}{flag}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,224 @@
+# benchmarks/run.py
+"""
+Offline benchmarks of schema loading, vector store builds, retrieval, prompt assembly and
+the /generate-query/ and /execute-query/ endpoints, run from backend/:
+
+    python -m benchmarks.run --tables 100 1000 --label before
+    python -m benchmarks.run --tables 100 1000 --label after --compare benchmarks/results/before.json
+
+Azure OpenAI is replaced by fakes with fixed latencies and the warehouse by SQLite, or by a
+scratch PostgreSQL database with --postgres-dsn (its synthetic tables are dropped afterwards),
+so results only move when the code does. Results are written to benchmarks/results/<label>.json.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.environment import configure_offline_environment, postgres_credentials
+from benchmarks.results import (REGRESSION_THRESHOLD, summarize, environment_info, save_results,
+                                load_results, compare_results, format_comparison)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of the process so far (Linux and macOS)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class BenchmarkRecorder:
+    """Collects timings per benchmark, with the allocation peak when memory tracing is on."""
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.results: Dict[str, Dict] = {}
+
+    def measure(self, name: str, runs: List[Callable[[], object]]) -> List[object]:
+        """Time each callable once; returns their results."""
+        durations, outputs = [], []
+        if self.trace_memory:
+            tracemalloc.start()
+        try:
+            for run in runs:
+                started = time.perf_counter()
+                outputs.append(run())
+                durations.append(time.perf_counter() - started)
+            self._record(name, durations)
+        finally:
+            if self.trace_memory:
+                self.results[name]["alloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+                tracemalloc.stop()
+        return outputs
+
+    async def ameasure(self, name: str, runs: List[Callable[[], object]]) -> List[object]:
+        """Async version of measure, for coroutines that run on one event loop."""
+        durations, outputs = [], []
+        if self.trace_memory:
+            tracemalloc.start()
+        try:
+            for run in runs:
+                started = time.perf_counter()
+                outputs.append(await run())
+                durations.append(time.perf_counter() - started)
+            self._record(name, durations)
+        finally:
+            if self.trace_memory:
+                self.results[name]["alloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+                tracemalloc.stop()
+        return outputs
+
+    def _record(self, name: str, durations: List[float]) -> None:
+        self.results[name] = {**summarize(durations), "rss_peak_mb": peak_rss_mb()}
+        stats = self.results[name]
+        print(f"  {name:<24} p50 {stats['p50_ms']:>10.2f} ms  p95 {stats['p95_ms']:>10.2f} ms  "
+              f"({stats['runs']} runs)", file=sys.stderr)
+
+
+def read_sse_events(body: str) -> List[Dict]:
+    return [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+
+
+def run_scenario(num_tables: int, args, work_dir: str) -> Dict:
+    """All benchmarks for one synthetic schema size."""
+    from fastapi.testclient import TestClient
+    from app.db_management.connection import PostgresConnection
+    from app.db_management.schema_loader import load_db_schema
+    from app.llm.llm_chain import RETRIEVAL_CANDIDATES, assemble_prompt_inputs
+    from app.llm.prompts import get_prompt_template
+    from app.llm.sql_validator import extract_sql
+    from app.llm.vector_store import VECTOR_STORE_PATH, aget_relevant_documents
+    from benchmarks.environment import (install_fake_clients, write_schema, write_metadata,
+                                        build_vector_store, attach_connection)
+    from benchmarks.local_db import (SQLiteConnection, create_sqlite_database, load_sqlite_schema,
+                                     create_postgres_tables, drop_postgres_tables)
+    from benchmarks.synthetic import generate_schema, generate_metadata, generate_questions
+
+    print(f"{num_tables} tables", file=sys.stderr)
+    recorder = BenchmarkRecorder(args.trace_memory)
+    schema = generate_schema(num_tables, seed=args.seed)
+    questions = generate_questions(schema, args.iterations, seed=args.seed)
+    _, embeddings = install_fake_clients(args.llm_latency_ms / 1000, args.token_latency_ms / 1000,
+                                         args.embedding_latency_ms / 1000)
+    credentials = postgres_credentials(args.postgres_dsn)
+
+    try:
+        if credentials:
+            create_postgres_tables(schema, credentials, args.rows, seed=args.seed)
+            connection = PostgresConnection(credentials)
+            recorder.measure("schema_load", [lambda: load_db_schema(connection, "postgres")])
+        else:
+            db_path = os.path.join(work_dir, f"bench_{num_tables}.sqlite")
+            create_sqlite_database(schema, db_path, args.rows, seed=args.seed)
+            connection = SQLiteConnection(db_path)
+            recorder.measure("schema_load", [lambda: write_schema(load_sqlite_schema(db_path))])
+        write_metadata(generate_metadata(schema, seed=args.seed))
+
+        latency = args.embedding_latency_ms / 1000
+        recorder.measure("vector_store_build", [lambda: build_vector_store(latency, fresh=True)])
+        # Nothing changed: measures the copy, diff and publish of an incremental rebuild
+        recorder.measure("vector_store_rebuild", [lambda: build_vector_store(latency, fresh=False)])
+
+        async def retrieve_and_assemble():
+            retrieved = await aget_relevant_documents(questions[0], embeddings, VECTOR_STORE_PATH,
+                                                      num_results=RETRIEVAL_CANDIDATES) # Warm-up: opens the store
+            retrieved = await recorder.ameasure("retrieval", [
+                lambda q=q: aget_relevant_documents(q, embeddings, VECTOR_STORE_PATH, num_results=RETRIEVAL_CANDIDATES)
+                for q in questions
+            ])
+            recorder.measure("prompt_assembly", [
+                lambda q=q, docs=docs: get_prompt_template(q, "postgres").format_messages(
+                    **assemble_prompt_inputs(q, [], docs[0], docs[1])
+                )
+                for q, docs in zip(questions, retrieved)
+            ])
+
+        asyncio.run(retrieve_and_assemble())
+
+        client = TestClient(attach_connection(connection))
+
+        def generate(index: int, question: str) -> Optional[str]:
+            response = client.post("/generate-query/", params={"query_text": question, "session_id": f"bench-{num_tables}-{index}"})
+            events = read_sse_events(response.text)
+            return next((event["data"] for event in events if event["event"] == "sql_query"), None)
+
+        generate(-1, questions[0]) # Warm-up: first request opens the example store
+        generated = recorder.measure("generate_query", [
+            lambda i=i, q=q: generate(i, q) for i, q in enumerate(questions)
+        ])
+        sql_queries = [extract_sql(sql) for sql in generated if sql]
+        executed = recorder.measure("execute_query", [
+            lambda sql=sql: client.post("/execute-query/", json={"sql_query": sql}).json()
+            for sql in sql_queries
+        ])
+        recorder.results["generate_query"]["answered"] = len(sql_queries)
+        recorder.results["execute_query"]["errors"] = sum(1 for response in executed if response.get("error"))
+        return recorder.results
+    finally:
+        if credentials and not args.keep_tables:
+            drop_postgres_tables(schema, credentials)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the SQL generation pipeline.")
+    parser.add_argument("--tables", type=int, nargs="+", default=[100, 1000],
+                        help="Synthetic schema sizes to benchmark (100 to 100000 tables)")
+    parser.add_argument("--iterations", type=int, default=20, help="Questions per latency benchmark")
+    parser.add_argument("--rows", type=int, default=20, help="Rows per synthetic table")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency-ms", type=float, default=50, help="Fake chat model time to first token")
+    parser.add_argument("--token-latency-ms", type=float, default=1, help="Fake chat model time per streamed chunk")
+    parser.add_argument("--embedding-latency-ms", type=float, default=5, help="Fake embeddings time per request")
+    parser.add_argument("--postgres-dsn", help="Scratch PostgreSQL database to use instead of SQLite")
+    parser.add_argument("--keep-tables", action="store_true", help="Do not drop the synthetic PostgreSQL tables")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Record allocation peaks with tracemalloc (slows the code down)")
+    parser.add_argument("--label", help="Results file name, defaults to the commit and time")
+    parser.add_argument("--compare", help="Results file to compare the p50 latencies against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Relative p50 increase reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="sqlgen-bench-")
+    configure_offline_environment(os.path.join(work_dir, "data"))
+
+    info = environment_info()
+    try:
+        results = {
+            **info,
+            "settings": {key: value for key, value in vars(args).items()
+                         if key not in ("label", "compare", "fail_on_regression", "postgres_dsn")},
+            "database": "postgres" if args.postgres_dsn else "sqlite",
+            "results": {str(num_tables): run_scenario(num_tables, args, work_dir) for num_tables in args.tables}
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    label = args.label or f"{info['commit'] or 'local'}-{time.strftime('%Y%m%d-%H%M%S')}"
+    print(f"Results written to {save_results(results, label)}", file=sys.stderr)
+
+    if args.compare:
+        baseline = load_results(args.compare)
+        changed = sorted(key for key in ("database", "platform", "cpus") if baseline.get(key) != results.get(key))
+        changed += sorted(key for key, value in results["settings"].items()
+                          if key not in ("tables", "threshold") and baseline.get("settings", {}).get(key) != value)
+        if changed:
+            print(f"Warning: runs differ in {', '.join(changed)}, latencies may not be comparable", file=sys.stderr)
+        rows = compare_results(baseline, results, args.threshold)
+        print(format_comparison(rows))
+        if args.fail_on_regression and any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
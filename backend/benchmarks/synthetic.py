@@ -0,0 +1,161 @@
+# benchmarks/synthetic.py
+import random
+from typing import Dict, List, Optional, Tuple
+
+# Table names are <subject>_<n>, so questions can name tables in plain words
+SUBJECTS = ["sales", "orders", "customers", "products", "outlets", "brands", "invoices", "payments",
+            "shipments", "suppliers", "inventory", "returns", "campaigns", "employees", "regions", "stores"]
+# (column name, data type as the schema loaders report it, length or precision, scale)
+COLUMN_TYPES: List[Tuple[str, str, Optional[int], Optional[int]]] = [
+    ("name", "character varying", 100, None),
+    ("category", "character varying", 50, None),
+    ("status", "character varying", 20, None),
+    ("amount", "numeric", 12, 2),
+    ("quantity", "integer", None, None),
+    ("price", "numeric", 10, 2),
+    ("created_at", "timestamp without time zone", None, None),
+    ("order_date", "date", None, None),
+    ("region", "character varying", 50, None),
+    ("score", "integer", None, None),
+]
+CATEGORIES = ["north", "south", "east", "west", "online", "retail", "premium", "basic"]
+
+QUESTION_TEMPLATES = [
+    "total {measure} by {dimension} in {subject}",
+    "top 10 {subject} by {measure}",
+    "how many {subject} per {dimension}",
+    "average {measure} of {subject} for each {dimension}",
+    "list {subject} with {measure} above average",
+    "{subject} {dimension} breakdown for last month",
+]
+
+
+def table_name(index: int) -> str:
+    return f"{SUBJECTS[index % len(SUBJECTS)]}_{index}"
+
+
+def generate_schema(num_tables: int, seed: int = 0, min_columns: int = 4, max_columns: int = 10) -> Dict:
+    """
+    Schema in the format the schema loaders write to schema.json, with foreign keys to earlier tables.
+    The same arguments always give the same schema.
+    """
+    rng = random.Random(seed)
+    schema: Dict = {"tables": [], "relationships": []}
+    for index in range(num_tables):
+        name = table_name(index)
+        columns = [_column("id", "integer", key_type="PRIMARY KEY")]
+        for column, data_type, size, scale in rng.sample(COLUMN_TYPES, min(rng.randint(min_columns, max_columns) - 1, len(COLUMN_TYPES))):
+            columns.append(_column(column, data_type, size, scale))
+        if index and rng.random() < 0.7:
+            parent = table_name(rng.randrange(index))
+            columns.append(_column(f"{parent}_id", "integer", key_type="FOREIGN KEY",
+                                   foreign_table=parent, foreign_column="id"))
+            schema["relationships"].append({"source": f"{name}.{parent}_id", "references": f"{parent}.id"})
+        schema["tables"].append({"table": name, "row_count": 0, "columns": columns})
+    return schema
+
+
+def _column(name: str, data_type: str, size: Optional[int] = None, scale: Optional[int] = None, key_type: str = "",
+            foreign_table: Optional[str] = None, foreign_column: Optional[str] = None) -> Dict:
+    is_text = data_type == "character varying"
+    details = [f"Type: {data_type}"]
+    if is_text:
+        details.append(f"Length: {size}")
+    details.append("Not Nullable" if key_type == "PRIMARY KEY" else "Nullable")
+    if key_type:
+        details.append(key_type)
+    if foreign_table:
+        details.append(f"References: {foreign_table}({foreign_column})")
+    return {
+        "column_name": name,
+        "data_type": data_type,
+        "is_nullable": "NO" if key_type == "PRIMARY KEY" else "YES",
+        "default": None,
+        "character_maximum_length": size if is_text else None,
+        "numeric_precision": None if is_text else size,
+        "numeric_scale": scale,
+        "key_type": key_type,
+        "foreign_table": foreign_table,
+        "foreign_column": foreign_column,
+        "details": " | ".join(details)
+    }
+
+
+def generate_metadata(schema: Dict, coverage: float = 0.5, seed: int = 0) -> Dict:
+    """metadata.json content (file name -> column records) describing a share of the tables."""
+    rng = random.Random(seed)
+    metadata = {}
+    for table in schema["tables"]:
+        if rng.random() < coverage:
+            metadata[f"{table['table']}.csv"] = [
+                {"column_name": column["column_name"],
+                 "description": f"{column['column_name'].replace('_', ' ').capitalize()} of the {table['table']} record"}
+                for column in table["columns"]
+            ]
+    return metadata
+
+
+def generate_questions(schema: Dict, count: int, seed: int = 0) -> List[str]:
+    """A reproducible mix of analyst questions about random tables of the schema."""
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(count):
+        table = rng.choice(schema["tables"])
+        names = [column["column_name"] for column in table["columns"]]
+        questions.append(rng.choice(QUESTION_TEMPLATES).format(
+            subject=table["table"].replace("_", " "),
+            measure=rng.choice([n for n in names if n in ("amount", "quantity", "price", "score")] or ["rows"]),
+            dimension=rng.choice([n for n in names if n in ("category", "status", "region", "name")] or ["id"])
+        ))
+    return questions
+
+
+def sql_type(column: Dict) -> str:
+    data_type = column["data_type"]
+    if data_type == "character varying":
+        return f"VARCHAR({column['character_maximum_length']})"
+    if data_type == "numeric":
+        return f"NUMERIC({column['numeric_precision']},{column['numeric_scale']})"
+    if data_type.startswith("timestamp"):
+        return "TIMESTAMP"
+    return data_type.upper()
+
+
+def create_table_statements(schema: Dict) -> List[str]:
+    """CREATE TABLE statements valid in both SQLite and PostgreSQL, parents before children."""
+    statements = []
+    for table in schema["tables"]:
+        columns = []
+        for column in table["columns"]:
+            definition = f"{column['column_name']} {sql_type(column)}"
+            if column["key_type"] == "PRIMARY KEY":
+                definition += " PRIMARY KEY"
+            elif column["foreign_table"]:
+                definition += f" REFERENCES {column['foreign_table']}({column['foreign_column']})"
+            columns.append(definition)
+        statements.append(f"CREATE TABLE IF NOT EXISTS {table['table']} ({', '.join(columns)})")
+    return statements
+
+
+def generate_rows(table: Dict, count: int, rng: random.Random) -> List[Tuple]:
+    """Rows for a table; foreign keys point at ids 1..count, which every parent table has."""
+    rows = []
+    for row_id in range(1, count + 1):
+        row = []
+        for column in table["columns"]:
+            if column["key_type"] == "PRIMARY KEY":
+                row.append(row_id)
+            elif column["foreign_table"]:
+                row.append(rng.randint(1, count))
+            elif column["data_type"] == "character varying":
+                row.append(f"{rng.choice(CATEGORIES)}_{rng.randint(1, 20)}")
+            elif column["data_type"] == "numeric":
+                row.append(round(rng.uniform(1, 1000), 2))
+            elif column["data_type"] == "integer":
+                row.append(rng.randint(0, 500))
+            elif column["data_type"] == "date":
+                row.append(f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+            else:
+                row.append(f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:00:00")
+        rows.append(tuple(row))
+    return rows
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Artifact paths are resolved when app modules are imported: keep them out of the source tree
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="sqlgen-tests-"))
+os.environ.setdefault("LLM_PRELOAD", "false")
@@ -0,0 +1,26 @@
+import asyncio
+
+from app.llm import batch_runner
+
+
+async def fake_generate(user_query, **kwargs):
+    if user_query == "unknown table":
+        return "```sql\nSELECT id FROM invoices\n```", ["Unknown table 'invoices'"]
+    if user_query == "no schema":
+        return "Error: No schema information available.", []
+    return "```sql\nSELECT id FROM orders\n```", []
+
+
+def test_results_carry_remaining_validation_errors(monkeypatch):
+    monkeypatch.setattr(batch_runner, "agenerate_sql_query_with_llm", fake_generate)
+
+    async def run():
+        return [result async for result in batch_runner.run_batch(
+            ["valid", "unknown table", "no schema"], embeddings=None, llm=None, vector_store_path="", db_type="postgres"
+        )]
+
+    results = {result["question"]: result for result in asyncio.run(run())}
+    assert results["valid"]["validation_errors"] == [] and results["valid"]["error"] is None
+    assert results["unknown table"]["validation_errors"] == ["Unknown table 'invoices'"]
+    assert results["unknown table"]["sql_query"] == "```sql\nSELECT id FROM invoices\n```"
+    assert results["no schema"]["error"] == "Error: No schema information available."
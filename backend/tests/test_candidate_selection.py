@@ -0,0 +1,37 @@
+import asyncio
+
+from app.llm.llm_chain import aselect_cheapest_candidate
+from app.llm.sql_validator import SchemaIndex
+
+INDEX = SchemaIndex({"orders": {"id", "amount"}})
+
+
+class EstimatingConnection:
+    """Stands in for a database connection, with a fixed EXPLAIN cost per statement."""
+
+    def __init__(self, costs):
+        self.costs = costs
+
+    def estimate_query_cost(self, sql):
+        return {"estimated_cost": self.costs[sql], "bytes_scanned": None}
+
+
+def test_untokenizable_candidate_is_skipped():
+    candidates = ["SELECT 'abc", "```sql\nSELECT id FROM orders\n```"]
+    chosen, summary = asyncio.run(aselect_cheapest_candidate(candidates, "postgres", INDEX))
+    assert chosen == candidates[1]
+    assert summary == "1 of 2 candidates valid"
+
+
+def test_cheapest_valid_candidate_is_chosen():
+    candidates = ["SELECT id FROM orders", "SELECT id FROM orders ORDER BY amount", "Here's the query: SELECT"]
+    connection = EstimatingConnection({candidates[0]: 10.0, candidates[1]: 2.5})
+    chosen, summary = asyncio.run(aselect_cheapest_candidate(candidates, "postgres", INDEX, connection))
+    assert chosen == candidates[1]
+    assert summary == "2 of 3 candidates valid, chose estimated cost 2.50"
+
+
+def test_no_valid_candidate_falls_back_to_the_first():
+    candidates = ["SELECT 'abc", "SELECT nope FROM missing"]
+    chosen, _ = asyncio.run(aselect_cheapest_candidate(candidates, "postgres", INDEX))
+    assert chosen == candidates[0]
@@ -0,0 +1,95 @@
+import sys
+import types
+import threading
+
+from app.db_management.connection import DatabaseConnection, PostgresConnection, relation_scans
+
+COUNT_PLAN = [{"Plan": {
+    "Node Type": "Aggregate", "Plan Rows": 1, "Plan Width": 8, "Total Cost": 180000.0,
+    "Plans": [{"Node Type": "Seq Scan", "Relation Name": "huge_table", "Plan Rows": 5000000, "Plan Width": 40}]
+}}]
+
+
+class ExplainingConnection(DatabaseConnection):
+    """Connection whose EXPLAIN returns queued estimates and counts its calls."""
+
+    def __init__(self, *estimates):
+        super().__init__()
+        self.estimates = list(estimates)
+        self.calls = 0
+
+    def test_connection(self):
+        return True
+
+    def execute_query(self, query):
+        return [], None, None
+
+    def format_results(self, results, columns, error):
+        return ""
+
+    def explain_query(self, query):
+        self.calls += 1
+        return self.estimates.pop(0)
+
+
+def test_relation_scans_walk_the_plan():
+    scans = relation_scans(COUNT_PLAN[0]["Plan"])
+    assert [node["Relation Name"] for node in scans] == ["huge_table"]
+
+
+def test_postgres_estimate_counts_scanned_rows(monkeypatch):
+    class Cursor:
+        def execute(self, statement):
+            self.statement = statement
+
+        def fetchone(self):
+            return (COUNT_PLAN,)
+
+    class Connection:
+        def cursor(self):
+            return Cursor()
+
+        def close(self):
+            pass
+
+    monkeypatch.setitem(sys.modules, "psycopg2", types.SimpleNamespace(connect=lambda **kwargs: Connection()))
+    estimate = PostgresConnection({"dbname": "test"}).explain_query("SELECT count(*) FROM huge_table")
+    assert estimate == {"estimated_rows": 5000000, "estimated_cost": 180000.0, "bytes_scanned": 200000000}
+
+
+def test_estimates_are_cached_by_normalized_sql():
+    connection = ExplainingConnection({"estimated_rows": 10, "estimated_cost": 1.0, "bytes_scanned": 100})
+    assert connection.estimate_query_cost("SELECT 1;") == connection.estimate_query_cost("  SELECT   1 ")
+    assert connection.calls == 1
+
+
+def test_failed_explain_is_not_cached():
+    connection = ExplainingConnection({"error": "connection refused"},
+                                      {"estimated_rows": 10, "estimated_cost": 1.0, "bytes_scanned": 100})
+    assert connection.estimate_query_cost("SELECT 1")["error"] == "connection refused"
+    assert connection.estimate_query_cost("SELECT 1")["estimated_rows"] == 10
+    assert connection.calls == 2
+
+
+def test_failed_explain_is_a_violation():
+    connection = ExplainingConnection({"error": "connection refused"})
+    estimate, reasons = connection.check_query_cost("SELECT 1", max_rows=100)
+    assert reasons == ["Query cost could not be estimated: connection refused"]
+
+
+def test_thresholds():
+    connection = ExplainingConnection({"estimated_rows": 5000, "estimated_cost": 10.0, "bytes_scanned": 100})
+    _, reasons = connection.check_query_cost("SELECT 1", max_rows=1000, max_cost=100)
+    assert reasons == ["Estimated rows 5,000 exceeds limit 1,000"]
+
+
+def test_plan_cache_is_shared_safely_between_threads():
+    connection = ExplainingConnection(*[{"estimated_rows": i, "estimated_cost": 1.0, "bytes_scanned": 1}
+                                        for i in range(400)])
+    threads = [threading.Thread(target=lambda n=n: [connection.estimate_query_cost(f"SELECT {n}, {i}")
+                                                      for i in range(50)]) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(connection._plan_cache) == 256
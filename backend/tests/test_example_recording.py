@@ -0,0 +1,36 @@
+import app.main as main
+
+ANSWER = "Orders per customer:\n```sql\nSELECT customer_id, COUNT(*)\nFROM orders GROUP BY customer_id;\n```"
+
+
+def test_generated_sql_is_recognized():
+    main.history_store.append_exchange("examples", "orders per customer", ANSWER)
+    assert main.was_generated("examples", "orders per customer",
+                              "SELECT customer_id, COUNT(*) FROM orders GROUP BY customer_id")
+
+
+def test_edited_sql_and_other_questions_are_not():
+    main.history_store.append_exchange("examples", "orders per customer", ANSWER)
+    assert not main.was_generated("examples", "orders per customer",
+                                  "SELECT customer_id, COUNT(*) FROM orders WHERE amount > 0 GROUP BY customer_id")
+    assert not main.was_generated("examples", "orders per day",
+                                  "SELECT customer_id, COUNT(*) FROM orders GROUP BY customer_id")
+    assert not main.was_generated("other-session", "orders per customer",
+                                  "SELECT customer_id, COUNT(*) FROM orders GROUP BY customer_id")
+
+
+def test_store_returns_similar_examples_for_the_dialect(tmp_path):
+    from app.llm.example_store import ExampleStore
+    from benchmarks.fakes import HashEmbeddings
+
+    store = ExampleStore(HashEmbeddings(latency=0), str(tmp_path))
+    store.record("orders per customer", "SELECT customer_id, COUNT(*) FROM orders GROUP BY customer_id",
+                 "postgres", ["Orders"])
+    store.record("orders per customer", "SELECT 1", "snowflake", [])
+    assert store.count() == 2
+
+    [(question, sql, tables, score)] = store.find_similar("orders per customer", "postgres", min_score=0.5)
+    assert (question, tables) == ("orders per customer", ["orders"])
+    assert sql.startswith("SELECT customer_id")
+    assert score > 0.99
+    assert store.find_similar("orders per customer", "postgres", min_score=1.01) == []
@@ -0,0 +1,35 @@
+import sqlite3
+
+from app.session_management import history_store
+from app.session_management.history_store import ChatHistoryStore, SUMMARY_ROLE
+
+
+def test_old_messages_roll_into_the_summary():
+    store = ChatHistoryStore(max_messages=2)
+    store.append_exchange("s", "first question", "first answer")
+    store.append_exchange("s", "second question", "second answer")
+    history = store.get_history("s")
+    assert history[0] == {"role": SUMMARY_ROLE, "content": "Q: first question\nA: first answer"}
+    assert [msg["content"] for msg in history[1:]] == ["second question", "second answer"]
+
+
+def test_shared_sessions_see_other_workers(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    first, second = ChatHistoryStore(db_path=db_path, shared=True), ChatHistoryStore(db_path=db_path, shared=True)
+    first.append_exchange("s", "q1", "a1")
+    second.append_exchange("s", "q2", "a2")
+    assert [msg["content"] for msg in first.get_history("s")] == ["q1", "a1", "q2", "a2"]
+    first.clear("s")
+    assert second.get_history("s") == []
+
+
+def test_idle_sessions_are_pruned(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "history.db")
+    store = ChatHistoryStore(db_path=db_path, shared=True, idle_ttl_seconds=60)
+    clock = [1000.0]
+    monkeypatch.setattr(history_store.time, "time", lambda: clock[0])
+    store.append_exchange("old", "q", "a")
+    clock[0] += 600
+    store.append_exchange("new", "q", "a")
+    with sqlite3.connect(db_path) as conn:
+        assert [row[0] for row in conn.execute("SELECT session_id FROM chat_sessions")] == ["new"]
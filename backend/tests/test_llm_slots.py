@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from app.llm.llm_chain import llm_calls_in_flight, llm_slot
+
+
+def test_calls_in_flight_are_counted():
+    seen = []
+
+    async def call():
+        async with llm_slot():
+            await asyncio.sleep(0.01)
+            seen.append(llm_calls_in_flight())
+
+    async def run():
+        await asyncio.gather(call(), call(), call())
+
+    asyncio.run(run())
+    assert max(seen) >= 1
+    assert llm_calls_in_flight() == 0
+
+
+def test_slot_is_released_on_error():
+    async def failing_call():
+        async with llm_slot():
+            raise RuntimeError("502")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(failing_call())
+    assert llm_calls_in_flight() == 0
@@ -0,0 +1,29 @@
+import json
+
+from app.metadata_management.metadata_loader import iter_part_records, parse_files_to_parts, read_metadata_file
+
+
+def write_csv(path, rows):
+    path.write_text("\n".join(",".join(row) for row in rows) + "\n")
+
+
+def test_csv_chunks_are_typed_alike(tmp_path):
+    write_csv(tmp_path / "columns.csv", [("table", "column", "rows")] + [("sales", f"c{i}", str(i)) for i in range(5)]
+              + [("sales", "note", "")])
+    records = read_metadata_file(str(tmp_path / "columns.csv"))
+    assert records[0] == {"table": "sales", "column": "c0", "rows": 0.0}
+    assert records[-1] == {"table": "sales", "column": "note", "rows": None}
+
+
+def test_files_are_parsed_on_spawned_workers(tmp_path):
+    inputs, parts = tmp_path / "in", tmp_path / "parts"
+    inputs.mkdir()
+    write_csv(inputs / "a.csv", [("table", "description"), ("orders", "One row per order")])
+    write_csv(inputs / "b.csv", [("table", "description"), ("customers", "One row per customer")])
+    progress = []
+    errors = parse_files_to_parts(str(inputs), ["a.csv", "b.csv"], str(parts), workers=2,
+                                  progress=lambda stage, done, total: progress.append((done, total)))
+    assert errors == {"a.csv": None, "b.csv": None}
+    assert progress[-1] == (2, 2)
+    assert list(iter_part_records(str(parts), "b.csv")) == [{"table": "customers", "description": "One row per customer"}]
+    assert json.loads((parts / "a.csv.jsonl").read_text()) == {"table": "orders", "description": "One row per order"}
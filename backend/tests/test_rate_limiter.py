@@ -0,0 +1,112 @@
+import asyncio
+import types
+
+import pytest
+
+from app.llm import rate_limiter
+from app.llm.rate_limiter import (BULK, INTERACTIVE, RateLimiter, acall_with_rate_limit, call_with_rate_limit,
+                                  get_retry_after)
+
+
+class StatusError(Exception):
+    """Looks like an openai.APIStatusError to the limiter."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = types.SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class APIConnectionError(Exception):
+    """Named like openai.APIConnectionError, which the limiter matches by name."""
+
+
+class APITimeoutError(APIConnectionError):
+    pass
+
+
+def failing(*errors, result="ok"):
+    """Callable raising the given errors in turn, then returning result."""
+    remaining = list(errors)
+    calls = []
+
+    def call():
+        calls.append(1)
+        if remaining:
+            raise remaining.pop(0)
+        return result
+    return call, calls
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "TRANSIENT_BACKOFF_SECONDS", 0.0)
+
+
+def unlimited():
+    return RateLimiter("test", requests_per_minute=1e6, tokens_per_minute=1e9)
+
+
+def test_retry_after_headers():
+    assert get_retry_after(StatusError(429, {"retry-after-ms": "1500"})) == 1.5
+    assert get_retry_after(StatusError(429, {"retry-after": "3"})) == 3.0
+    assert get_retry_after(StatusError(429)) == rate_limiter.DEFAULT_RETRY_AFTER_SECONDS
+    assert get_retry_after(StatusError(500)) is None
+
+
+def test_429_pauses_the_limiter_and_retries():
+    limiter = unlimited()
+    call, calls = failing(StatusError(429, {"retry-after-ms": "50"}))
+    assert call_with_rate_limit(limiter, 10, INTERACTIVE, call) == "ok"
+    assert len(calls) == 2
+    assert limiter.stats()["rate_scale"] == 0.55
+
+
+@pytest.mark.parametrize("error", [StatusError(502), StatusError(503), APITimeoutError(), TimeoutError()])
+def test_transient_errors_are_retried(error):
+    call, calls = failing(error)
+    assert call_with_rate_limit(unlimited(), 10, INTERACTIVE, call) == "ok"
+    assert len(calls) == 2
+
+
+def test_transient_retries_are_bounded():
+    call, calls = failing(*[StatusError(500)] * 5)
+    with pytest.raises(StatusError):
+        call_with_rate_limit(unlimited(), 10, INTERACTIVE, call)
+    assert len(calls) == rate_limiter.MAX_TRANSIENT_RETRIES + 1
+
+
+def test_client_errors_are_not_retried():
+    call, calls = failing(StatusError(400))
+    with pytest.raises(StatusError):
+        call_with_rate_limit(unlimited(), 10, INTERACTIVE, call)
+    assert len(calls) == 1
+
+
+def test_async_retries():
+    sync_call, calls = failing(StatusError(502), StatusError(429, {"retry-after-ms": "10"}))
+
+    async def call():
+        return sync_call()
+
+    assert asyncio.run(acall_with_rate_limit(unlimited(), 10, INTERACTIVE, call)) == "ok"
+    assert len(calls) == 3
+
+
+def test_interactive_calls_overtake_queued_bulk_work():
+    limiter = RateLimiter("test", requests_per_minute=600, tokens_per_minute=1e9)
+    for _ in range(600):
+        limiter.acquire_sync(1)
+    served = []
+
+    async def acquire(name, priority, delay):
+        await asyncio.sleep(delay)
+        await limiter.acquire(1, priority)
+        served.append(name)
+
+    async def run():
+        await asyncio.gather(acquire("bulk-1", BULK, 0), acquire("bulk-2", BULK, 0),
+                             acquire("interactive", INTERACTIVE, 0.02))
+
+    asyncio.run(run())
+    assert served == ["interactive", "bulk-1", "bulk-2"]
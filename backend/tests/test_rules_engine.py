@@ -0,0 +1,32 @@
+from app.llm.rules_engine import CompiledRuleSet, KeywordAutomaton
+
+
+def test_automaton_finds_overlapping_keywords():
+    automaton = KeywordAutomaton({
+        "he": frozenset({"a"}),
+        "she": frozenset({"b"}),
+        "hers": frozenset({"c"}),
+        "date": frozenset({"d"})
+    })
+    assert automaton.match("USHERS") == {"a", "b", "c"}
+    assert automaton.match("no match here") == {"a"}
+    assert automaton.match("") == frozenset()
+
+
+def test_rules_follow_file_order_after_base_rules():
+    rule_set = CompiledRuleSet(
+        base_rules=["Use only SELECT statements."],
+        rules=[
+            {"id": "dates", "patterns": ["month", "date"], "rule": "Use DATE_TRUNC for periods."},
+            {"id": "top", "patterns": ["top"], "rule": "Use ORDER BY with LIMIT."}
+        ],
+        version="1"
+    )
+    matched = rule_set.match("Top 5 customers by month")
+    assert matched == {"dates", "top"}
+    assert rule_set.rules_for(matched) == [
+        "Use only SELECT statements.",
+        "Use DATE_TRUNC for periods.",
+        "Use ORDER BY with LIMIT."
+    ]
+    assert rule_set.rules_for(rule_set.match("list tables")) == ["Use only SELECT statements."]
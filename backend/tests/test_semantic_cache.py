@@ -0,0 +1,40 @@
+from app.llm.semantic_cache import SemanticCache
+
+
+def test_similar_question_above_threshold_hits():
+    cache = SemanticCache(similarity_threshold=0.95)
+    cache.store("How many orders?", [1.0, 0.0], "SELECT COUNT(*) FROM orders", "postgres", "fp")
+    assert cache.lookup("Number of orders?", [0.99, 0.05], "postgres", "fp") == "SELECT COUNT(*) FROM orders"
+
+
+def test_dissimilar_question_misses():
+    cache = SemanticCache(similarity_threshold=0.95)
+    cache.store("How many orders?", [1.0, 0.0], "SELECT COUNT(*) FROM orders", "postgres", "fp")
+    assert cache.lookup("List customers", [0.6, 0.8], "postgres", "fp") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_are_scoped_to_dialect_schema_and_history():
+    cache = SemanticCache()
+    cache.store("How many orders?", [1.0, 0.0], "SELECT 1", "postgres", "fp", history_key="h1")
+    assert cache.lookup("How many orders?", [1.0, 0.0], "snowflake", "fp", history_key="h1") is None
+    assert cache.lookup("How many orders?", [1.0, 0.0], "postgres", "other", history_key="h1") is None
+    assert cache.lookup("How many orders?", [1.0, 0.0], "postgres", "fp", history_key="h2") is None
+    assert cache.lookup_exact("how many   ORDERS?", "postgres", "fp", history_key="h1") == "SELECT 1"
+
+
+def test_expired_entries_are_not_returned():
+    cache = SemanticCache(ttl_seconds=-1)
+    cache.store("How many orders?", [1.0, 0.0], "SELECT 1", "postgres", "fp")
+    assert cache.lookup_exact("How many orders?", "postgres", "fp") is None
+    assert cache.lookup("How many orders?", [1.0, 0.0], "postgres", "fp") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(max_entries=2)
+    cache.store("first", [1.0, 0.0], "SELECT 1", "postgres", "fp")
+    cache.store("second", [0.0, 1.0], "SELECT 2", "postgres", "fp")
+    assert cache.lookup_exact("first", "postgres", "fp") == "SELECT 1"
+    cache.store("third", [1.0, 1.0], "SELECT 3", "postgres", "fp")
+    assert cache.lookup_exact("second", "postgres", "fp") is None
+    assert cache.lookup_exact("first", "postgres", "fp") == "SELECT 1"
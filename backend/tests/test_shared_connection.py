@@ -0,0 +1,31 @@
+import app.main as main
+from app.db_management.connection import PostgresConnection
+
+CREDENTIALS = {"dbname": "sales", "user": "analyst", "password": "s3cret", "host": "db", "port": "5432"}
+
+
+def connect_in_another_worker():
+    main.set_db_connection(PostgresConnection(CREDENTIALS), "postgres", CREDENTIALS)
+    # This process now plays a worker that has not seen the connection yet
+    main.app.state.connection_version = None
+
+
+def test_password_is_not_shared():
+    connect_in_another_worker()
+    record = main.shared_state.get("connection")
+    assert "password" not in record["credentials"]
+    assert record["secret_fields"] == ["password"]
+    assert "s3cret" not in open(main.shared_state.db_path, "rb").read().decode("latin-1")
+
+
+def test_connection_is_rebuilt_with_the_env_password(monkeypatch):
+    connect_in_another_worker()
+    monkeypatch.setitem(main.env_vars, "db_password", "from-env")
+    connection = main.get_db_connection()
+    assert connection.db_credentials == {**CREDENTIALS, "password": "from-env"}
+
+
+def test_connection_is_not_rebuilt_without_a_password(monkeypatch):
+    connect_in_another_worker()
+    monkeypatch.setitem(main.env_vars, "db_password", "")
+    assert main.get_db_connection() is None
@@ -0,0 +1,57 @@
+import threading
+
+from app.state_management.shared_state import SharedState
+
+
+def test_values_and_counters(tmp_path):
+    state = SharedState(str(tmp_path / "shared_state.db"))
+    assert state.get("schema_loaded") is None
+    state.update({"schema_loaded": True, "metadata_loaded": False})
+    other = SharedState(str(tmp_path / "shared_state.db"))
+    assert other.get("schema_loaded") is True
+    assert other.get("metadata_loaded") is False
+    assert [state.increment("generation"), other.increment("generation")] == [1, 2]
+
+
+def test_job_snapshots(tmp_path):
+    state = SharedState(str(tmp_path / "shared_state.db"))
+    state.save_job({"job_id": "a", "kind": "load-schema", "status": "running"})
+    state.save_job({"job_id": "b", "kind": "load-metadata", "status": "queued"})
+    state.save_job({"job_id": "a", "kind": "load-schema", "status": "succeeded"})
+    assert state.get_job("a")["status"] == "succeeded"
+    assert [job["job_id"] for job in state.list_jobs()] == ["a", "b"]
+    assert [job["job_id"] for job in state.list_jobs("load-metadata")] == ["b"]
+    assert state.get_job("missing") is None
+
+
+def test_lock_waits_for_the_holder(tmp_path):
+    state = SharedState(str(tmp_path / "shared_state.db"))
+    held, release, waited = threading.Event(), threading.Event(), []
+
+    def holder():
+        with state.lock("create-vector-store"):
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    held.wait(5)
+    assert state.is_locked("create-vector-store")
+    assert not state.is_locked("load-schema")
+    threading.Timer(0.1, release.set).start()
+    with state.lock("create-vector-store", on_wait=lambda: waited.append(True)):
+        assert waited == [True]
+    thread.join()
+    assert not state.is_locked("create-vector-store")
+
+
+def test_cached_reads(tmp_path):
+    db_path = str(tmp_path / "shared_state.db")
+    state, other = SharedState(db_path, cache_seconds=60), SharedState(db_path, cache_seconds=0)
+    assert state.get_cached("schema_loaded", False) is False
+    other.set("schema_loaded", True)
+    # Served from memory until cache_seconds pass, but this worker's own writes show at once
+    assert state.get_cached("schema_loaded", False) is False
+    state.increment("generation")
+    assert state.get_cached("generation") == 1
+    assert other.get_cached("schema_loaded") is True
@@ -0,0 +1,90 @@
+import asyncio
+
+from app.llm.single_flight import SingleFlight
+
+
+async def collect(stream):
+    return [event async for event in stream]
+
+
+def test_identical_requests_share_one_producer():
+    flight = SingleFlight()
+    runs = []
+
+    async def producer():
+        runs.append(1)
+        yield ("status", "Generating SQL...")
+        await asyncio.sleep(0.01)
+        yield ("sql_query", "SELECT 1")
+
+    async def run():
+        return await asyncio.gather(
+            collect(flight.stream("key", producer)),
+            collect(flight.stream("key", producer))
+        )
+
+    leader, follower = asyncio.run(run())
+    assert len(runs) == 1
+    assert leader == follower == [("status", "Generating SQL..."), ("sql_query", "SELECT 1")]
+    assert flight.stats() == {"in_flight": 0, "started": 1, "coalesced": 1}
+
+
+def test_late_subscriber_replays_earlier_events():
+    flight = SingleFlight()
+    release = None
+
+    async def producer():
+        yield ("status", "first")
+        await release.wait()
+        yield ("status", "second")
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        leader = asyncio.create_task(collect(flight.stream("key", producer)))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(collect(flight.stream("key", producer)))
+        await asyncio.sleep(0)
+        release.set()
+        return await leader, await follower
+
+    leader, follower = asyncio.run(run())
+    assert follower == leader == [("status", "first"), ("status", "second")]
+
+
+def test_producer_error_reaches_every_subscriber():
+    flight = SingleFlight()
+
+    async def producer():
+        yield ("status", "Generating SQL...")
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model unavailable")
+
+    async def run():
+        return await asyncio.gather(*(collect(flight.stream("key", producer)) for _ in range(3)))
+
+    results = asyncio.run(run())
+    for events in results:
+        assert events == [("status", "Generating SQL..."), ("error", "model unavailable")]
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_key_is_released_after_failure():
+    flight = SingleFlight()
+    attempts = []
+
+    async def producer():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("timeout")
+        yield ("sql_query", "SELECT 1")
+
+    async def run():
+        first = await collect(flight.stream("key", producer))
+        second = await collect(flight.stream("key", producer))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == [("error", "timeout")]
+    assert second == [("sql_query", "SELECT 1")]
+    assert flight.stats()["started"] == 2
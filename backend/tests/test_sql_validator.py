@@ -0,0 +1,58 @@
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.llm.llm_chain import avalidate_and_repair
+from app.llm.sql_validator import SchemaIndex, extract_sql, is_single_select, referenced_tables, validate_sql
+
+INDEX = SchemaIndex({"orders": {"id", "amount", "customer_id"}, "customers": {"id", "name"}})
+
+
+def test_valid_query_has_no_errors():
+    sql = "SELECT c.name, SUM(o.amount) FROM orders o JOIN customers c ON o.customer_id = c.id GROUP BY c.name"
+    assert validate_sql(sql, "postgres", INDEX) == []
+
+
+def test_unknown_table_and_column():
+    assert validate_sql("SELECT id FROM invoices", "postgres", INDEX) == ["Unknown table 'invoices'"]
+    assert validate_sql("SELECT o.total FROM orders o", "postgres", INDEX) == ["Unknown column 'total' in table 'orders'"]
+
+
+def test_syntax_error():
+    errors = validate_sql("SELECT FROM WHERE", "postgres", INDEX)
+    assert errors and errors[0].startswith("SQL syntax error")
+
+
+def test_unfenced_prose_is_a_validation_error():
+    response = "Here's the query:\nSELECT id FROM orders"
+    errors = validate_sql(extract_sql(response), "postgres", INDEX)
+    assert errors and errors[0].startswith("SQL syntax error")
+
+
+def test_unterminated_string_is_a_validation_error():
+    errors = validate_sql("SELECT 'abc", "postgres", INDEX)
+    assert errors and errors[0].startswith("SQL syntax error")
+
+
+def test_referenced_tables_of_untokenizable_sql():
+    assert referenced_tables("SELECT 'abc", "postgres") == []
+    assert referenced_tables("WITH t AS (SELECT id FROM orders) SELECT * FROM t", "postgres") == ["orders"]
+
+
+def test_untokenizable_response_is_repaired():
+    llm = FakeListChatModel(responses=["```sql\nSELECT id FROM orders\n```"])
+    prompt_inputs = {"schema": "orders(id, amount, customer_id)", "query": "order ids"}
+    response, errors, attempts = asyncio.run(
+        avalidate_and_repair("Here's the query:\nSELECT id FROM orders", prompt_inputs, llm, "postgres", INDEX)
+    )
+    assert errors == []
+    assert attempts == 1
+    assert extract_sql(response) == "SELECT id FROM orders"
+
+
+def test_only_single_read_only_queries_are_selects():
+    assert is_single_select("WITH t AS (SELECT id FROM orders) SELECT * FROM t;", "postgres")
+    assert is_single_select("SELECT 1 UNION SELECT 2", "postgres")
+    for sql in ["DELETE FROM orders", "SELECT 1; DROP TABLE orders", "SELECT * INTO copy FROM orders",
+                "WITH d AS (DELETE FROM orders RETURNING *) SELECT * FROM d", "SELECT 'abc"]:
+        assert not is_single_select(sql, "postgres"), sql
@@ -36,7 +36,33 @@ export default function DatabaseInterface() {
   const [isLoadingMetadata, setIsLoadingMetadata] = useState(false);
   const [schemaLoaded, setSchemaLoaded] = useState(false);
   const [metadataLoaded, setMetadataLoaded] = useState(false);
+  const [sessionId] = useState(() => crypto.randomUUID());
   const [showSettings, setShowSettings] = useState(false);
+  const [jobProgress, setJobProgress] = useState<Record<string, string>>({});
+
+  // Builds run as background jobs on the backend: poll the job until it finishes
+  const waitForJob = async (data: { job_id?: string }, kind: string) => {
+    if (!data.job_id) return data;
+    try {
+      while (true) {
+        const response = await fetch(`http://localhost:8000/jobs/${data.job_id}`);
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const job = await response.json();
+        if (job.status === "succeeded") return job.result;
+        if (job.status === "failed") throw new Error(job.error);
+        const stage = job.stage && job.stages[job.stage];
+        if (stage) {
+          const count = stage.total != null ? `${stage.done}/${stage.total}` : `${stage.done}`;
+          setJobProgress((prev) => ({ ...prev, [kind]: `${count} ${job.stage}` }));
+        }
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+      }
+    } finally {
+      setJobProgress((prev) => ({ ...prev, [kind]: "" }));
+    }
+  };
 
   const handleSelectSource = (source: string) => {
     setSelectedSource(source);
@@ -91,7 +117,7 @@ export default function DatabaseInterface() {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      await response.json();
+      await waitForJob(await response.json(), "schema");
       setSchemaLoaded(true);
     } catch (error) {
       setError("Failed to load schema. Please try again.");
@@ -121,7 +147,7 @@ export default function DatabaseInterface() {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      await response.json();
+      await waitForJob(await response.json(), "vector_store");
       setVectorLoaded(true);
     } catch (error) {
       setError("Failed to Create Vector. Please try again.");
@@ -148,7 +174,7 @@ export default function DatabaseInterface() {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      await response.json();
+      await waitForJob(await response.json(), "metadata");
       setMetadataLoaded(true);
     } catch (error) {
       setError("Failed to load metadata. Please try again.");
@@ -178,7 +204,7 @@ export default function DatabaseInterface() {
       const response = await fetch(
         `http://localhost:8000/generate-query/?query_text=${encodeURIComponent(
           message
-        )}`,
+        )}&session_id=${encodeURIComponent(sessionId)}`,
         {
           method: "POST",
           headers: {
@@ -195,37 +221,65 @@ export default function DatabaseInterface() {
         );
       }
 
-      const data = await response.text();
-      const jsonStrings = data.match(/\{[^}]+\}/g) || [];
-
-      for (const jsonString of jsonStrings) {
-        try {
-          const jsonData = JSON.parse(jsonString);
-          if (jsonData.event === "status" || jsonData.event === "sql_query") {
-            accumulatedResponse += "\n" + jsonData.data;
-            setMessages((prev) => {
-              const newMessages = [...prev];
-              const lastMessage = newMessages[newMessages.length - 1];
-
-              if (lastMessage?.role === "assistant") {
-                newMessages[newMessages.length - 1] = {
-                  ...lastMessage,
-                  content: accumulatedResponse.trim(),
-                };
-              } else {
-                newMessages.push({
-                  role: "assistant",
-                  content: accumulatedResponse.trim(),
-                  timestamp: new Date().toISOString(),
-                });
-              }
-              return newMessages;
+      const updateAssistantMessage = (content: string) => {
+        setMessages((prev) => {
+          const newMessages = [...prev];
+          const lastMessage = newMessages[newMessages.length - 1];
+
+          if (lastMessage?.role === "assistant") {
+            newMessages[newMessages.length - 1] = {
+              ...lastMessage,
+              content: content.trim(),
+            };
+          } else {
+            newMessages.push({
+              role: "assistant",
+              content: content.trim(),
+              timestamp: new Date().toISOString(),
             });
-          } else if (jsonData.event === "error") {
-            setError(jsonData.data);
           }
-        } catch (e) {
-          console.error("Error parsing JSON:", e);
+          return newMessages;
+        });
+      };
+
+      const handleEvent = (jsonData: { event: string; data: string }) => {
+        if (jsonData.event === "status") {
+          if (!accumulatedResponse) updateAssistantMessage(jsonData.data);
+        } else if (jsonData.event === "token") {
+          accumulatedResponse += jsonData.data;
+          updateAssistantMessage(accumulatedResponse);
+        } else if (jsonData.event === "sql_query") {
+          accumulatedResponse = jsonData.data;
+          updateAssistantMessage(accumulatedResponse);
+        } else if (jsonData.event === "validation") {
+          setError(`SQL validation: ${jsonData.data}`);
+        } else if (jsonData.event === "error") {
+          setError(jsonData.data);
+        }
+      };
+
+      // Read the Server-Sent Events stream as it arrives, one "data:" line per event
+      const reader = response.body!.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const messagesInBuffer = buffer.split("\n\n");
+        buffer = messagesInBuffer.pop() || "";
+
+        for (const sseMessage of messagesInBuffer) {
+          for (const line of sseMessage.split("\n")) {
+            if (!line.startsWith("data:")) continue;
+            try {
+              handleEvent(JSON.parse(line.slice(5).trim()));
+            } catch (e) {
+              console.error("Error parsing JSON:", e);
+            }
+          }
         }
       }
     } catch (error) {
@@ -381,7 +435,7 @@ export default function DatabaseInterface() {
                     {isLoadingSchema ? (
                       <>
                         <Loader2 className="w-5 h-5 animate-spin" />
-                        Loading Schema...
+                        Loading Schema... {jobProgress.schema}
                       </>
                     ) : (
                       <>
@@ -401,7 +455,7 @@ export default function DatabaseInterface() {
                     {isLoadingMetadata ? (
                       <>
                         <Loader2 className="w-5 h-5 animate-spin" />
-                        Loading Metadata...
+                        Loading Metadata... {jobProgress.metadata}
                       </>
                     ) : (
                       <>
@@ -421,7 +475,7 @@ export default function DatabaseInterface() {
                     {isLoadingVector ? (
                       <>
                         <Loader2 className="w-5 h-5 animate-spin" />
-                        Loading Vector...
+                        Loading Vector... {jobProgress.vector_store}
                       </>
                     ) : (
                       <>